@@ -3,7 +3,7 @@ from django.contrib import messages
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django import forms
-from .models import Category, Product, Customer, Order, OrderItem, OrderStatusHistory, BotSettings
+from .models import Category, Product, Customer, Order, OrderItem, OrderStatusHistory, OrderDailyStats, BotSettings, DeliveryZone, Branch
 from .utils import send_telegram_message
 import logging
 
@@ -24,9 +24,9 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
-    list_display = ['full_name', 'phone_number', 'telegram_id', 'created_at']
+    list_display = ['full_name', 'phone_number', 'telegram_id', 'order_count', 'total_spent', 'last_order_at', 'created_at']
     search_fields = ['full_name', 'phone_number']
-    readonly_fields = ['telegram_id', 'created_at']
+    readonly_fields = ['telegram_id', 'order_count', 'total_spent', 'last_order_at', 'created_at']
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -35,15 +35,15 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['order_number', 'customer', 'status', 'service_type', 'total_amount', 'created_at']
-    list_filter = ['status', 'service_type', 'payment_method', 'created_at']
+    list_display = ['order_number', 'customer', 'branch', 'status', 'service_type', 'total_amount', 'created_at']
+    list_filter = ['branch', 'status', 'service_type', 'payment_method', 'created_at']
     search_fields = ['order_number', 'customer__full_name', 'customer__phone_number']
     readonly_fields = ['order_number', 'created_at', 'confirmed_at', 'ready_at', 'delivered_at', 'picked_up_at']
     inlines = [OrderItemInline]
     
     fieldsets = (
         ('Asosiy ma\'lumotlar', {
-            'fields': ('order_number', 'customer', 'telegram_user_id', 'status', 'payment_method', 'service_type')
+            'fields': ('order_number', 'customer', 'branch', 'telegram_user_id', 'status', 'payment_method', 'service_type')
         }),
         ('Manzil (faqat yetkazib berish uchun)', {
             'fields': ('latitude', 'longitude', 'address'),
@@ -67,6 +67,19 @@ class OrderStatusHistoryAdmin(admin.ModelAdmin):
     list_filter = ['old_status', 'new_status', 'changed_at']
     readonly_fields = ['changed_at']
 
+@admin.register(OrderDailyStats)
+class OrderDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'branch', 'status', 'service_type', 'payment_method', 'order_count', 'total_amount']
+    list_filter = ['branch', 'status', 'service_type', 'payment_method', 'date']
+    date_hierarchy = 'date'
+
+    # Rollup faqat Order.save() yoki rebuild_order_stats orqali yangilanadi
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 class BotSettingsForm(forms.ModelForm):
     class Meta:
         model = BotSettings
@@ -260,3 +273,39 @@ class BotSettingsAdmin(admin.ModelAdmin):
             logger.error(f"Error getting current settings: {e}")
         
         return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(Branch)
+class BranchAdmin(admin.ModelAdmin):
+    list_display = ('name', 'opening_time', 'closing_time', 'delivery_radius_km', 'chef_chat_id', 'courier_chat_id', 'is_active')
+    list_filter = ('is_active',)
+    list_editable = ('is_active',)
+    search_fields = ('name', 'address')
+    fieldsets = (
+        (None, {
+            'fields': ('name', 'address', 'is_active'),
+        }),
+        ('Joylashuv', {
+            'fields': ('latitude', 'longitude', 'delivery_radius_km'),
+            'description': 'Yetkazib berish buyurtmasi radiusi ichidagi eng yaqin ochiq filialga yo\'naltiriladi',
+        }),
+        ('Ish vaqti', {
+            'fields': ('opening_time', 'closing_time'),
+        }),
+        ('Telegram chatlari', {
+            'fields': ('chef_chat_id', 'courier_chat_id'),
+            'description': 'Filial buyurtmalari xabarlari shu chatlarga yuboriladi',
+        }),
+    )
+
+@admin.register(DeliveryZone)
+class DeliveryZoneAdmin(admin.ModelAdmin):
+    list_display = ('name', 'base_cost', 'cost_per_km', 'priority', 'points_count', 'is_active', 'updated_at')
+    list_filter = ('is_active',)
+    list_editable = ('priority', 'is_active')
+    search_fields = ('name',)
+    fields = ('name', 'polygon', 'base_cost', 'cost_per_km', 'priority', 'is_active')
+
+    def points_count(self, obj):
+        return len(obj.polygon) if isinstance(obj.polygon, list) else 0
+    points_count.short_description = "Nuqtalar soni"
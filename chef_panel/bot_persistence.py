@@ -0,0 +1,279 @@
+"""
+Bot foydalanuvchilari holatini (context.user_data) bazada saqlash.
+
+PTB har BOT_PERSISTENCE_INTERVAL soniyada o'zgargan foydalanuvchilar uchun
+update_user_data() ni chaqiradi. Bu yerda holat faqat xotirada "dirty" deb
+belgilanadi, keyin bitta fon vazifasi hammasini bitta tranzaksiyada (upsert)
+yozadi - handlerlar diskni kutmaydi. O'zgarmagan holatlar qayta yozilmaydi.
+
+Ishga tushishda hech kim yuklanmaydi (get_user_data bo'sh): foydalanuvchi
+holati uning birinchi update ida refresh_user_data() orqali o'qiladi.
+
+Xotira chegaralangan: session_ttl dan ko'p faol bo'lmagan, shuningdek
+max_sessions / max_bytes oshganda eng eski (LRU) foydalanuvchilar holati
+bazaga yozilib xotiradan chiqariladi (Application.drop_user_data, bazadagi
+yozuv qoladi); keyingi update da qayta yuklanadi.
+
+Hamma yozishlar bitta _flush_lock orqali ketma-ket: DB pulidagi ikki oqim
+eski va yangi partiyalarni teskari tartibda yozib qo'ymasligi uchun.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.utils import timezone
+from telegram.ext import BasePersistence, PersistenceInput
+
+from .db import db_sync, write_transaction
+from .models import BotUserState
+
+logger = logging.getLogger(__name__)
+
+DECIMAL_KEY = '__decimal__'
+
+
+def encode_state(value):
+    """user_data ni JSON ga: Decimal (delivery_cost) {'__decimal__': '...'} ko'rinishida saqlanadi"""
+    if isinstance(value, Decimal):
+        return {DECIMAL_KEY: str(value)}
+    if isinstance(value, dict):
+        return {key: encode_state(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_state(item) for item in value]
+    return value
+
+
+def decode_state(value):
+    if isinstance(value, dict):
+        if len(value) == 1 and DECIMAL_KEY in value:
+            return Decimal(value[DECIMAL_KEY])
+        return {key: decode_state(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_state(item) for item in value]
+    return value
+
+
+@db_sync
+def _load_state(user_id):
+    return BotUserState.objects.filter(telegram_id=user_id).values_list('data', flat=True).first()
+
+
+@db_sync
+@write_transaction
+def _save_states(states):
+    now = timezone.now()
+    BotUserState.objects.bulk_create(
+        [BotUserState(telegram_id=user_id, data=data, updated_at=now) for user_id, data in states.items()],
+        update_conflicts=True,
+        unique_fields=['telegram_id'],
+        update_fields=['data', 'updated_at'],
+    )
+
+
+@db_sync
+def _delete_state(user_id):
+    BotUserState.objects.filter(telegram_id=user_id).delete()
+
+
+def state_size(data):
+    """Holatning taxminiy hajmi (JSON baytlarda) - metrika va max_bytes uchun"""
+    return len(json.dumps(data, ensure_ascii=False, default=str).encode())
+
+
+class DatabasePersistence(BasePersistence):
+    """Faqat user_data saqlanadi; chat_data, bot_data (bot_settings) va callback_data xotirada qoladi"""
+
+    def __init__(self, update_interval=60, session_ttl=3600, max_sessions=5000, max_bytes=32 * 1024 * 1024):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.last_stats = {}
+        self._loaded = set()
+        self._last_seen = OrderedDict()  # user_id -> oxirgi update vaqti, eng eskisi birinchi
+        self._saved = {}  # user_id -> oxirgi yozilgan (kodlangan) holat
+        self._dirty = {}
+        self._evicted = set()  # xotiradan chiqarilgan - PTB drop_user_data bazadan o'chirmasin
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._eviction_task = None
+        self._application = None
+
+    async def get_user_data(self):
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        self._last_seen[user_id] = time.monotonic()
+        self._last_seen.move_to_end(user_id)
+        if user_id in self._loaded:
+            return
+        try:
+            stored = await _load_state(user_id)
+        except Exception as e:
+            logger.error(f"Foydalanuvchi {user_id} holatini yuklashda xato: {e}", exc_info=True)
+            return
+        self._loaded.add(user_id)
+        if stored:
+            self._saved[user_id] = stored
+            # Yuklash paytida handler yozgan qiymatlar ustun
+            for key, value in decode_state(stored).items():
+                user_data.setdefault(key, value)
+
+    async def update_user_data(self, user_id, data):
+        if user_id not in self._loaded:
+            # Xotiradan chiqarilgan (holati allaqachon yozilgan) - PTB bo'sh lug'at uzatadi
+            return
+        encoded = encode_state(data)
+        if self._saved.get(user_id) == encoded and user_id not in self._dirty:
+            return
+        self._dirty[user_id] = encoded
+        if self._flush_task is None or self._flush_task.done():
+            # PTB barcha update_user_data larni birga chaqiradi - vazifa ulardan keyin ishlaydi
+            self._flush_task = asyncio.create_task(self._flush_dirty())
+
+    async def _flush_dirty(self):
+        async with self._flush_lock:
+            while self._dirty:
+                batch, self._dirty = self._dirty, {}
+                try:
+                    await _save_states(batch)
+                except Exception as e:
+                    logger.error(f"{len(batch)} ta foydalanuvchi holatini saqlashda xato: {e}", exc_info=True)
+                    # Keyingi intervalda qayta urinamiz (yangiroq holat bo'lsa o'shani)
+                    self._dirty = {**batch, **self._dirty}
+                    return
+                self._saved.update(batch)
+
+    def _drop_from_memory(self, application, user_id):
+        # drop_user_data qaytib kelgan foydalanuvchini shu application da belgilaydi
+        self._application = application
+        self._evicted.add(user_id)
+        application.drop_user_data(user_id)
+
+    async def evict_sessions(self, application):
+        """
+        Eskirgan va limitdan ortiq sessiyalarni bazaga yozib, Application.user_data
+        dan chiqarish. Natija last_stats da va logda.
+        """
+        now = time.monotonic()
+        user_data = application.user_data
+        for user_id in [user_id for user_id, data in user_data.items() if user_id not in self._last_seen]:
+            # PTB update_persistence dagi defaultdict murojaatidan qolgan bo'sh yozuvlar
+            if not user_data[user_id]:
+                self._drop_from_memory(application, user_id)
+
+        sizes = {user_id: state_size(data) for user_id, data in user_data.items()}
+        count = len(self._last_seen)
+        total = sum(sizes.values())
+        candidates = {}
+        for user_id, seen in self._last_seen.items():
+            if now - seen < self.session_ttl and count <= self.max_sessions and total <= self.max_bytes:
+                break
+            candidates[user_id] = seen
+            count -= 1
+            total -= sizes.get(user_id, 0)
+
+        changed = {}
+        for user_id in candidates:
+            if user_id in user_data:
+                encoded = encode_state(user_data[user_id])
+                if self._saved.get(user_id) != encoded or user_id in self._dirty:
+                    changed[user_id] = encoded
+        if changed:
+            self._dirty.update(changed)
+            await self._flush_dirty()
+
+        evicted = 0
+        for user_id, seen in candidates.items():
+            if user_id in self._dirty or self._last_seen.get(user_id) != seen:
+                # Yozilmadi yoki yozish paytida yangi update keldi
+                continue
+            self._drop_from_memory(application, user_id)
+            self._loaded.discard(user_id)
+            self._saved.pop(user_id, None)
+            del self._last_seen[user_id]
+            evicted += 1
+
+        self.last_stats = {
+            'sessions': len(user_data),
+            'bytes': sum(size for user_id, size in sizes.items() if user_id in user_data),
+            'evicted': evicted,
+            'spilled': len(changed),
+        }
+        logger.info("bot_sessions %s", json.dumps(self.last_stats), extra={'bot_sessions': self.last_stats})
+        return self.last_stats
+
+    def start_eviction(self, application, interval):
+        """Application.user_data ni har interval soniyada tozalash"""
+        self._application = application
+        self._eviction_task = asyncio.create_task(self._eviction_loop(application, interval))
+
+    async def _eviction_loop(self, application, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict_sessions(application)
+            except Exception as e:
+                logger.error(f"Sessiyalarni tozalashda xato: {e}", exc_info=True)
+
+    async def drop_user_data(self, user_id):
+        if user_id in self._evicted:
+            # evict_sessions chiqargan - holat bazada qoladi
+            self._evicted.discard(user_id)
+            if user_id in self._loaded and self._application is not None:
+                # Shu orada qaytib keldi - PTB bu yurishda uning update ini tashlab yubordi
+                self._application.mark_data_for_update_persistence(user_ids=user_id)
+            return
+        async with self._flush_lock:
+            self._loaded.discard(user_id)
+            self._last_seen.pop(user_id, None)
+            self._saved.pop(user_id, None)
+            self._dirty.pop(user_id, None)
+            await _delete_state(user_id)
+
+    async def flush(self):
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._flush_dirty()
+
+    # Saqlanmaydigan ma'lumotlar (store_data da o'chirilgan)
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
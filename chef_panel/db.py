@@ -0,0 +1,90 @@
+"""
+Umumiy SQLite bazasiga yozish (web va bot konteynerlari bitta db.sqlite3 dan foydalanadi).
+
+Ulanish sozlamalari settings.DATABASES['default']['OPTIONS'] da: WAL, busy_timeout
+("timeout"), synchronous=NORMAL va transaction_mode=IMMEDIATE - har bir atomic()
+yozish qulfini boshidayoq oladi, shuning uchun o'qishdan yozishga o'tishda
+"database is locked" bo'lmaydi, qulf busy_timeout davomida kutiladi.
+
+write_transaction busy_timeout ham yetmagan holatlar uchun: tranzaksiyani
+cheklangan marta, ortib boruvchi pauza bilan qaytadan bajaradi.
+
+db_sync - async bot uchun sync_to_async o'rnini bosadi: ORM chaqiruvlari
+standart thread_sensitive=True dagi yagona oqimda emas, BOT_DB_THREADS ta
+oqimli pulda bajariladi, shuning uchun turli foydalanuvchilarning so'rovlari
+parallel ketadi. Har bir oqim o'z ulanishiga ega; chaqiruvdan oldin va keyin
+close_old_connections() (web dagi request_started/finished kabi) - CONN_MAX_AGE
+va PostgreSQL pool qoidalari bot da ham amal qiladi.
+"""
+import functools
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def is_locked_error(error):
+    return 'database is locked' in str(error) or 'database table is locked' in str(error)
+
+
+def write_transaction(func):
+    """
+    Funksiyani atomic() ichida bajarish; SQLite "database is locked" da
+    WRITE_TRANSACTION_ATTEMPTS martagacha qayta urinish. Tashqi tranzaksiya
+    ichida chaqirilsa qayta urinmaydi (xato tashqi blokka uzatiladi).
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = settings.WRITE_TRANSACTION_ATTEMPTS
+        for attempt in range(1, attempts + 1):
+            nested = connection.in_atomic_block
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as e:
+                if nested or attempt == attempts or not is_locked_error(e):
+                    raise
+                delay = settings.WRITE_TRANSACTION_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                logger.warning(f"{func.__name__}: baza band, {attempt}-urinish muvaffaqiyatsiz, {delay:.2f}s dan keyin qayta")
+                time.sleep(delay)
+    return wrapper
+
+
+_db_executor = None
+
+
+def _get_db_executor():
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=settings.BOT_DB_THREADS, thread_name_prefix='bot-db')
+    return _db_executor
+
+
+def _with_connection_cleanup(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+def db_sync(func):
+    """
+    Sync ORM funksiyasini DB oqimlar pulida bajariladigan coroutine ga aylantirish:
+    await db_sync(Model.objects.filter(...).first)() yoki dekorator sifatida.
+    """
+    wrapped = _with_connection_cleanup(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await sync_to_async(wrapped, thread_sensitive=False, executor=_get_db_executor())(*args, **kwargs)
+    return wrapper
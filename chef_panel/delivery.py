@@ -0,0 +1,521 @@
+"""
+Yetkazib berish hududlari: mijoz lokatsiyasi qaysi hududga tushishi va shu hudud tarifi.
+
+Hudud chegarasi ko'pburchak ([[lat, lon], ...]). DeliveryZone.save() da u "slab"
+indeksiga kompilyatsiya qilinadi (compile_polygon):
+  * ys    - uchlarning kengliklari (lat), tartiblangan - gorizontal polosalar chegarasi
+  * slabs - har bir polosani to'liq kesib o'tadigan qirralar, uzunlik (lon) bo'yicha
+            tartiblangan; polosa ichida qirralar kesishmaydi, tartib o'zgarmaydi
+
+Nuqta tekshiruvi: polosa - binar qidiruv, nuqtadan o'ngdagi qirralar soni - yana binar
+qidiruv; toq bo'lsa nuqta ichida. Ya'ni O(log n), n - uchlar soni.
+
+Bir nechta hudud ustidan ZoneIndex tekis to'r quradi: har bir katakda shu katakka
+tegadigan hududlar (ustuvorlik bo'yicha) - nuqta faqat 1-2 hudud bilan tekshiriladi.
+
+Filiallar (Branch) uchun BranchIndex: katak tomoni eng katta yetkazib berish radiusiga
+teng to'r - nuqtaga xizmat qila oladigan filial faqat qo'shni 3x3 katakda bo'ladi.
+
+Indekslar jarayon ichida keshlanadi va jadval o'zgarganda qayta quriladi
+(get_zone_index, get_branch_index).
+
+Yetkazib berish narxi (DeliveryQuote) geohash katagi bo'yicha QuoteCache da
+saqlanadi: bitta ofis yoki uydan kelgan lokatsiyalar qayta hisoblanmaydi. Masofa
+DistanceProvider orqali (hozir haversine, keyin yo'l bo'yicha routing).
+"""
+import datetime
+import json
+import logging
+import math
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils import timezone
+
+# To'r o'lchami (GRID_SIZE x GRID_SIZE katak hamma hududlar chegarasi ustida)
+GRID_SIZE = 64
+# Hudud chegarasidagi uchlar soni cheklovi (admin da qo'lda kiritiladi)
+MAX_POLYGON_POINTS = 1000
+
+EARTH_RADIUS_KM = 6371.0
+# Meridian bo'ylab bir gradus kenglik
+KM_PER_DEGREE = 111.32
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# QuoteCache statistikasi har shuncha murojaatda logga yoziladi
+QUOTE_STATS_LOG_EVERY = 100
+
+logger = logging.getLogger(__name__)
+
+
+def _ring(polygon):
+    """[[lat, lon], ...] -> [(lon, lat), ...] (x, y); yopuvchi takroriy nuqta olib tashlanadi"""
+    points = [(float(lon), float(lat)) for lat, lon in polygon]
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    return points
+
+
+def _segments_cross(p1, p2, q1, q2):
+    def orient(a, b, c):
+        value = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+        return (value > 0) - (value < 0)
+
+    def on_segment(a, b, c):
+        return min(a[0], b[0]) <= c[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= c[1] <= max(a[1], b[1])
+
+    o1, o2 = orient(p1, p2, q1), orient(p1, p2, q2)
+    o3, o4 = orient(q1, q2, p1), orient(q1, q2, p2)
+    if o1 != o2 and o3 != o4:
+        return True
+    return ((o1 == 0 and on_segment(p1, p2, q1)) or (o2 == 0 and on_segment(p1, p2, q2))
+            or (o3 == 0 and on_segment(q1, q2, p1)) or (o4 == 0 and on_segment(q1, q2, p2)))
+
+
+def validate_polygon(polygon):
+    """Hudud chegarasini tekshirish (admin formasi uchun), xato bo'lsa ValidationError"""
+    if not isinstance(polygon, list):
+        raise ValidationError("Chegara [[lat, lon], [lat, lon], ...] ko'rinishidagi ro'yxat bo'lishi kerak")
+    for point in polygon:
+        if (not isinstance(point, (list, tuple)) or len(point) != 2
+                or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in point)):
+            raise ValidationError(f"Noto'g'ri nuqta: {point!r} - [lat, lon] sonlar juftligi kerak")
+        lat, lon = point
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValidationError(f"Koordinata chegaradan tashqarida: {point!r}")
+
+    ring = _ring(polygon)
+    if len(ring) < 3:
+        raise ValidationError("Hudud kamida 3 ta nuqtadan iborat bo'lishi kerak")
+    if len(ring) > MAX_POLYGON_POINTS:
+        raise ValidationError(f"Nuqtalar soni {MAX_POLYGON_POINTS} tadan oshmasligi kerak")
+    if len(set(ring)) != len(ring):
+        raise ValidationError("Chegarada takroriy nuqtalar bor")
+
+    area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]))
+    if abs(area) < 1e-12:
+        raise ValidationError("Hudud yuzasi nolga teng")
+
+    # O(n^2), lekin faqat saqlashda va n <= MAX_POLYGON_POINTS
+    edges = list(zip(ring, ring[1:] + ring[:1]))
+    n = len(edges)
+    for i in range(n):
+        for j in range(i + 2, n):
+            if i == 0 and j == n - 1:
+                continue  # qo'shni qirralar (birinchi va oxirgi)
+            if _segments_cross(*edges[i], *edges[j]):
+                raise ValidationError(f"Chegara o'zini kesib o'tadi ({i + 1}- va {j + 1}-qirralar)")
+
+
+def compile_polygon(polygon):
+    """
+    Ko'pburchakni slab indeksiga kompilyatsiya qilish (JSON ga saqlanadi):
+    {'bbox': [min_lat, min_lon, max_lat, max_lon], 'ys': [...], 'slabs': [[[x0, dxdy], ...], ...]}
+    x0 - qirraning polosa pastki chegarasidagi (ys[k]) uzunligi, dxdy - og'ishi.
+    """
+    ring = _ring(polygon)
+    edges = []
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if y1 == y2:
+            continue  # gorizontal qirra nur bilan kesishmaydi
+        if y1 > y2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        edges.append((y1, y2, x1, (x2 - x1) / (y2 - y1)))
+
+    ys = sorted({y for _, y in ring})
+    slabs = []
+    for bottom, top in zip(ys, ys[1:]):
+        middle = (bottom + top) / 2
+        active = [
+            (x + (bottom - y1) * dxdy, dxdy, x + (middle - y1) * dxdy)
+            for y1, y2, x, dxdy in edges
+            if y1 <= bottom and top <= y2
+        ]
+        active.sort(key=lambda edge: edge[2])
+        slabs.append([[x0, dxdy] for x0, dxdy, _ in active])
+
+    xs = [x for x, _ in ring]
+    return {'bbox': [ys[0], min(xs), ys[-1], max(xs)], 'ys': ys, 'slabs': slabs}
+
+
+def point_in_compiled(compiled, lat, lon):
+    """Nuqta kompilyatsiya qilingan ko'pburchak ichidami - O(log n)"""
+    ys = compiled['ys']
+    k = bisect_right(ys, lat) - 1
+    if k < 0 or k >= len(ys) - 1:
+        return False
+    bottom = ys[k]
+    edges = compiled['slabs'][k]
+    left = bisect_right(edges, lon, key=lambda edge: edge[0] + (lat - bottom) * edge[1])
+    return (len(edges) - left) % 2 == 1
+
+
+def point_in_polygon(polygon, lat, lon):
+    """Oddiy ray casting, O(n) - indeksni tekshirish va benchmark uchun"""
+    inside = False
+    ring = _ring(polygon)
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 <= lat < y2 or y2 <= lat < y1) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+@dataclass(frozen=True)
+class ZoneTariff:
+    """Hudud tarifi (ZoneIndex.lookup natijasi)"""
+    zone_id: int
+    name: str
+    base_cost: Decimal
+    cost_per_km: Decimal
+
+    def delivery_cost(self, distance_km):
+        """Boshlang'ich narx + birinchi km dan keyingi har (boshlangan) km uchun qo'shimcha"""
+        if distance_km <= 1.0:
+            return self.base_cost
+        return self.base_cost + self.cost_per_km * math.ceil(distance_km - 1.0)
+
+
+class ZoneIndex:
+    """Hududlar ustidan tekis to'r: katak -> shu katakka tegadigan hududlar (ustuvorlik bo'yicha)"""
+
+    def __init__(self, zones, grid_size=GRID_SIZE):
+        # zones: [(ZoneTariff, compiled), ...] ustuvorlik bo'yicha tartiblangan
+        self.zones = list(zones)
+        self.grid_size = grid_size
+        self.version = None  # _cached_index qo'yadi (QuoteCache kaliti uchun)
+        if not self.zones:
+            self.bbox = None
+            self._cells = []
+            return
+
+        boxes = [compiled['bbox'] for _, compiled in self.zones]
+        min_lat = min(box[0] for box in boxes)
+        min_lon = min(box[1] for box in boxes)
+        max_lat = max(box[2] for box in boxes)
+        max_lon = max(box[3] for box in boxes)
+        self.bbox = (min_lat, min_lon, max_lat, max_lon)
+        self._cell_lat = (max_lat - min_lat) / grid_size or 1.0
+        self._cell_lon = (max_lon - min_lon) / grid_size or 1.0
+
+        cells = [[] for _ in range(grid_size * grid_size)]
+        for position, (_, compiled) in enumerate(self.zones):
+            lat0, lon0, lat1, lon1 = compiled['bbox']
+            row0, col0 = self._cell(lat0, lon0)
+            row1, col1 = self._cell(lat1, lon1)
+            for row in range(row0, row1 + 1):
+                for col in range(col0, col1 + 1):
+                    cells[row * grid_size + col].append(position)
+        self._cells = [tuple(cell) for cell in cells]
+
+    def __len__(self):
+        return len(self.zones)
+
+    def _cell(self, lat, lon):
+        last = self.grid_size - 1
+        row = min(int((lat - self.bbox[0]) / self._cell_lat), last)
+        col = min(int((lon - self.bbox[1]) / self._cell_lon), last)
+        return row, col
+
+    def lookup(self, lat, lon):
+        """Nuqta tushadigan eng ustuvor hudud tarifi, hech qaysi hududda bo'lmasa None"""
+        if self.bbox is None:
+            return None
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return None
+        row, col = self._cell(lat, lon)
+        for position in self._cells[row * self.grid_size + col]:
+            tariff, compiled = self.zones[position]
+            box = compiled['bbox']
+            if box[0] <= lat <= box[2] and box[1] <= lon <= box[3] and point_in_compiled(compiled, lat, lon):
+                return tariff
+        return None
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Haversine - ikki nuqta orasidagi masofa (km)"""
+    d_lat = math.radians(lat2 - lat1)
+    d_lon = math.radians(lon2 - lon1)
+    a = math.sin(d_lat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def geohash_encode(lat, lon, precision):
+    """Geohash: precision=7 ~ 150x150 m, 8 ~ 38x19 m katak"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True  # juft bitlar - uzunlik, toqlari - kenglik
+    while len(chars) < precision:
+        bounds, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def geohash_center(geohash):
+    """Geohash katagi markazi (lat, lon)"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lon_range if even else lat_range
+            middle = (bounds[0] + bounds[1]) / 2
+            if value >> shift & 1:
+                bounds[0] = middle
+            else:
+                bounds[1] = middle
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+class DistanceProvider:
+    """
+    Narx hisoblanadigan masofa manbai. DELIVERY_DISTANCE_PROVIDER sozlamasida
+    nuqtali yo'l bilan almashtiriladi (masalan, lokal OSRM/Valhalla ga so'rov).
+    Filial tanlash va radius tekshiruvi baribir to'g'ri chiziq (BranchIndex) bo'yicha.
+    """
+
+    def distance_km(self, from_lat, from_lon, to_lat, to_lon):
+        raise NotImplementedError
+
+
+class HaversineProvider(DistanceProvider):
+    """To'g'ri chiziq (katta doira) bo'yicha masofa"""
+
+    def distance_km(self, from_lat, from_lon, to_lat, to_lon):
+        return distance_km(from_lat, from_lon, to_lat, to_lon)
+
+
+_provider = None
+
+
+def get_distance_provider():
+    """DELIVERY_DISTANCE_PROVIDER klassi nusxasi (jarayon ichida bitta)"""
+    global _provider
+    if _provider is None:
+        from django.utils.module_loading import import_string
+        _provider = import_string(settings.DELIVERY_DISTANCE_PROVIDER)()
+    return _provider
+
+
+@dataclass(frozen=True)
+class DeliveryQuote:
+    """Lokatsiya uchun yetkazib berish: filial, hudud, masofa va narx (None - yetkazib berilmaydi)"""
+    branch: Optional['BranchInfo']
+    zone: Optional[ZoneTariff]
+    distance_km: Optional[float]
+    cost: Optional[Decimal]
+
+
+class QuoteCache:
+    """
+    Geohash katagi bo'yicha narxlar uchun LRU kesh (jarayon ichida, oqimlar uchun xavfsiz).
+    Kalit: (geohash, hududlar versiyasi, filiallar versiyasi, ochiq filiallar) - tarif yoki
+    filial o'zgarsa eski yozuvlar ishlatilmaydi va LRU bo'yicha chiqib ketadi.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                value = self._items[key]
+                self._log_stats()
+                return value
+            self.misses += 1
+        # Hisoblash qulfdan tashqarida - routing provayderi sekin bo'lishi mumkin
+        value = compute()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+            self._log_stats()
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._items),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def _log_stats(self):
+        if (self.hits + self.misses) % QUOTE_STATS_LOG_EVERY == 0:
+            stats = self.stats()
+            logger.info("delivery_quotes %s", json.dumps(stats), extra={'delivery_quotes': stats})
+
+
+def is_open(opening_time, closing_time, moment=None):
+    """Ish vaqti ichidami (mahalliy vaqt); yopilish ochilishdan oldin bo'lsa - tungi smena"""
+    current = timezone.localtime(moment).time() if moment is None or timezone.is_aware(moment) else moment.time()
+    if opening_time <= closing_time:
+        return opening_time <= current <= closing_time
+    return current >= opening_time or current <= closing_time
+
+
+@dataclass(frozen=True)
+class BranchInfo:
+    """Filial (BranchIndex elementi) - bot va view lar ORM siz ishlatadi"""
+    id: int
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    opening_time: datetime.time
+    closing_time: datetime.time
+    chef_chat_id: int
+    courier_chat_id: int
+    delivery_radius_km: float
+
+    def is_open(self, moment=None):
+        return is_open(self.opening_time, self.closing_time, moment)
+
+
+class BranchIndex:
+    """
+    Filiallar ustidan tekis to'r (faqat band kataklar saqlanadi). Katak tomoni eng
+    katta radiusdan kichik emas, shuning uchun radius ichidagi filial qo'shni 3x3 katakda.
+    """
+
+    def __init__(self, branches):
+        self.branches = list(branches)
+        self.version = None
+        self._by_id = {branch.id: branch for branch in self.branches}
+        self._cells = {}
+        if not self.branches:
+            return
+        max_radius = max(branch.delivery_radius_km for branch in self.branches)
+        # Uzunlik gradusi qutbga yaqinlashgan sari qisqaradi - eng shimoliy nuqta bo'yicha
+        max_lat = min(max(abs(branch.latitude) for branch in self.branches) + max_radius / KM_PER_DEGREE, 89.0)
+        self._cell_lat = max_radius / KM_PER_DEGREE
+        self._cell_lon = max_radius / (KM_PER_DEGREE * math.cos(math.radians(max_lat)))
+        for branch in self.branches:
+            self._cells.setdefault(self._cell(branch.latitude, branch.longitude), []).append(branch)
+
+    def __len__(self):
+        return len(self.branches)
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self._cell_lat), math.floor(lon / self._cell_lon)
+
+    def get(self, branch_id):
+        return self._by_id.get(branch_id)
+
+    def open_branches(self, moment=None):
+        """Hozir ochiq filiallar (olib ketish uchun tanlash ro'yxati)"""
+        return [branch for branch in self.branches if branch.is_open(moment)]
+
+    def nearest(self, lat, lon, moment=None):
+        """
+        Nuqtaga xizmat qila oladigan (radius ichida va ochiq) eng yaqin filial:
+        (BranchInfo, masofa km) yoki (None, None)
+        """
+        if not self.branches:
+            return None, None
+        row, col = self._cell(lat, lon)
+        best = (None, None)
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                for branch in self._cells.get((row + d_row, col + d_col), ()):
+                    distance = distance_km(lat, lon, branch.latitude, branch.longitude)
+                    if distance > branch.delivery_radius_km or (best[1] is not None and distance >= best[1]):
+                        continue
+                    if branch.is_open(moment):
+                        best = (branch, distance)
+        return best
+
+
+_cache_lock = threading.Lock()
+_cached = {}  # nomi -> (versiya, indeks)
+
+
+def _table_version(model):
+    """Jadval versiyasi: har qanday o'zgarish (tahrir, o'chirish, faolsizlantirish) uni o'zgartiradi"""
+    state = model.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    return state['count'], state['updated']
+
+
+def _cached_index(name, model, build):
+    """
+    Jarayon ichidagi indeks keshi. Har chaqiruvda bitta yengil so'rov (versiya),
+    indeks faqat jadval o'zgarganda qayta quriladi.
+    """
+    version = _table_version(model)
+    cached = _cached.get(name)
+    if cached and cached[0] == version:
+        return cached[1]
+    with _cache_lock:
+        cached = _cached.get(name)
+        if cached and cached[0] == version:
+            return cached[1]
+        index = build()
+        index.version = version
+        _cached[name] = (version, index)
+        return index
+
+
+def get_zone_index():
+    """Faol hududlar indeksi. Hududlar yo'q bo'lsa bo'sh indeks (len == 0)"""
+    from .models import DeliveryZone
+
+    def build():
+        return ZoneIndex([
+            (ZoneTariff(zone.id, zone.name, zone.base_cost, zone.cost_per_km), zone.index)
+            for zone in DeliveryZone.objects.filter(is_active=True).order_by('-priority', 'id')
+            if zone.index
+        ])
+    return _cached_index('zones', DeliveryZone, build)
+
+
+def get_branch_index():
+    """Faol filiallar indeksi. Filiallar yo'q bo'lsa bo'sh indeks (bitta oshxona rejimi)"""
+    from .models import Branch
+
+    def build():
+        return BranchIndex([
+            BranchInfo(
+                branch.id, branch.name, branch.address, branch.latitude, branch.longitude,
+                branch.opening_time, branch.closing_time, branch.chef_chat_id,
+                branch.courier_chat_id, branch.delivery_radius_km,
+            )
+            for branch in Branch.objects.filter(is_active=True)
+        ])
+    return _cached_index('branches', Branch, build)
@@ -0,0 +1,325 @@
+"""
+Buyurtmalarni eksport qilish (CSV, NDJSON, XLSX) - doimiy xotira bilan oqim.
+
+Buyurtmalar values().iterator(chunk_size=...) bilan bo'laklab o'qiladi (har bo'lak
+uchun buyurtmalar + elementlar + holat tarixi = 3 so'rov) va natija ~64 KB li baytlar
+bo'laklari sifatida generatordan chiqadi. Shu generator StreamingHttpResponse ga
+ham, export_orders management buyrug'iga ham beriladi.
+
+XLSX ham oqim bilan yoziladi: zipfile siljitib bo'lmaydigan oqimga data descriptor
+bilan yozadi, varaq esa inlineStr hujayralari bilan - shuning uchun qo'shimcha
+kutubxona kerak emas va fayl xotirada yig'ilmaydi.
+
+ASGI da Django sync iteratorni sync_to_async(list) bilan butunlay o'qib oladi -
+shuning uchun u yerda async_chunks: har bir bo'lak alohida sync_to_async chaqiruvi.
+"""
+import csv
+import io
+import json
+import re
+import zipfile
+import zlib
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Order, OrderItem, OrderStatusHistory
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+COLUMNS = [
+    ('order_number', "Buyurtma #"),
+    ('created_at', "Yaratilgan vaqti"),
+    ('status', "Holati"),
+    ('service_type', "Xizmat turi"),
+    ('payment_method', "To'lov usuli"),
+    ('customer_name', "Mijoz"),
+    ('customer_phone', "Telefon"),
+    ('address', "Manzil"),
+    ('products_total', "Mahsulotlar summasi"),
+    ('delivery_cost', "Yetkazib berish narxi"),
+    ('total_amount', "Umumiy summa"),
+    ('items', "Mahsulotlar"),
+    ('history', "Holat tarixi"),
+]
+
+NUMERIC_COLUMNS = {'products_total', 'delivery_cost', 'total_amount'}
+
+DEFAULT_CHUNK_SIZE = 500
+FLUSH_BYTES = 64 * 1024
+
+
+def date_range(date_from, date_to):
+    """Mahalliy sanalar (ikkalasi ham kiradi) -> yarim ochiq created_at oralig'i"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(date_from, time.min), tz)
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def export_queryset(date_from, date_to):
+    start, end = date_range(date_from, date_to)
+    return (
+        Order.objects
+        .filter(created_at__gte=start, created_at__lt=end)
+        .order_by('created_at', 'id')
+        .values(
+            'id', 'order_number', 'created_at', 'status', 'service_type', 'payment_method',
+            'customer__full_name', 'customer__phone_number', 'address',
+            'products_total', 'delivery_cost', 'total_amount',
+        )
+    )
+
+
+def _batches(iterable, size):
+    batch = []
+    for row in iterable:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_order_records(date_from, date_to, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Har bir buyurtma uchun elementlar va holat tarixi bilan lug'at.
+    values() + qo'lda prefetch: model obyektlari va related manager'lar yaratilmaydi
+    (prefetch_related bilan solishtirganda ~4 barobar tezroq).
+    """
+    tz = timezone.get_current_timezone()
+    orders = export_queryset(date_from, date_to).iterator(chunk_size=chunk_size)
+    for batch in _batches(orders, chunk_size):
+        order_ids = [order['id'] for order in batch]
+
+        items = defaultdict(list)
+        for item in (
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .order_by('id')
+            .values('order_id', 'product__name', 'quantity', 'price', 'total')
+        ):
+            items[item['order_id']].append({
+                'product': item['product__name'],
+                'quantity': item['quantity'],
+                'price': item['price'],
+                'total': item['total'],
+            })
+
+        history = defaultdict(list)
+        for row in (
+            OrderStatusHistory.objects.filter(order_id__in=order_ids)
+            .order_by('changed_at', 'id')
+            .values('order_id', 'old_status', 'new_status', 'changed_at', 'changed_by__username', 'notes')
+        ):
+            history[row['order_id']].append({
+                'old_status': row['old_status'],
+                'new_status': row['new_status'],
+                'changed_at': row['changed_at'].astimezone(tz).strftime("%Y-%m-%d %H:%M:%S"),
+                'changed_by': row['changed_by__username'] or 'Tizim',
+                'notes': row['notes'],
+            })
+
+        for order in batch:
+            yield {
+                'order_number': order['order_number'],
+                'created_at': order['created_at'].astimezone(tz).strftime("%Y-%m-%d %H:%M:%S"),
+                'status': order['status'],
+                'service_type': order['service_type'],
+                'payment_method': order['payment_method'],
+                'customer_name': order['customer__full_name'],
+                'customer_phone': order['customer__phone_number'],
+                'address': order['address'] or '',
+                'products_total': order['products_total'],
+                'delivery_cost': order['delivery_cost'],
+                'total_amount': order['total_amount'],
+                'items': items.get(order['id'], []),
+                'history': history.get(order['id'], []),
+            }
+
+
+def _flat_row(record):
+    """CSV/XLSX uchun: elementlar va tarix bitta katakka yig'iladi"""
+    row = dict(record)
+    row['items'] = '; '.join(f"{item['product']} x{item['quantity']} ({item['total']})" for item in record['items'])
+    row['history'] = '; '.join(
+        f"{h['changed_at']} {h['old_status'] or '-'} -> {h['new_status']} ({h['changed_by']})"
+        for h in record['history']
+    )
+    return [row[key] for key, _ in COLUMNS]
+
+
+def _buffered(pieces):
+    """Kichik bo'laklarni ~FLUSH_BYTES gacha yig'ib chiqarish"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= FLUSH_BYTES:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def csv_chunks(records):
+    def pieces():
+        line = io.StringIO()
+        writer = csv.writer(line)
+        # BOM - Excel kirill harflarini to'g'ri ochishi uchun
+        yield '\ufeff'.encode()
+        writer.writerow([label for _, label in COLUMNS])
+        for record in records:
+            writer.writerow(_flat_row(record))
+            yield line.getvalue().encode()
+            line.seek(0)
+            line.truncate()
+    return _buffered(pieces())
+
+
+def ndjson_chunks(records):
+    def pieces():
+        for record in records:
+            yield (json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n').encode()
+    return _buffered(pieces())
+
+
+class _ChunkSink(io.RawIOBase):
+    """zipfile uchun siljitib bo'lmaydigan chiqish: yozilganlar drain() da olinadi"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Buyurtmalar" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+# XML 1.0 da ruxsat etilmagan boshqaruv belgilari
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_row(values, numeric_indexes=frozenset()):
+    cells = []
+    for index, value in enumerate(values):
+        if index in numeric_indexes and value is not None:
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            text = escape(_ILLEGAL_XML_CHARS.sub('', str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f"<row>{''.join(cells)}</row>".encode()
+
+
+def xlsx_chunks(records):
+    sink = _ChunkSink()
+    numeric_indexes = frozenset(i for i, (key, _) in enumerate(COLUMNS) if key in NUMERIC_COLUMNS)
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, _XML_HEADER + content)
+        yield sink.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                _XML_HEADER
+                + '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            ).encode())
+            sheet.write(_xlsx_row([label for _, label in COLUMNS]))
+            for piece in _buffered(_xlsx_row(_flat_row(record), numeric_indexes) for record in records):
+                sheet.write(piece)
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+def gzip_chunks(chunks):
+    """Bo'laklarni gzip bilan siqish (gzip sarlavhasi bilan, wbits=31)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+WRITERS = {
+    'csv': csv_chunks,
+    'ndjson': ndjson_chunks,
+    'xlsx': xlsx_chunks,
+}
+
+
+def export_chunks(export_format, date_from, date_to, use_gzip=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    chunks = WRITERS[export_format](iter_order_records(date_from, date_to, chunk_size))
+    return gzip_chunks(chunks) if use_gzip else chunks
+
+
+async def async_chunks(chunks):
+    """
+    Sync bo'laklar generatori -> async iterator (ASGI StreamingHttpResponse uchun).
+    thread_sensitive - hamma bo'laklar so'rovning bitta oqimida (bitta DB ulanishi va kursor).
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Mijoz uzilsa ham kursor va generator yopiladi
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def export_filename(export_format, date_from, date_to, use_gzip=False):
+    extension = FORMATS[export_format][1]
+    filename = f"buyurtmalar_{date_from.isoformat()}_{date_to.isoformat()}.{extension}"
+    return filename + '.gz' if use_gzip else filename
@@ -0,0 +1,49 @@
+"""
+Mahsulot rasmlarini siqish: telefondan yuklangan ko'p megabaytli rasmlar panel va
+Telegram uchun PRODUCT_IMAGE_MAX_SIZE gacha kichraytiriladi va qayta kodlanadi
+(JPEG progressive; shaffof rasmlar PNG bo'lib qoladi).
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def optimize_image(image_file, max_size, quality):
+    """
+    Rasmni kichraytirib qayta siqish. Yangi ContentFile (nomi .jpg/.png) qaytaradi;
+    rasm buzilgan yoki siqishdan foyda bo'lmasa None (asl fayl o'zgarmaydi).
+    """
+    try:
+        image_file.seek(0)
+        original_size = image_file.size
+        with Image.open(image_file) as image:
+            # Telefon rasmlari EXIF orientatsiya bilan keladi - qayta kodlashda yo'qolmasin
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+            buffer = BytesIO()
+            if _has_alpha(image):
+                extension = '.png'
+                image.save(buffer, 'PNG', optimize=True)
+            else:
+                extension = '.jpg'
+                image.convert('RGB').save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Rasmni siqib bo'lmadi ({image_file.name}): {e}")
+        return None
+    finally:
+        image_file.seek(0)
+
+    # Kamida 10% tejash kerak - avval siqilgan rasm qayta-qayta kodlanmaydi
+    if buffer.tell() >= original_size * 0.9:
+        return None
+    name = os.path.splitext(os.path.basename(image_file.name))[0] + extension
+    return ContentFile(buffer.getvalue(), name=name)
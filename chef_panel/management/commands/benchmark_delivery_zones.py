@@ -0,0 +1,110 @@
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chef_panel.delivery import ZoneIndex, ZoneTariff, compile_polygon, point_in_polygon, validate_polygon
+from chef_panel.models import DeliveryZone
+
+# Sintetik hududlar markazi (telegram_bot.STORE_LAT / STORE_LON)
+CENTER_LAT, CENTER_LON = 40.665236, 72.563908
+
+
+def synthetic_zones(count, points, rng):
+    """Markaz atrofida tasodifiy "yulduzsimon" (o'zini kesmaydigan) ko'pburchaklar"""
+    zones = []
+    for i in range(count):
+        lat = CENTER_LAT + rng.uniform(-0.1, 0.1)
+        lon = CENTER_LON + rng.uniform(-0.13, 0.13)
+        radius = rng.uniform(0.01, 0.05)
+        polygon = []
+        for k in range(points):
+            angle = 2 * math.pi * k / points
+            r = radius * rng.uniform(0.4, 1.0)
+            polygon.append([lat + r * math.sin(angle), lon + r * 1.3 * math.cos(angle)])
+        zones.append((f"Hudud {i + 1}", polygon, i))
+    return zones
+
+
+class Command(BaseCommand):
+    help = "Yetkazib berish hududlari indeksining tezligi: N ta tasodifiy nuqta (indeks va oddiy ray casting)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=1_000_000, help="Tasodifiy nuqtalar soni")
+        parser.add_argument('--zones', type=int, default=30, help="Sintetik hududlar soni")
+        parser.add_argument('--points', type=int, default=200, help="Har bir sintetik hududdagi nuqtalar soni")
+        parser.add_argument('--naive-lookups', type=int, default=5_000,
+                            help="Oddiy ray casting uchun nuqtalar soni (u sekin - natija nuqta boshiga hisoblanadi)")
+        parser.add_argument('--from-db', action='store_true', help="Sintetik emas, bazadagi faol hududlar")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['from_db']:
+            zones = [(zone.name, zone.polygon, zone.priority)
+                     for zone in DeliveryZone.objects.filter(is_active=True)]
+            if not zones:
+                raise CommandError("Bazada faol hudud yo'q")
+        else:
+            zones = synthetic_zones(options['zones'], options['points'], rng)
+            for _, polygon, _ in zones:
+                validate_polygon(polygon)
+
+        started = time.perf_counter()
+        ordered = sorted(zones, key=lambda zone: -zone[2])
+        compiled = [compile_polygon(polygon) for _, polygon, _ in ordered]
+        index = ZoneIndex([
+            (ZoneTariff(i, name, 0, 0), compiled[i]) for i, (name, _, _) in enumerate(ordered)
+        ])
+        build_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(
+            f"{len(ordered)} ta hudud, {sum(len(p) for _, p, _ in ordered)} ta nuqta: "
+            f"indeks {build_ms:.1f} ms da qurildi"
+        )
+
+        # Nuqtalar hamma hududlar chegarasi + 10% atrofida (bir qismi tashqarida)
+        min_lat, min_lon, max_lat, max_lon = index.bbox
+        pad_lat, pad_lon = (max_lat - min_lat) * 0.1, (max_lon - min_lon) * 0.1
+        points = [
+            (rng.uniform(min_lat - pad_lat, max_lat + pad_lat), rng.uniform(min_lon - pad_lon, max_lon + pad_lon))
+            for _ in range(options['lookups'])
+        ]
+
+        started = time.perf_counter()
+        hits = 0
+        for lat, lon in points:
+            if index.lookup(lat, lon) is not None:
+                hits += 1
+        indexed_s = time.perf_counter() - started
+
+        def naive(lat, lon):
+            for i, (_, polygon, _) in enumerate(ordered):
+                if point_in_polygon(polygon, lat, lon):
+                    return i
+            return None
+
+        sample = points[:options['naive_lookups']]
+        started = time.perf_counter()
+        expected = [naive(lat, lon) for lat, lon in sample]
+        naive_s = time.perf_counter() - started
+
+        mismatches = sum(
+            1 for (lat, lon), zone in zip(sample, expected)
+            if getattr(index.lookup(lat, lon), 'zone_id', None) != zone
+        )
+        if mismatches:
+            raise CommandError(f"Indeks va ray casting {mismatches} ta nuqtada farq qiladi")
+
+        indexed_us = indexed_s / len(points) * 1e6
+        naive_us = naive_s / max(len(sample), 1) * 1e6
+        self.stdout.write(
+            f"indeks:      {len(points):,} ta nuqta {indexed_s:.2f} s ({indexed_us:.2f} mks/nuqta, "
+            f"{len(points) / indexed_s:,.0f} nuqta/s), {hits / len(points):.0%} hududda"
+        )
+        self.stdout.write(
+            f"ray casting: {len(sample):,} ta nuqta {naive_s:.2f} s ({naive_us:.2f} mks/nuqta)"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Natijalar mos ({len(sample):,} ta nuqta tekshirildi), indeks {naive_us / indexed_us:.0f}x tezroq"
+        ))
@@ -0,0 +1,112 @@
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from chef_panel import export
+from chef_panel.models import Customer, Order, OrderItem, OrderStatusHistory, OrderTombstone, Product
+from chef_panel.order_history import customer_orders_queryset
+from chef_panel.pagination import NEXT, PREV, cursor_queryset
+from chef_panel.search import search_orders
+from chef_panel.views import BOARD_ORDERS_Q, _with_row_data
+
+# "SCAN jadval" - to'liq jadval, "SCAN jadval USING INDEX x" - butun indeks bo'ylab yurish.
+# "SCAN ... VIRTUAL TABLE" (FTS5 MATCH) o'z indeksidan foydalanadi - hisobga olinmaydi
+SCAN_RE = re.compile(r'\bSCAN (\w+)\b(?! VIRTUAL TABLE)(?: USING (?:COVERING )?INDEX (\w+))?')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def _plans():
+    """
+    (nomi, queryset, ruxsatlar) - view lar bajaradigan asosiy so'rovlar.
+    Ruxsatlar:
+      ordered_scan - LIMIT li "eng yangilari" ro'yxati saralash indeksi bo'ylab yurishi mumkin
+      sort         - natija kichik, vaqtinchalik saralash maqbul
+    """
+    now = timezone.now()
+    return [
+        ("Oshpaz doskasi (new_orders, dashboard)",
+         _with_row_data(Order.objects.filter(BOARD_ORDERS_Q)).order_by('-created_at'), {'sort'}),
+        ("Buyurtmalar ro'yxati, 1-sahifa",
+         _with_row_data(Order.objects.all()).order_by('-created_at', '-id')[:21], {'ordered_scan'}),
+        ("Buyurtmalar ro'yxati, keyingi sahifa",
+         cursor_queryset(_with_row_data(Order.objects.all()), now, 1000, NEXT)[:21], set()),
+        ("Buyurtmalar ro'yxati, oldingi sahifa",
+         cursor_queryset(_with_row_data(Order.objects.all()), now, 1000, PREV)[:21], set()),
+        ("Buyurtmalar ro'yxati, holat filtri",
+         _with_row_data(Order.objects.filter(status='yetkazildi')).order_by('-created_at', '-id')[:21], set()),
+        ("Buyurtmalar ro'yxati, holat filtri, keyingi sahifa",
+         cursor_queryset(_with_row_data(Order.objects.filter(status='yetkazildi')), now, 1000, NEXT)[:21], set()),
+        ("Buyurtmalar ro'yxati, xizmat turi filtri",
+         _with_row_data(Order.objects.filter(service_type='pickup')).order_by('-created_at', '-id')[:21],
+         {'ordered_scan'}),
+        ("Qidiruv: buyurtma raqami",
+         search_orders(Order.objects.all(), '#1234').order_by('-created_at', '-id')[:21], {'sort'}),
+        ("Qidiruv: telefon",
+         search_orders(Order.objects.all(), '901234567').order_by('-created_at', '-id')[:21], {'sort'}),
+        ("Delta API (order_changes_api ?since=): o'zgarishlar oynasi",
+         Order.objects.filter(updated_at__gt=now).order_by().values_list('id', 'updated_at'), set()),
+        ("Delta API: o'chirilgan buyurtmalar",
+         OrderTombstone.objects.filter(deleted_at__gt=now).values_list('order_id', 'deleted_at'), set()),
+        ("Delta API: oynadagi buyurtmalar kartochkasi",
+         _with_row_data(Order.objects.filter(id__in=[1, 2, 3])).order_by(), set()),
+        ("Mijoz buyurtmalar tarixi (bot, get_user_orders_api)",
+         customer_orders_queryset(1)[:6], set()),
+        ("Buyurtma elementlari", OrderItem.objects.filter(order_id=1).select_related('product'), set()),
+        ("Buyurtma holat tarixi",
+         OrderStatusHistory.objects.filter(order_id=1).select_related('changed_by').order_by('changed_at'), set()),
+        ("Eksport: sana oralig'i",
+         export.export_queryset(date(2025, 1, 1), date(2025, 1, 31)), set()),
+        ("Checkout: mahsulot nomi bo'yicha", Product.objects.filter(name='Osh').order_by()[:1], set()),
+        ("Checkout: mijoz telegram_id bo'yicha", Customer.objects.filter(telegram_id=1), set()),
+        ("Mijoz telefon raqami bo'yicha", Customer.objects.filter(phone_digits='998901234567'), set()),
+        ("Dashboard: eng ko'p buyurtma bergan mijozlar",
+         Customer.objects.order_by('-order_count', '-id')[:10], {'ordered_scan'}),
+    ]
+
+
+def plan_problems(plan, allowed):
+    """EXPLAIN QUERY PLAN matnidagi muammolar ro'yxati (bo'sh - yaxshi)"""
+    problems = []
+    for match in SCAN_RE.finditer(plan):
+        table, index = match.groups()
+        if index is None:
+            problems.append(f"to'liq skan: {table}")
+        elif 'ordered_scan' not in allowed:
+            problems.append(f"indeks bo'ylab to'liq yurish: {table} ({index})")
+    if TEMP_SORT in plan and 'sort' not in allowed:
+        problems.append("vaqtinchalik saralash (ORDER BY indeksdan olinmadi)")
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Asosiy view so'rovlari uchun EXPLAIN QUERY PLAN ni tekshirish: to'liq skan yoki "
+        "kutilmagan saralash bo'lsa xato bilan tugaydi (CI/migratsiyadan keyin ishlatish uchun)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Har bir so'rov rejasini to'liq chiqarish")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Reja tekshiruvi faqat SQLite EXPLAIN QUERY PLAN formati uchun yozilgan")
+
+        failed = 0
+        for name, queryset, allowed in _plans():
+            plan = queryset.explain()
+            problems = plan_problems(plan, allowed)
+            if problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"XATO  {name}: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(f"OK    {name}")
+            if problems or options['verbose_plans']:
+                self.stdout.write('      ' + plan.replace('\n', '\n      '))
+
+        if failed:
+            raise CommandError(f"{failed} ta so'rov rejasi regressiyaga uchragan")
+        self.stdout.write(self.style.SUCCESS("Barcha so'rov rejalari indekslardan foydalanadi"))
@@ -0,0 +1,45 @@
+import sys
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from chef_panel import export
+
+
+class Command(BaseCommand):
+    help = "Buyurtmalarni (elementlar va holat tarixi bilan) CSV/NDJSON/XLSX ga oqim bilan eksport qilish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='csv')
+        parser.add_argument('--from', dest='date_from', help="Boshlanish sanasi (YYYY-MM-DD), standart: 30 kun oldin")
+        parser.add_argument('--to', dest='date_to', help="Tugash sanasi (YYYY-MM-DD, kiradi), standart: bugun")
+        parser.add_argument('--gzip', action='store_true', help="Natijani gzip bilan siqish")
+        parser.add_argument('--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('-o', '--output', help="Fayl yo'li (standart: stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else timezone.localdate()
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else date_to - timedelta(days=30)
+        except ValueError:
+            raise CommandError("Sana YYYY-MM-DD formatida bo'lishi kerak")
+        if date_from > date_to:
+            raise CommandError("--from sanasi --to dan keyin bo'lishi mumkin emas")
+
+        chunks = export.export_chunks(
+            options['format'], date_from, date_to,
+            use_gzip=options['gzip'], chunk_size=options['chunk_size'],
+        )
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"{options['output']}: {written} bayt yozildi"))
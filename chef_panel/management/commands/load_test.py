@@ -0,0 +1,77 @@
+import asyncio
+import json
+import time
+from collections import Counter
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _percentile(latencies, percent):
+    return latencies[max(int(len(latencies) * percent / 100) - 1, 0)] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Ishlab turgan serverga (runserver, gunicorn yoki uvicorn) bir vaqtda HTTP so'rovlar "
+        "yuborib o'tkazuvchanlik (req/s) va kechikish (p50/p95/p99) ni o'lchash. "
+        "WSGI va ASGI rejimlarini bir xil so'rovlar bilan solishtirish uchun."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="Masalan: http://127.0.0.1:8000/chef_panel/api/orders/changes/")
+        parser.add_argument('--requests', type=int, default=500, help="Jami so'rovlar soni")
+        parser.add_argument('--concurrency', type=int, default=50, help="Bir vaqtdagi so'rovlar soni")
+        parser.add_argument('--method', default='GET', choices=['GET', 'POST'])
+        parser.add_argument('--data', help="POST uchun JSON tana (masalan create_order_api payloadi)")
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        if options['data']:
+            try:
+                json.loads(options['data'])
+            except ValueError as e:
+                raise CommandError(f"--data JSON emas: {e}")
+        latencies, statuses, elapsed = asyncio.run(self._run(options))
+
+        failed = sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 400)
+        self.stdout.write(f"{options['method']} {options['url']}: {options['requests']} ta so'rov, concurrency {options['concurrency']}")
+        self.stdout.write(f"Holat kodlari: {dict(statuses)}")
+        if latencies:
+            latencies.sort()
+            self.stdout.write(
+                f"{len(latencies) / elapsed:.1f} req/s ({elapsed:.2f}s), "
+                f"p50 {_percentile(latencies, 50):.1f} ms, p95 {_percentile(latencies, 95):.1f} ms, "
+                f"p99 {_percentile(latencies, 99):.1f} ms, max {latencies[-1] * 1000:.1f} ms"
+            )
+        if failed:
+            raise CommandError(f"{failed} ta so'rov xato bilan tugadi")
+        self.stdout.write(self.style.SUCCESS("Barcha so'rovlar muvaffaqiyatli"))
+
+    async def _run(self, options):
+        queue = asyncio.Queue()
+        for _ in range(options['requests']):
+            queue.put_nowait(None)
+        latencies = []
+        statuses = Counter()
+        content = options['data'].encode() if options['data'] else None
+        headers = {'Content-Type': 'application/json'} if content else {}
+        limits = httpx.Limits(max_connections=options['concurrency'], max_keepalive_connections=options['concurrency'])
+
+        async with httpx.AsyncClient(timeout=options['timeout'], limits=limits) as client:
+            async def worker():
+                while not queue.empty():
+                    queue.get_nowait()
+                    start = time.perf_counter()
+                    try:
+                        response = await client.request(options['method'], options['url'], content=content, headers=headers)
+                    except httpx.HTTPError as e:
+                        statuses[type(e).__name__] += 1
+                        continue
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+            elapsed = time.perf_counter() - start
+        return latencies, statuses, elapsed
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chef_panel.images import optimize_image
+from chef_panel.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Avval yuklangan mahsulot rasmlarini PRODUCT_IMAGE_MAX_SIZE gacha kichraytirib qayta siqish "
+        "(yangi yuklanganlari Product.save() da avtomatik siqiladi)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Faqat qancha joy tejalishini ko'rsatish")
+        parser.add_argument('--delete-originals', action='store_true',
+                            help="Asl fayllarni o'chirish (bot rasm yo'llarini keshlaydi - keyin botni qayta ishga tushiring)")
+
+    def handle(self, *args, **options):
+        optimized_count = 0
+        saved = 0
+        for product in Product.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image'):
+            storage = product.image.storage
+            old_name = product.image.name
+            if not storage.exists(old_name):
+                self.stderr.write(f"Rasm topilmadi: {old_name} (mahsulot {product.id})")
+                continue
+            with storage.open(old_name) as image_file:
+                optimized = optimize_image(image_file, settings.PRODUCT_IMAGE_MAX_SIZE, settings.PRODUCT_IMAGE_QUALITY)
+                old_size = image_file.size
+            if optimized is None:
+                continue
+            optimized_count += 1
+            saved += old_size - optimized.size
+            if options['dry_run']:
+                continue
+            product.image.save(optimized.name, optimized, save=False)
+            Product.objects.filter(id=product.id).update(image=product.image.name)
+            if options['delete_originals'] and product.image.name != old_name:
+                storage.delete(old_name)
+
+        action = "siqiladi" if options['dry_run'] else "siqildi"
+        self.stdout.write(self.style.SUCCESS(
+            f"{optimized_count} ta rasm {action}, {saved / 1024 / 1024:.1f} MB tejaldi"
+        ))
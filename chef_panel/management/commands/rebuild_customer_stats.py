@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from chef_panel.models import Customer, Order, customer_stats_expressions
+
+
+class Command(BaseCommand):
+    help = "Mijozlarning order_count, total_spent va last_order_at hisoblagichlarini buyurtmalardan qayta hisoblash"
+
+    def handle(self, *args, **options):
+        updated = Customer.objects.update(**customer_stats_expressions(Order))
+        self.stdout.write(self.style.SUCCESS(f"{updated} ta mijoz hisoblagichlari qayta hisoblandi"))
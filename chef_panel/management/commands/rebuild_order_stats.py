@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from chef_panel.models import Order, OrderDailyStats
+
+
+class Command(BaseCommand):
+    help = "OrderDailyStats rollup jadvalini buyurtmalar tarixidan qayta qurish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="bulk_create uchun paket hajmi")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        rows = (
+            Order.objects
+            .annotate(date=TruncDate('created_at'))
+            .values('date', 'branch_id', 'status', 'service_type', 'payment_method')
+            .annotate(
+                order_count=Count('id'),
+                products_total=Sum('products_total'),
+                delivery_cost=Sum('delivery_cost'),
+                total_amount=Sum('total_amount'),
+            )
+            .order_by()
+        )
+
+        created = 0
+        with transaction.atomic():
+            OrderDailyStats.objects.all().delete()
+            batch = []
+            for row in rows.iterator():
+                batch.append(OrderDailyStats(**row))
+                if len(batch) >= batch_size:
+                    OrderDailyStats.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                OrderDailyStats.objects.bulk_create(batch)
+                created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"{created} ta statistika qatori qayta qurildi"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chef_panel import search
+from chef_panel.models import Customer
+
+
+class Command(BaseCommand):
+    help = "Mijozlar qidiruv matnini (phone_digits, search_text) va FTS indeksini qayta qurish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="bulk_update uchun paket hajmi")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        with transaction.atomic():
+            batch = []
+            for customer in Customer.objects.only('id', 'full_name', 'phone_number').iterator(chunk_size=batch_size):
+                customer.phone_digits = search.normalize_phone(customer.phone_number)
+                customer.search_text = search.build_search_text(customer.full_name, customer.phone_digits)
+                batch.append(customer)
+                if len(batch) >= batch_size:
+                    Customer.objects.bulk_update(batch, ['phone_digits', 'search_text'])
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                Customer.objects.bulk_update(batch, ['phone_digits', 'search_text'])
+                updated += len(batch)
+            search.rebuild_customer_index()
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} ta mijoz qidiruv indeksiga qayta yozildi"))
@@ -0,0 +1,161 @@
+import multiprocessing
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.utils import timezone
+
+from chef_panel.db import write_transaction
+from chef_panel.models import Customer, Order, OrderStatusHistory, Product
+from chef_panel.order_status import STATUS_TIMESTAMPS
+from chef_panel.views import _create_order_from_api
+
+# Sinov mijozlari shu oraliqdagi manfiy telegram_id lar bilan yaratiladi va oxirida o'chiriladi
+STRESS_TELEGRAM_ID_BASE = -9_000_000_000
+
+# Har bir sinov buyurtmasi shu holatlardan o'tkaziladi (update_order_status kabi)
+STATUS_FLOW = {
+    'pickup': ['tasdiqlangan', 'tayor', 'olib_ketildi'],
+    'delivery': ['tasdiqlangan', 'tayor', 'yolda', 'yetkazildi'],
+}
+
+
+@write_transaction
+def _change_status(order_id, new_status):
+    """update_order_status view dagi ORM yozuvlari (Telegram xabarlarisiz)"""
+    order = Order.objects.select_related('customer').get(id=order_id)
+    old_status = order.status
+    order.status = new_status
+    if new_status in STATUS_TIMESTAMPS:
+        setattr(order, STATUS_TIMESTAMPS[new_status], timezone.now())
+    order.save()
+    OrderStatusHistory.objects.create(
+        order=order, old_status=old_status, new_status=new_status, notes='Stress test',
+    )
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def _checkout_worker(worker, orders, products, results):
+    """Alohida jarayon: checkout (create_order_api tranzaksiyasi) va holat yangilashlarini ketma-ket bajarish"""
+    connections.close_all()
+    checkouts = []
+    status_updates = []
+    failed = 0
+    for i in range(orders):
+        data = {
+            'user_id': STRESS_TELEGRAM_ID_BASE - worker * 1_000_000 - i % 50,
+            'full_name': f"Stress {worker}-{i % 50}",
+            'phone': f"+99890{worker:03d}{i % 50:04d}",
+            'payment_method': 'naqd',
+            'service_type': 'delivery' if i % 2 else 'pickup',
+            'location': {'latitude': 40.66, 'longitude': 72.56},
+            'address': "Stress test",
+            'products_total': Decimal('50000'),
+            'delivery_cost': Decimal('10000'),
+            'total': Decimal('60000'),
+            'products': [[name, 1 + i % 3, Decimal('25000')] for name in products],
+        }
+        try:
+            start = time.perf_counter()
+            order = _create_order_from_api(data)
+            checkouts.append(time.perf_counter() - start)
+            for new_status in STATUS_FLOW[order.service_type]:
+                status_updates.append(_timed(_change_status, order.id, new_status))
+        except DatabaseError:
+            failed += 1
+    connections.close_all()
+    results.put((worker, checkouts, status_updates, failed))
+
+
+def _summary(latencies):
+    if not latencies:
+        return "0 ta"
+    latencies = sorted(latencies)
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
+    return f"{len(latencies)} ta, median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95:.1f} ms"
+
+
+class Command(BaseCommand):
+    help = (
+        "Bir nechta jarayondan bir vaqtda checkout va holat yangilash - bazaning (SQLite "
+        "qulf sozlamalari yoki PostgreSQL pool) o'tkazuvchanligini o'lchash. "
+        "Sinov ma'lumotlari oxirida o'chiriladi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2,
+                            help="Parallel jarayonlar soni (web + bot = 2)")
+        parser.add_argument('--orders', type=int, default=200,
+                            help="Har bir jarayon yaratadigan buyurtmalar soni")
+        parser.add_argument('--keep', action='store_true',
+                            help="Sinov buyurtmalarini o'chirmaslik")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+                cursor.execute('PRAGMA busy_timeout')
+                busy_timeout = cursor.fetchone()[0]
+            self.stdout.write(f"journal_mode={journal_mode}, busy_timeout={busy_timeout} ms")
+        else:
+            self.stdout.write(f"{connection.vendor}, pool={bool(connection.settings_dict['OPTIONS'].get('pool'))}")
+
+        products = list(Product.objects.values_list('name', flat=True)[:2])
+        if not products:
+            raise CommandError("Kamida bitta mahsulot kerak")
+
+        processes = options['processes']
+        orders = options['orders']
+        connections.close_all()
+        if connection.vendor == 'postgresql':
+            # pool ning fon oqimlari fork dan keyin ishlamaydi - har bir jarayon o'zinikini ochadi
+            connection.close_pool()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(target=_checkout_worker, args=(worker, orders, products, results))
+            for worker in range(processes)
+        ]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        collected = [results.get() for _ in workers]
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        total_failed = 0
+        all_checkouts = []
+        all_updates = []
+        for worker, checkouts, status_updates, failed in sorted(collected):
+            total_failed += failed
+            all_checkouts += checkouts
+            all_updates += status_updates
+            self.stdout.write(
+                f"jarayon {worker}: checkout {_summary(checkouts)}; "
+                f"holat {_summary(status_updates)}; {failed} ta xato"
+            )
+        total_checkouts = len(all_checkouts)
+        total_updates = len(all_updates)
+        self.stdout.write(
+            f"Jami {elapsed:.1f}s: {total_checkouts} ta checkout ({total_checkouts / elapsed:.0f} ta/s), "
+            f"{total_updates} ta holat yangilash ({total_updates / elapsed:.0f} ta/s)"
+        )
+        self.stdout.write(f"Barcha checkoutlar: {_summary(all_checkouts)}")
+        self.stdout.write(f"Barcha holat yangilashlar: {_summary(all_updates)}")
+
+        if not options['keep']:
+            low = STRESS_TELEGRAM_ID_BASE - processes * 1_000_000
+            Customer.objects.filter(telegram_id__lte=STRESS_TELEGRAM_ID_BASE, telegram_id__gt=low).delete()
+
+        if total_failed:
+            raise CommandError(f"{total_failed} ta buyurtma baza xatosi bilan tugadi")
+        self.stdout.write(self.style.SUCCESS("Barcha checkoutlar muvaffaqiyatli"))
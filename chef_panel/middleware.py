@@ -0,0 +1,72 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import profiling
+from .query_budget import QueryBudgetExceeded, QueryCounter, get_query_budget
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """
+    Debug middleware: @query_budget bilan belgilangan view e'lon qilingan
+    so'rovlar sonidan oshsa xato beradi (QUERY_BUDGET_STRICT) yoki log yozadi.
+    Javobga X-Query-Count sarlavhasini qo'shadi.
+
+    ProfilingMiddleware kabi faqat sync: o'chirilgan bo'lsa zanjirdan chiqadi,
+    shunda ASGI da async view lar thread ga o'tkazilmasdan ishlaydi.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.strict = getattr(settings, 'QUERY_BUDGET_STRICT', False)
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        request.query_budget = None
+        with counter.capture():
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = str(counter.count)
+        budget = request.query_budget
+        if budget is not None and counter.count > budget:
+            error = QueryBudgetExceeded(request.path, budget, counter.queries)
+            if self.strict:
+                raise error
+            logger.error(str(error))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    PROFILING_PATH_PREFIXES ostidagi so'rovlar uchun db/shablon/Telegram/umumiy
+    vaqtlarni Server-Timing sarlavhasi va logga yozadi (chef_panel.profiling).
+    PROFILING_ENABLED=False bo'lsa zanjirdan butunlay chiqadi.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefixes = tuple(getattr(settings, 'PROFILING_PATH_PREFIXES', ('/chef_panel/',)))
+
+    def __call__(self, request):
+        if not request.path.startswith(self.prefixes):
+            return self.get_response(request)
+
+        profile = profiling.RequestProfile(request.method, request.get_full_path())
+        with profiling.profile_request(profile):
+            response = self.get_response(request)
+
+        profile.status = response.status_code
+        response['Server-Timing'] = profile.server_timing()
+        profiling.record(profile)
+        return response
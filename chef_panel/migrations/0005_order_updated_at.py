@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chef_panel', '0004_alter_botsettings_broadcast_message_text_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='picked_up_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Olib ketilgan vaqti'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='service_type',
+            field=models.CharField(choices=[('delivery', 'Yetkazib berish'), ('pickup', 'Olib ketish')], default='delivery', max_length=20, verbose_name='Xizmat turi'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Yangilangan vaqti'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='delivery_cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Yetkazib berish narxi'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('yangi', 'Yangi'), ('tasdiqlangan', 'Tasdiqlangan'), ('tayor', 'Tayor'), ('yolda', "Yo'lda"), ('yetkazildi', 'Yetkazildi'), ('olib_ketildi', 'Olib ketildi'), ('bekor_qilingan', 'Bekor qilingan')], default='yangi', max_length=20, verbose_name='Holati'),
+        ),
+    ]
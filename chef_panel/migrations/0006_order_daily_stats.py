@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:39
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_order_daily_stats(apps, schema_editor):
+    Order = apps.get_model('chef_panel', 'Order')
+    OrderDailyStats = apps.get_model('chef_panel', 'OrderDailyStats')
+    rows = (
+        Order.objects
+        .annotate(date=TruncDate('created_at'))
+        .values('date', 'status', 'service_type', 'payment_method')
+        .annotate(
+            order_count=Count('id'),
+            products_total=Sum('products_total'),
+            delivery_cost=Sum('delivery_cost'),
+            total_amount=Sum('total_amount'),
+        )
+        .order_by()
+    )
+    OrderDailyStats.objects.bulk_create([OrderDailyStats(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chef_panel', '0005_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Sana')),
+                ('status', models.CharField(choices=[('yangi', 'Yangi'), ('tasdiqlangan', 'Tasdiqlangan'), ('tayor', 'Tayor'), ('yolda', "Yo'lda"), ('yetkazildi', 'Yetkazildi'), ('olib_ketildi', 'Olib ketildi'), ('bekor_qilingan', 'Bekor qilingan')], max_length=20, verbose_name='Holati')),
+                ('service_type', models.CharField(choices=[('delivery', 'Yetkazib berish'), ('pickup', 'Olib ketish')], max_length=20, verbose_name='Xizmat turi')),
+                ('payment_method', models.CharField(choices=[('naqd', 'Naqd'), ('karta', 'Karta'), ('online', "Online to'lov")], max_length=20, verbose_name="To'lov usuli")),
+                ('order_count', models.IntegerField(default=0, verbose_name='Buyurtmalar soni')),
+                ('products_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Mahsulotlar summasi')),
+                ('delivery_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Yetkazib berish summasi')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Umumiy summa')),
+            ],
+            options={
+                'verbose_name': 'Kunlik statistika',
+                'verbose_name_plural': 'Kunlik statistika',
+                'ordering': ['-date', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'status', 'service_type', 'payment_method'), name='unique_order_daily_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_order_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:41
+
+from django.db import migrations, models
+
+from chef_panel import search
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {search.CUSTOMER_FTS_TABLE} USING fts5("
+            f"search_text, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    elif vendor == 'postgresql':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            available = cursor.fetchone() is not None
+        if not available:
+            # contrib paketisiz server: qidiruv ishlaydi, lekin search_text bo'yicha indekssiz
+            print("\n  pg_trgm mavjud emas - chef_panel_customer_search_trgm indeksi yaratilmadi", end='')
+            return
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS chef_panel_customer_search_trgm "
+            "ON chef_panel_customer USING gin (search_text gin_trgm_ops)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {search.CUSTOMER_FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS chef_panel_customer_search_trgm")
+
+
+def backfill_search_text(apps, schema_editor):
+    Customer = apps.get_model('chef_panel', 'Customer')
+    customers = list(Customer.objects.only('id', 'full_name', 'phone_number'))
+    for customer in customers:
+        customer.phone_digits = search.normalize_phone(customer.phone_number)
+        customer.search_text = search.build_search_text(customer.full_name, customer.phone_digits)
+    Customer.objects.bulk_update(customers, ['phone_digits', 'search_text'], batch_size=1000)
+    search.rebuild_customer_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chef_panel', '0006_order_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='Telefon (raqamlar)'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='Qidiruv matni'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+    ]
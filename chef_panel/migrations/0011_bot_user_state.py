@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chef_panel', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotUserState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('telegram_id', models.BigIntegerField(unique=True, verbose_name='Telegram ID')),
+                ('data', models.JSONField(default=dict, verbose_name='Holat')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan vaqti')),
+            ],
+            options={
+                'verbose_name': 'Bot foydalanuvchi holati',
+                'verbose_name_plural': 'Bot foydalanuvchi holatlari',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:23
+
+from django.db import migrations, models
+
+from chef_panel.models import customer_stats_expressions
+
+
+def backfill_customer_stats(apps, schema_editor):
+    Customer = apps.get_model('chef_panel', 'Customer')
+    Order = apps.get_model('chef_panel', 'Order')
+    Customer.objects.update(**customer_stats_expressions(Order))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chef_panel', '0011_bot_user_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='last_order_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Oxirgi buyurtma vaqti'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Buyurtmalar soni'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Jami xarid'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-order_count', '-id'], name='customer_order_count_idx'),
+        ),
+        migrations.RunPython(backfill_customer_stats, migrations.RunPython.noop),
+    ]
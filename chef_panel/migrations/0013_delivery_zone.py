@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:53
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chef_panel', '0012_customer_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nomi')),
+                ('polygon', models.JSONField(help_text='[[lat, lon], [lat, lon], ...] - kamida 3 ta nuqta (kenglik, uzunlik)', verbose_name='Chegara')),
+                ('base_cost', models.DecimalField(decimal_places=2, default=5000, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name="Boshlang'ich narx (so'm)")),
+                ('cost_per_km', models.DecimalField(decimal_places=2, default=0, help_text="Birinchi kilometrdan keyin; 0 - hudud bo'yicha qat'iy narx", max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name="Har km uchun qo'shimcha narx (so'm)")),
+                ('priority', models.IntegerField(default=0, help_text='Hududlar ustma-ust tushsa ustuvorligi kattasi tanlanadi', verbose_name='Ustuvorlik')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Faol')),
+                ('index', models.JSONField(default=dict, editable=False, verbose_name='Kompilyatsiya qilingan indeks')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan vaqti')),
+            ],
+            options={
+                'verbose_name': 'Yetkazib berish hududi',
+                'verbose_name_plural': 'Yetkazib berish hududlari',
+                'ordering': ['-priority', 'name'],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:57
+
+import datetime
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chef_panel', '0013_delivery_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Branch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nomi')),
+                ('address', models.TextField(blank=True, verbose_name='Manzil')),
+                ('latitude', models.FloatField(validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='Kenglik')),
+                ('longitude', models.FloatField(validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='Uzunlik')),
+                ('opening_time', models.TimeField(default=datetime.time(10, 0), verbose_name='Ochilish vaqti')),
+                ('closing_time', models.TimeField(default=datetime.time(22, 0), help_text="Ochilishdan oldin bo'lsa - yarim tundan keyin yopiladi", verbose_name='Yopilish vaqti')),
+                ('chef_chat_id', models.BigIntegerField(verbose_name='Oshpaz chat ID')),
+                ('courier_chat_id', models.BigIntegerField(verbose_name='Kuryer chat ID')),
+                ('delivery_radius_km', models.FloatField(default=10.0, validators=[django.core.validators.MinValueValidator(0.5), django.core.validators.MaxValueValidator(100.0)], verbose_name='Yetkazib berish radiusi (km)')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Faol')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan vaqti')),
+            ],
+            options={
+                'verbose_name': 'Filial',
+                'verbose_name_plural': 'Filiallar',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='orderdailystats',
+            name='unique_order_daily_stats',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='branch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='chef_panel.branch', verbose_name='Filial'),
+        ),
+        migrations.AddField(
+            model_name='orderdailystats',
+            name='branch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='chef_panel.branch', verbose_name='Filial'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderdailystats',
+            constraint=models.UniqueConstraint(condition=models.Q(('branch__isnull', True)), fields=('date', 'status', 'service_type', 'payment_method'), name='unique_order_daily_stats'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderdailystats',
+            constraint=models.UniqueConstraint(condition=models.Q(('branch__isnull', False)), fields=('date', 'branch', 'status', 'service_type', 'payment_method'), name='unique_order_daily_stats_branch'),
+        ),
+    ]
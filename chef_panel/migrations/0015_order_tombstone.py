@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chef_panel', '0014_branches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(verbose_name='Buyurtma ID')),
+                ('branch_id', models.BigIntegerField(blank=True, null=True, verbose_name='Filial ID')),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name="O'chirilgan vaqti")),
+            ],
+            options={
+                'verbose_name': "O'chirilgan buyurtma",
+                'verbose_name_plural': "O'chirilgan buyurtmalar",
+            },
+        ),
+    ]
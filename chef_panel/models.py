@@ -1,8 +1,23 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, connection, transaction, IntegrityError
+from django.db.models import Count, DecimalField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 import datetime
+import zlib
+from functools import partial
+
+from . import delivery, search
+from .images import optimize_image
+
+UNIX_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Buyurtma raqamini generatsiya qilishni ketma-ketlashtiruvchi PostgreSQL advisory lock kaliti
+ORDER_NUMBER_LOCK_KEY = zlib.crc32(b'chef_panel.order_number')
 
 class Category(models.Model):
     """Mahsulot kategoriyalari"""
@@ -34,24 +49,189 @@ class Product(models.Model):
         verbose_name = "Mahsulot"
         verbose_name_plural = "Mahsulotlar"
         ordering = ['category', 'name']
+        indexes = [
+            # Checkout da mahsulot nomi bo'yicha qidiriladi (bot va create_order_api)
+            models.Index(fields=['name'], name='product_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.price:,} so'm"
 
+    def save(self, *args, **kwargs):
+        # Yangi yuklangan rasm (panel yoki admin) saqlashdan oldin kichraytirib siqiladi
+        if self.image and not self.image._committed:
+            optimized = optimize_image(self.image, settings.PRODUCT_IMAGE_MAX_SIZE, settings.PRODUCT_IMAGE_QUALITY)
+            if optimized is not None:
+                self.image = optimized
+        super().save(*args, **kwargs)
+
+def customer_stats_expressions(order_model):
+    """
+    Customer hisoblagichlarini buyurtmalardan hisoblovchi UPDATE ifodalari
+    (rebuild_customer_stats va migratsiya uchun; order_model - tarixiy model ham bo'lishi mumkin)
+    """
+    orders = order_model.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+    active = orders.exclude(status='bekor_qilingan')
+    return {
+        'order_count': Coalesce(Subquery(active.annotate(value=Count('id')).values('value')), 0),
+        'total_spent': Coalesce(
+            Subquery(active.annotate(value=Sum('total_amount')).values('value')),
+            Value(0), output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+        'last_order_at': Subquery(orders.annotate(value=Max('created_at')).values('value')),
+    }
+
 class Customer(models.Model):
     """Mijozlar"""
     telegram_id = models.BigIntegerField(unique=True, verbose_name="Telegram ID")
     full_name = models.CharField(max_length=200, verbose_name="To'liq ismi")
     phone_number = models.CharField(max_length=20, verbose_name="Telefon raqami")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Qidiruv indeksi uchun (save() da hisoblanadi, chef_panel.search ga qarang)
+    phone_digits = models.CharField(max_length=20, blank=True, db_index=True, editable=False, verbose_name="Telefon (raqamlar)")
+    search_text = models.TextField(blank=True, editable=False, verbose_name="Qidiruv matni")
+    # Buyurtmalar bo'yicha hisoblagichlar (Order.save() va o'chirishda F() bilan yangilanadi,
+    # bekor qilinganlar hisobga olinmaydi); qayta hisoblash: manage.py rebuild_customer_stats
+    order_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Buyurtmalar soni")
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, verbose_name="Jami xarid")
+    last_order_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Oxirgi buyurtma vaqti")
+
+    # Faqat yuqoridagi F() yangilashlari yozadi - save() ularni eski qiymat bilan ustidan yozmaydi
+    COUNTER_FIELDS = ('order_count', 'total_spent', 'last_order_at')
 
     class Meta:
         verbose_name = "Mijoz"
         verbose_name_plural = "Mijozlar"
+        indexes = [
+            # Dashboard "eng ko'p buyurtma bergan mijozlar"
+            models.Index(fields=['-order_count', '-id'], name='customer_order_count_idx'),
+        ]
 
     def __str__(self):
         return f"{self.full_name} ({self.phone_number})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._indexed_search_text = instance.__dict__.get('search_text')
+        return instance
+
+    @classmethod
+    def upsert_for_checkout(cls, telegram_id, full_name, phone_number):
+        """
+        Checkout (create_order_api va bot) uchun mijoz. Ism va telefon o'zgarmagan bo'lsa -
+        bitta SELECT, hech narsa yozilmaydi; yangi mijoz yoki o'zgargan ma'lumotlar -
+        bitta INSERT ... ON CONFLICT (telegram_id) DO UPDATE (SQLite da + FTS yozuvi).
+        Hisoblagichlar (COUNTER_FIELDS) upsertda yangilanmaydi.
+        """
+        customer = (
+            cls.objects.filter(telegram_id=telegram_id)
+            .only('id', 'telegram_id', 'full_name', 'phone_number')
+            .first()
+        )
+        if customer is not None and (customer.full_name, customer.phone_number) == (full_name, phone_number):
+            return customer
+
+        customer = cls(telegram_id=telegram_id, full_name=full_name, phone_number=phone_number)
+        customer.phone_digits = search.normalize_phone(phone_number)
+        customer.search_text = search.build_search_text(full_name, customer.phone_digits)
+        with transaction.atomic(savepoint=False):
+            cls.objects.bulk_create(
+                [customer],
+                update_conflicts=True,
+                unique_fields=['telegram_id'],
+                update_fields=['full_name', 'phone_number', 'phone_digits', 'search_text'],
+            )
+            search.index_customer(customer.pk, customer.search_text)
+        customer._indexed_search_text = customer.search_text
+        return customer
+
+    @classmethod
+    def record_order(cls, customer_id, old_snapshot, new_snapshot):
+        """
+        Buyurtma snapshot'i (Order.STATS_FIELDS) o'zgarganda mijoz hisoblagichlarini
+        F() bilan yangilash. Yangi buyurtma: old_snapshot=None, o'chirilgan: new_snapshot=None.
+        """
+        def contribution(snapshot):
+            if snapshot is None or snapshot[1] == 'bekor_qilingan':
+                return 0, 0
+            return 1, snapshot[6] or 0
+
+        old_count, old_total = contribution(old_snapshot)
+        new_count, new_total = contribution(new_snapshot)
+        updates = {}
+        if new_count != old_count:
+            updates['order_count'] = F('order_count') + (new_count - old_count)
+        if new_total != old_total:
+            updates['total_spent'] = F('total_spent') + (new_total - old_total)
+        if old_snapshot is None and new_snapshot is not None:
+            updates['last_order_at'] = new_snapshot[0]
+        if updates:
+            cls.objects.filter(pk=customer_id).update(**updates)
+
+    def save(self, *args, **kwargs):
+        self.phone_digits = search.normalize_phone(self.phone_number)
+        self.search_text = search.build_search_text(self.full_name, self.phone_digits)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        if update_fields is not None and {'full_name', 'phone_number'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'phone_digits', 'search_text'}
+        if not self._state.adding and self.search_text == getattr(self, '_indexed_search_text', None):
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            search.index_customer(self.pk, self.search_text)
+        self._indexed_search_text = self.search_text
+
+class Branch(models.Model):
+    """
+    Filial (oshxona). Yetkazib berish buyurtmasi mijozga eng yaqin ochiq filialga
+    yo'naltiriladi (chef_panel.delivery.BranchIndex), xabarlar shu filial chatlariga ketadi.
+    Buyurtmalari bor filial o'chirilmaydi - faolsizlantiriladi.
+    """
+    name = models.CharField(max_length=100, verbose_name="Nomi")
+    address = models.TextField(blank=True, verbose_name="Manzil")
+    latitude = models.FloatField(
+        verbose_name="Kenglik",
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        verbose_name="Uzunlik",
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    opening_time = models.TimeField(default=datetime.time(10, 0), verbose_name="Ochilish vaqti")
+    closing_time = models.TimeField(
+        default=datetime.time(22, 0),
+        verbose_name="Yopilish vaqti",
+        help_text="Ochilishdan oldin bo'lsa - yarim tundan keyin yopiladi"
+    )
+    chef_chat_id = models.BigIntegerField(verbose_name="Oshpaz chat ID")
+    courier_chat_id = models.BigIntegerField(verbose_name="Kuryer chat ID")
+    delivery_radius_km = models.FloatField(
+        default=10.0,
+        verbose_name="Yetkazib berish radiusi (km)",
+        validators=[MinValueValidator(0.5), MaxValueValidator(100.0)]
+    )
+    is_active = models.BooleanField(default=True, verbose_name="Faol")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Yangilangan vaqti")
+
+    class Meta:
+        verbose_name = "Filial"
+        verbose_name_plural = "Filiallar"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def is_open(self, moment=None):
+        """Filial hozir (yoki moment da, mahalliy vaqt) ochiqmi"""
+        return delivery.is_open(self.opening_time, self.closing_time, moment)
+
 class Order(models.Model):
     """Buyurtmalar"""
     STATUS_CHOICES = [
@@ -76,6 +256,10 @@ class Order(models.Model):
     ]
 
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, verbose_name="Mijoz")
+    branch = models.ForeignKey(
+        Branch, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='orders', verbose_name="Filial"
+    )
     telegram_user_id = models.BigIntegerField(verbose_name="Telegram User ID", null=True, blank=True)
     order_number = models.CharField(max_length=20, unique=True, verbose_name="Buyurtma raqami")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='yangi', verbose_name="Holati")
@@ -98,6 +282,8 @@ class Order(models.Model):
     ready_at = models.DateTimeField(null=True, blank=True, verbose_name="Tayor bo'lgan vaqti")
     delivered_at = models.DateTimeField(null=True, blank=True, verbose_name="Yetkazilgan vaqti")
     picked_up_at = models.DateTimeField(null=True, blank=True, verbose_name="Olib ketilgan vaqti")
+    # Har bir save() da yangilanadi - delta API uchun kursor
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Yangilangan vaqti")
     
     # Telegram message ID'lar
     chef_message_id = models.BigIntegerField(null=True, blank=True)
@@ -108,19 +294,107 @@ class Order(models.Model):
         verbose_name = "Buyurtma"
         verbose_name_plural = "Buyurtmalar"
         ordering = ['-created_at']
+        indexes = [
+            # Keyset paginatsiya (chef_panel.pagination) uchun
+            models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+            # Mijoz buyurtmalar tarixi sahifalari (chef_panel.order_history) uchun
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_created_idx'),
+            # Holat bo'yicha filtr va oshpaz doskasi (status IN ... ) - har bir holat uchun SEARCH
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+        ]
+
+    # OrderDailyStats rollup jadvaliga ta'sir qiladigan maydonlar
+    STATS_FIELDS = ('created_at', 'status', 'service_type', 'payment_method',
+                    'products_total', 'delivery_cost', 'total_amount', 'branch_id')
 
     def __str__(self):
         return f"Buyurtma #{self.order_number} - {self.customer.full_name}"
 
+    @property
+    def chef_chat_id(self):
+        """Oshpaz chati: buyurtma filialiniki, filialsiz buyurtmalar uchun settings.CHEF_CHAT_ID"""
+        return self.branch.chef_chat_id if self.branch_id else settings.CHEF_CHAT_ID
+
+    @property
+    def courier_chat_id(self):
+        """Kuryer chati: buyurtma filialiniki, filialsiz buyurtmalar uchun settings.ADMIN_CHAT_ID"""
+        return self.branch.courier_chat_id if self.branch_id else settings.ADMIN_CHAT_ID
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stats_snapshot = instance._get_stats_snapshot()
+        return instance
+
+    @property
+    def cache_version(self):
+        """
+        Kesh/ETag versiyasi: har save() da o'zgaradigan updated_at (mikrosekund),
+        kartochkada ko'rinadigan mijoz ma'lumotlari va filial updated_at (nomi o'zgarsa).
+        Shablon fragmentlari va popup API shu versiya bilan kalitlanadi - eski yozuvlar
+        o'chirilmaydi, eskiradi. customer va branch select_related bilan yuklanishi kerak.
+        """
+        def micros(moment):
+            return (moment - UNIX_EPOCH) // datetime.timedelta(microseconds=1) if moment else 0
+
+        customer_crc = zlib.crc32(f"{self.customer.full_name}|{self.customer.phone_number}".encode())
+        branch = micros(self.branch.updated_at) if self.branch_id else 0
+        return f"{micros(self.updated_at)}-{customer_crc:x}-{branch}"
+
+    def _get_stats_snapshot(self):
+        """Rollup maydonlarining joriy qiymatlari (biror maydon yuklanmagan bo'lsa None)"""
+        if any(field not in self.__dict__ for field in self.STATS_FIELDS):
+            return None
+        return tuple(self.__dict__[field] for field in self.STATS_FIELDS)
+
+    def _next_order_number(self):
+        """Keyingi buyurtma raqami (tranzaksiya ichida chaqiriladi)"""
+        if connection.vendor == 'postgresql':
+            # Parallel checkoutlar bir xil raqam olmasligi uchun tranzaksiya oxirigacha qulf
+            # (SQLite da IMMEDIATE tranzaksiyaning yozish qulfi buni o'zi ta'minlaydi)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ORDER_NUMBER_LOCK_KEY])
+        last_order = Order.objects.order_by('-id').first()
+        if last_order:
+            return str(int(last_order.order_number) + 1)
+        return "1"
+
     def save(self, *args, **kwargs):
-        if not self.order_number:
-            # Buyurtma raqamini avtomatik generatsiya qilish
-            last_order = Order.objects.order_by('-id').first()
-            if last_order:
-                self.order_number = str(int(last_order.order_number) + 1)
-            else:
-                self.order_number = "1"
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        old_snapshot = getattr(self, '_stats_snapshot', None)
+        unchanged = (
+            not self._state.adding
+            and old_snapshot is not None
+            and old_snapshot == self._get_stats_snapshot()
+        )
+        if unchanged or (update_fields is not None and not set(update_fields) & {*self.STATS_FIELDS, 'branch'}):
+            # Faqat telegram message id kabi maydonlar saqlanmoqda - rollup o'zgarmaydi
+            super().save(*args, **kwargs)
+            return
+
+        # savepoint=False: tashqi tranzaksiya ichida (masalan change_order_status) ortiqcha
+        # SAVEPOINT/RELEASE so'rovlari bo'lmasin - xato bo'lsa baribir hammasi qaytariladi
+        with transaction.atomic(savepoint=False):
+            if self._state.adding:
+                old_snapshot = None
+                if not self.order_number:
+                    # Buyurtma raqamini avtomatik generatsiya qilish
+                    self.order_number = self._next_order_number()
+            elif old_snapshot is None:
+                old_snapshot = Order.objects.filter(pk=self.pk).values_list(*self.STATS_FIELDS).first()
+            super().save(*args, **kwargs)
+            new_snapshot = self._get_stats_snapshot()
+            if new_snapshot is None:
+                new_snapshot = Order.objects.filter(pk=self.pk).values_list(*self.STATS_FIELDS).first()
+            if old_snapshot != new_snapshot:
+                if old_snapshot is not None:
+                    OrderDailyStats.record(old_snapshot, -1)
+                OrderDailyStats.record(new_snapshot, 1)
+                Customer.record_order(self.customer_id, old_snapshot, new_snapshot)
+                # Mijozning keshlangan buyurtmalar tarixi (bot "Буюртмаларим")
+                from .order_history import invalidate_customer_orders
+                transaction.on_commit(partial(invalidate_customer_orders, self.customer_id))
+        self._stats_snapshot = new_snapshot
 
 class OrderItem(models.Model):
     """Buyurtma elementlari"""
@@ -154,10 +428,132 @@ class OrderStatusHistory(models.Model):
         verbose_name = "Holat tarixi"
         verbose_name_plural = "Holat tarixi"
         ordering = ['-changed_at']
+        indexes = [
+            # Buyurtma tarixi vaqt bo'yicha saralanib o'qiladi (ikkala yo'nalishda ham)
+            models.Index(fields=['order', 'changed_at'], name='order_history_changed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.order.order_number}: {self.old_status} -> {self.new_status}"
 
+class OrderTombstone(models.Model):
+    """
+    O'chirilgan buyurtma izi - delta API (order_changes_api) doskadan kartochkani olib
+    tashlashi uchun. ORDER_TOMBSTONE_RETENTION_HOURS dan eskilari o'chiriladi.
+    """
+    order_id = models.BigIntegerField(verbose_name="Buyurtma ID")
+    branch_id = models.BigIntegerField(null=True, blank=True, verbose_name="Filial ID")
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="O'chirilgan vaqti")
+
+    class Meta:
+        verbose_name = "O'chirilgan buyurtma"
+        verbose_name_plural = "O'chirilgan buyurtmalar"
+
+    def __str__(self):
+        return f"{self.order_id} ({self.deleted_at:%Y-%m-%d %H:%M})"
+
+class OrderDailyStats(models.Model):
+    """
+    Kunlik savdo yig'indilari (rollup). Order.save() va o'chirishda tranzaksiya
+    ichida yangilanadi; tarixdan qayta qurish: manage.py rebuild_order_stats
+    """
+    date = models.DateField(verbose_name="Sana")
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name="Holati")
+    service_type = models.CharField(max_length=20, choices=Order.SERVICE_TYPE_CHOICES, verbose_name="Xizmat turi")
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_CHOICES, verbose_name="To'lov usuli")
+    branch = models.ForeignKey(Branch, on_delete=models.PROTECT, null=True, blank=True, verbose_name="Filial")
+    order_count = models.IntegerField(default=0, verbose_name="Buyurtmalar soni")
+    products_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Mahsulotlar summasi")
+    delivery_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Yetkazib berish summasi")
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Umumiy summa")
+
+    class Meta:
+        verbose_name = "Kunlik statistika"
+        verbose_name_plural = "Kunlik statistika"
+        ordering = ['-date', 'status']
+        constraints = [
+            # NULL lar unique indeksda bir-biriga teng emas - filialsiz qatorlar alohida
+            models.UniqueConstraint(
+                fields=['date', 'status', 'service_type', 'payment_method'],
+                condition=models.Q(branch__isnull=True),
+                name='unique_order_daily_stats',
+            ),
+            models.UniqueConstraint(
+                fields=['date', 'branch', 'status', 'service_type', 'payment_method'],
+                condition=models.Q(branch__isnull=False),
+                name='unique_order_daily_stats_branch',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}/{self.service_type}/{self.payment_method}: {self.order_count}"
+
+    @classmethod
+    def record(cls, snapshot, sign):
+        """
+        Buyurtma snapshot'ini (Order.STATS_FIELDS tartibida) rollupga qo'shish (sign=1)
+        yoki ayirish (sign=-1). Chaqiruvchi tranzaksiya ichida bo'lishi kerak.
+        """
+        created_at, status, service_type, payment_method, products_total, delivery_cost, total_amount, branch_id = snapshot
+        key = {
+            'date': timezone.localdate(created_at),
+            'branch_id': branch_id,
+            'status': status,
+            'service_type': service_type,
+            'payment_method': payment_method,
+        }
+        deltas = {
+            'order_count': F('order_count') + sign,
+            'products_total': F('products_total') + sign * (products_total or 0),
+            'delivery_cost': F('delivery_cost') + sign * (delivery_cost or 0),
+            'total_amount': F('total_amount') + sign * (total_amount or 0),
+        }
+        if cls.objects.filter(**key).update(**deltas):
+            if sign < 0:
+                # Bo'sh qatorlarni o'chirib, ochiq holatlar bo'yicha qatorlar sonini kichik saqlaymiz
+                cls.objects.filter(order_count__lte=0, **key).delete()
+            return
+        if sign < 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    order_count=1,
+                    products_total=products_total or 0,
+                    delivery_cost=delivery_cost or 0,
+                    total_amount=total_amount or 0,
+                    **key,
+                )
+        except IntegrityError:
+            # Parallel so'rov qatorni birinchi yaratdi
+            cls.objects.filter(**key).update(**deltas)
+
+@receiver(post_delete, sender=Order)
+def _remove_order_from_daily_stats(sender, instance, **kwargs):
+    """O'chirilgan buyurtmani (jumladan mijoz bilan kaskad o'chirilganda) rollupdan ayirish"""
+    snapshot = getattr(instance, '_stats_snapshot', None) or instance._get_stats_snapshot()
+    if snapshot is not None:
+        OrderDailyStats.record(snapshot, -1)
+        Customer.record_order(instance.customer_id, snapshot, None)
+    from .order_history import invalidate_customer_orders
+    transaction.on_commit(partial(invalidate_customer_orders, instance.customer_id))
+
+@receiver(post_delete, sender=Order)
+def _record_order_tombstone(sender, instance, **kwargs):
+    """Doskalar o'chirilgan buyurtmani delta API orqali bilib oladi"""
+    now = timezone.now()
+    OrderTombstone.objects.filter(
+        deleted_at__lt=now - datetime.timedelta(hours=settings.ORDER_TOMBSTONE_RETENTION_HOURS)
+    ).delete()
+    OrderTombstone.objects.create(order_id=instance.pk, branch_id=instance.branch_id, deleted_at=now)
+
+@receiver(post_delete, sender=Customer)
+def _remove_customer_from_search_index(sender, instance, **kwargs):
+    search.unindex_customer(instance.pk)
+    # Qayta yaratilsa (upsert_for_checkout) tarix eski id ga qarab qolmasin
+    from .order_history import forget_customer
+    transaction.on_commit(partial(forget_customer, instance.telegram_id))
+
 class BotSettings(models.Model):
     """Telegram bot sozlamalari"""
     service_start_time = models.TimeField(
@@ -231,3 +627,69 @@ class BotSettings(models.Model):
             }
         )
         return settings
+
+class DeliveryZone(models.Model):
+    """
+    Yetkazib berish hududi: chegara ko'pburchagi va shu hudud tarifi.
+    Saqlashda chegara slab indeksiga kompilyatsiya qilinadi (chef_panel.delivery).
+    """
+    name = models.CharField(max_length=100, verbose_name="Nomi")
+    polygon = models.JSONField(
+        verbose_name="Chegara",
+        help_text="[[lat, lon], [lat, lon], ...] - kamida 3 ta nuqta (kenglik, uzunlik)"
+    )
+    base_cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=5000,
+        verbose_name="Boshlang'ich narx (so'm)",
+        validators=[MinValueValidator(0)]
+    )
+    cost_per_km = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        verbose_name="Har km uchun qo'shimcha narx (so'm)",
+        help_text="Birinchi kilometrdan keyin; 0 - hudud bo'yicha qat'iy narx",
+        validators=[MinValueValidator(0)]
+    )
+    priority = models.IntegerField(
+        default=0,
+        verbose_name="Ustuvorlik",
+        help_text="Hududlar ustma-ust tushsa ustuvorligi kattasi tanlanadi"
+    )
+    is_active = models.BooleanField(default=True, verbose_name="Faol")
+    index = models.JSONField(default=dict, editable=False, verbose_name="Kompilyatsiya qilingan indeks")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Yangilangan vaqti")
+
+    class Meta:
+        verbose_name = "Yetkazib berish hududi"
+        verbose_name_plural = "Yetkazib berish hududlari"
+        ordering = ['-priority', 'name']
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        delivery.validate_polygon(self.polygon)
+
+    def save(self, *args, **kwargs):
+        self.index = delivery.compile_polygon(self.polygon)
+        super().save(*args, **kwargs)
+
+class BotUserState(models.Model):
+    """
+    Bot foydalanuvchisining context.user_data holati (savat, telefon, xizmat turi,
+    lokatsiya...). chef_panel.bot_persistence.DatabasePersistence yozadi va o'qiydi;
+    qayta ishga tushganda har bir foydalanuvchi birinchi update da yuklanadi.
+    """
+    telegram_id = models.BigIntegerField(unique=True, verbose_name="Telegram ID")
+    data = models.JSONField(default=dict, verbose_name="Holat")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Yangilangan vaqti")
+
+    class Meta:
+        verbose_name = "Bot foydalanuvchi holati"
+        verbose_name_plural = "Bot foydalanuvchi holatlari"
+
+    def __str__(self):
+        return f"{self.telegram_id}"
@@ -0,0 +1,101 @@
+"""
+Mijozning buyurtmalar tarixi (bot "Буюртмаларим" va get_user_orders_api uchun).
+
+Sahifa bazada kesiladi (LIMIT per_page + 1, faqat ko'rsatiladigan ustunlar
+values() bilan) va mijoz bo'yicha keshlanadi. Kesh kalitida mijozning "versiyasi"
+bor: Order.save() yangi buyurtma yoki holat o'zgarishida versiyani yangilaydi va
+eski sahifalar o'z-o'zidan eskirib qoladi.
+
+Eslatma: standart locmem kesh har bir jarayonda alohida - bot va web o'rtasida
+invalidatsiya aniq ishlashi uchun CACHES da umumiy backend bering; aks holda
+eskirish CUSTOMER_ORDERS_CACHE_SECONDS bilan cheklanadi.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Customer, Order
+
+HISTORY_FIELDS = ('order_number', 'created_at', 'total_amount', 'status', 'service_type')
+
+STATUS_DISPLAY = dict(Order.STATUS_CHOICES)
+SERVICE_TYPE_DISPLAY = dict(Order.SERVICE_TYPE_CHOICES)
+
+
+def _customer_id_key(telegram_id):
+    return f'chef_panel:customer_id:{telegram_id}'
+
+
+def _version_key(customer_id):
+    return f'chef_panel:customer_orders_version:{customer_id}'
+
+
+def invalidate_customer_orders(customer_id):
+    """Mijozning keshlangan tarix sahifalarini eskirtirish"""
+    cache.set(_version_key(customer_id), time.time_ns(), None)
+
+
+def forget_customer(telegram_id):
+    """telegram_id -> id bog'lanishini keshdan o'chirish (mijoz o'chirilganda)"""
+    cache.delete(_customer_id_key(telegram_id))
+
+
+def _customer_id(telegram_id):
+    key = _customer_id_key(telegram_id)
+    customer_id = cache.get(key)
+    if customer_id is None:
+        customer_id = Customer.objects.filter(telegram_id=telegram_id).values_list('id', flat=True).first()
+        if customer_id is not None:
+            # Bog'lanish faqat mijoz o'chirilganda o'zgaradi (post_delete forget_customer
+            # chaqiradi, keyingi checkout yangi id yaratadi); topilmaganlar keshlanmaydi.
+            # Boshqa jarayondagi o'chirish (kesh umumiy bo'lmasa) muddat bilan eskiradi
+            cache.set(key, customer_id, settings.CUSTOMER_ORDERS_CACHE_SECONDS)
+    return customer_id
+
+
+def _serialize(row):
+    return {
+        'order_id': row['order_number'],
+        'date': row['created_at'].strftime("%Y-%m-%d %H:%M"),
+        'total': float(row['total_amount']),
+        'status': row['status'],
+        'status_display': STATUS_DISPLAY.get(row['status'], row['status']),
+        'service_type': row['service_type'],
+        'service_type_display': SERVICE_TYPE_DISPLAY.get(row['service_type'], row['service_type']),
+    }
+
+
+def customer_orders_queryset(customer_id):
+    """Mijoz buyurtmalari, eng yangisi birinchi (order_customer_created_idx bo'yicha)"""
+    return (
+        Order.objects.filter(customer_id=customer_id)
+        .order_by('-created_at', '-id')
+        .values(*HISTORY_FIELDS)
+    )
+
+
+def get_customer_orders_page(telegram_id, page=1, per_page=5):
+    """
+    Mijoz buyurtmalarining bitta sahifasi (eng yangisi birinchi).
+    Mijoz topilmasa None qaytaradi.
+    """
+    customer_id = _customer_id(telegram_id)
+    if customer_id is None:
+        return None
+    page = max(page, 1)
+
+    version = cache.get_or_set(_version_key(customer_id), 0, None)
+    key = f'chef_panel:customer_orders:{customer_id}:{version}:{per_page}:{page}'
+    result = cache.get(key)
+    if result is None:
+        offset = (page - 1) * per_page
+        rows = list(customer_orders_queryset(customer_id)[offset:offset + per_page + 1])
+        result = {
+            'orders': [_serialize(row) for row in rows[:per_page]],
+            'page': page,
+            'has_next': len(rows) > per_page,
+            'has_previous': page > 1,
+        }
+        cache.set(key, result, settings.CUSTOMER_ORDERS_CACHE_SECONDS)
+    return result
@@ -0,0 +1,69 @@
+"""
+Buyurtma holatini o'zgartirish - web panel, API va bot uchun yagona yo'l.
+
+Holat tekshiruvi va yozuv bitta tranzaksiyada, buyurtma qatori qulflangan holda:
+parallel ikkita o'tish (masalan oshpaz va kuryer tugmalari) ikkalasi ham
+tekshiruvdan o'tib, tarix, OrderDailyStats va mijoz hisoblagichlarini ikki marta
+yozmaydi.
+"""
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from .db import write_transaction
+from .models import Order, OrderStatusHistory
+
+# Ruxsat etilgan holat o'tishlari (xizmat turi bo'yicha)
+VALID_TRANSITIONS = {
+    'pickup': {
+        'yangi': ['tasdiqlangan', 'bekor_qilingan'],
+        'tasdiqlangan': ['tayor', 'bekor_qilingan'],
+        'tayor': ['olib_ketildi', 'bekor_qilingan'],
+    },
+    'delivery': {
+        'yangi': ['tasdiqlangan', 'bekor_qilingan'],
+        'tasdiqlangan': ['tayor', 'bekor_qilingan'],
+        'tayor': ['yolda', 'bekor_qilingan'],
+        'yolda': ['yetkazildi', 'bekor_qilingan'],
+    },
+}
+
+# Holat -> shu holatga o'tgan vaqt maydoni
+STATUS_TIMESTAMPS = {
+    'tasdiqlangan': 'confirmed_at',
+    'tayor': 'ready_at',
+    'yetkazildi': 'delivered_at',
+    'olib_ketildi': 'picked_up_at',
+}
+
+
+@write_transaction
+def change_order_status(order_id, new_status, changed_by, notes):
+    """
+    Holatni VALID_TRANSITIONS bo'yicha tekshirib o'zgartirish va tarixga yozish.
+    (order, old_status, o'zgardimi) qaytaradi; buyurtma topilmasa Http404.
+    Buyurtma qatori qulflanadi (SQLite da BEGIN IMMEDIATE), old_status shu qulf
+    ostida o'qiladi. order.customer va order.branch yuklangan holda qaytadi.
+    """
+    order = get_object_or_404(
+        Order.objects.select_related('customer', 'branch').select_for_update(of=('self',)), id=order_id
+    )
+    old_status = order.status
+    transitions = VALID_TRANSITIONS['pickup' if order.service_type == 'pickup' else 'delivery']
+    if new_status not in transitions.get(old_status, []):
+        return order, old_status, False
+
+    order.status = new_status
+    # Vaqt belgilarini yangilash
+    if new_status in STATUS_TIMESTAMPS:
+        setattr(order, STATUS_TIMESTAMPS[new_status], timezone.now())
+    order.save()
+
+    # Holat tarixini saqlash
+    OrderStatusHistory.objects.create(
+        order=order,
+        old_status=old_status,
+        new_status=new_status,
+        changed_by=changed_by,
+        notes=notes
+    )
+    return order, old_status, True
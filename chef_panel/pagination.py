@@ -0,0 +1,106 @@
+"""
+Keyset (kursor) paginatsiya: (created_at, id) bo'yicha, OFFSET va COUNT(*) siz.
+
+Sahifa tokeni oxirgi/birinchi ko'rilgan qatorning (created_at, id) juftligini
+o'z ichiga olgan base64 JSON. Har qanday sahifa birinchi sahifa bilan bir xil
+narxda: Order Meta.indexes dagi (created_at, id) indeksi bo'yicha LIMIT n+1.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+NEXT = 'n'
+PREV = 'p'
+
+
+def encode_token(created_at, pk, direction):
+    payload = json.dumps({'c': created_at.isoformat(), 'i': pk, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Tokenni (created_at, id, direction) ga aylantirish; noto'g'ri token uchun None"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        if direction not in (NEXT, PREV):
+            return None
+        return datetime.fromisoformat(payload['c']), int(payload['i']), direction
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        return None
+
+
+class KeysetPage:
+    """Paginator.Page ga o'xshash: shablonda iteratsiya va has_next/has_previous"""
+
+    def __init__(self, object_list, next_token, previous_token, approximate_count=None):
+        self.object_list = object_list
+        self.next_token = next_token
+        self.previous_token = previous_token
+        self.approximate_count = approximate_count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_token is not None
+
+    def has_previous(self):
+        return self.previous_token is not None
+
+
+def cursor_queryset(queryset, created_at, pk, direction):
+    """Kursordan keyingi (NEXT) yoki oldingi (PREV) qatorlar, kursorga yaqinidan boshlab"""
+    # created_at__lte/gte alohida shart: indeks oralig'ini cheklaydi (OR yolg'iz qolsa to'liq skan)
+    if direction == NEXT:
+        return (
+            queryset.filter(Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at)
+            .order_by('-created_at', '-id')
+        )
+    return (
+        queryset.filter(Q(created_at__gt=created_at) | Q(id__gt=pk), created_at__gte=created_at)
+        .order_by('created_at', 'id')
+    )
+
+
+def keyset_paginate(queryset, token=None, per_page=20, approximate_count=None):
+    """
+    Querysetni eng yangisidan boshlab (created_at, id) bo'yicha kesish.
+    Token bo'lmasa yoki noto'g'ri bo'lsa birinchi sahifa qaytadi.
+    """
+    cursor = decode_token(token)
+    if cursor is None:
+        rows = list(queryset.order_by('-created_at', '-id')[:per_page + 1])
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        has_next, has_previous = has_more, False
+    else:
+        created_at, pk, direction = cursor
+        rows = list(cursor_queryset(queryset, created_at, pk, direction)[:per_page + 1])
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if direction == NEXT:
+            has_next, has_previous = has_more, True
+        else:
+            rows = rows[::-1]
+            has_next, has_previous = True, has_more
+
+    if not rows and cursor is not None:
+        # Kursor ortidagi buyurtmalar o'chirilgan - birinchi sahifaga qaytamiz
+        return keyset_paginate(queryset, None, per_page, approximate_count)
+
+    next_token = previous_token = None
+    if rows and has_next:
+        next_token = encode_token(rows[-1].created_at, rows[-1].pk, NEXT)
+    if rows and has_previous:
+        previous_token = encode_token(rows[0].created_at, rows[0].pk, PREV)
+    return KeysetPage(rows, next_token, previous_token, approximate_count)
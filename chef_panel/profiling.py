@@ -0,0 +1,182 @@
+"""
+So'rov darajasidagi profiling (PROFILING_ENABLED=True bo'lganda).
+
+chef_panel.middleware.ProfilingMiddleware har bir /chef_panel/ (shu jumladan
+/chef_panel/api/) so'rovi uchun quyidagilarni yig'adi:
+  * db       - SQL so'rovlar soni va vaqti (execute_wrapper orqali)
+  * tpl      - shablon render vaqti (ProfilingDjangoTemplates backend orqali)
+  * telegram - Telegram API ga chiquvchi so'rovlar vaqti (utils dagi span('telegram'))
+  * total    - view ning umumiy vaqti
+
+Natija Server-Timing sarlavhasiga, "chef_panel.profiling" loggeriga JSON qatori
+sifatida va jarayon ichidagi buferlarga (oxirgi so'rovlar + eng sekinlari) yoziladi.
+Buferlar /chef_panel/profiling/ sahifasida (faqat staff) ko'rinadi.
+
+O'chirilgan bo'lsa middleware MiddlewareNotUsed bilan zanjirdan chiqadi, span() va
+template backend esa faqat bitta ContextVar o'qishini qo'shadi.
+"""
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+_current_profile = ContextVar('chef_panel_request_profile', default=None)
+
+
+class RequestProfile:
+    """Bitta so'rov bo'yicha yig'ilgan vaqtlar (millisekundlarda)"""
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started_at = time.time()
+        self.db_count = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.telegram_count = 0
+        self.telegram_ms = 0.0
+        self.total_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper sifatida
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - start) * 1000
+            self.db_count += 1
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_ms:.1f};desc="{self.db_count} queries"',
+            f'tpl;dur={self.template_ms:.1f}',
+            f'telegram;dur={self.telegram_ms:.1f};desc="{self.telegram_count} calls"',
+            f'total;dur={self.total_ms:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'started_at': self.started_at,
+            'total_ms': round(self.total_ms, 1),
+            'db_count': self.db_count,
+            'db_ms': round(self.db_ms, 1),
+            'template_ms': round(self.template_ms, 1),
+            'telegram_count': self.telegram_count,
+            'telegram_ms': round(self.telegram_ms, 1),
+        }
+
+
+class ProfileStore:
+    """Jarayon ichidagi buferlar: oxirgi N ta so'rov (ring) va eng sekin N tasi (heap)"""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=size)
+        self._slowest = []
+        self._counter = itertools.count()
+
+    def add(self, record):
+        with self._lock:
+            self._recent.append(record)
+            entry = (record['total_ms'], next(self._counter), record)
+            if len(self._slowest) < self.size:
+                heapq.heappush(self._slowest, entry)
+            elif entry[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self):
+        with self._lock:
+            return [record for _, _, record in sorted(self._slowest, reverse=True)]
+
+    def recent(self):
+        with self._lock:
+            return list(reversed(self._recent))
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+            self._slowest = []
+
+
+store = ProfileStore(getattr(settings, 'PROFILING_BUFFER_SIZE', 50))
+
+
+@contextmanager
+def span(kind):
+    """Joriy so'rov profiliga tashqi chaqiruv vaqtini qo'shish (hozircha faqat 'telegram')"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        if kind == 'telegram':
+            profile.telegram_ms += elapsed
+            profile.telegram_count += 1
+
+
+class ProfilingTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        profile = _current_profile.get()
+        if profile is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_ms += (time.perf_counter() - start) * 1000
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates backend, yuqori darajadagi render vaqtini profilga yozadi
+    ({% include %} lar ichida sanaladi, ikki marta emas).
+    """
+
+    def from_string(self, template_code):
+        return ProfilingTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return ProfilingTemplate(template.template, self)
+
+
+@contextmanager
+def profile_request(profile):
+    """Blok ichidagi SQL, shablon va Telegram vaqtlarini profilga yig'ish"""
+    token = _current_profile.set(profile)
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            yield profile
+    finally:
+        profile.total_ms = (time.perf_counter() - start) * 1000
+        _current_profile.reset(token)
+
+
+def record(profile):
+    """Tugagan profilni buferga va strukturali logga yozish"""
+    data = profile.as_dict()
+    store.add(data)
+    logger.info("request_profile %s", json.dumps(data), extra={'profile': data})
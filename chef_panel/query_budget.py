@@ -0,0 +1,77 @@
+"""
+So'rovlar byudjeti (query budget) - view qancha SQL so'rov bajarishi mumkinligini
+e'lon qilish va tekshirish uchun yordamchilar.
+
+Ishlatish:
+
+    @query_budget(6)
+    def order_list(request): ...
+
+    # testlarda yoki shell da
+    with assert_max_queries(6):
+        client.get('/chef_panel/orders/')
+
+Byudjet ma'lumotlar hajmiga bog'liq bo'lmasligi kerak - N+1 paydo bo'lsa,
+buyurtmalar soni oshganda byudjet oshib ketadi va xato chiqadi.
+"""
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+class QueryBudgetExceeded(AssertionError):
+    """View yoki kod bloki e'lon qilingan so'rovlar sonidan oshib ketdi"""
+
+    def __init__(self, label, budget, queries):
+        self.label = label
+        self.budget = budget
+        self.queries = queries
+        sql_list = '\n'.join(f"  {i}. {sql}" for i, sql in enumerate(queries, 1))
+        super().__init__(
+            f"{label}: {len(queries)} ta so'rov bajarildi, byudjet {budget} ta\n{sql_list}"
+        )
+
+
+class QueryCounter:
+    """Barcha ulanishlardagi SQL so'rovlarni sanash (DEBUG dan qat'i nazar ishlaydi)"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+
+def query_budget(max_queries):
+    """View uchun maksimal so'rovlar sonini e'lon qilish (QueryBudgetMiddleware tekshiradi)"""
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def get_query_budget(view_func):
+    """View ga e'lon qilingan byudjetni olish (e'lon qilinmagan bo'lsa None)"""
+    return getattr(view_func, 'query_budget', None)
+
+
+@contextmanager
+def assert_max_queries(max_queries, label="Kod bloki"):
+    """Blok ichida max_queries dan ortiq so'rov bajarilsa QueryBudgetExceeded ko'taradi"""
+    counter = QueryCounter()
+    with counter.capture():
+        yield counter
+    if counter.count > max_queries:
+        raise QueryBudgetExceeded(label, max_queries, counter.queries)
@@ -0,0 +1,132 @@
+"""
+Buyurtmalar qidiruvi uchun indeks.
+
+Mijoz saqlanganda (Customer.save) quyidagilar hisoblanadi:
+  * phone_digits - faqat raqamlardan iborat telefon (+998 90 123-45-67 -> 998901234567)
+  * search_text  - kichik harfli ism tokenlari va telefonning qidiriladigan variantlari
+
+search_text bazaga qarab indekslanadi:
+  * SQLite     - FTS5 virtual jadvali (CUSTOMER_FTS_TABLE), Customer.save() da yangilanadi
+  * PostgreSQL - pg_trgm GIN indeksi (migratsiyada yaratiladi)
+  * boshqalar  - indekssiz LIKE (faqat ishlab chiqish uchun)
+
+Buyurtma raqami Order.order_number ning unique indeksi bo'yicha aniq yoki prefiks
+(oraliq) so'rovi bilan qidiriladi.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+CUSTOMER_FTS_TABLE = 'chef_panel_customer_fts'
+
+# Telefon raqamining qaysi "dumlari" alohida token sifatida indekslanadi:
+# to'liq raqam, operator kodi bilan mahalliy raqam (9 ta) va qisqa raqam (7 ta)
+PHONE_SUFFIX_LENGTHS = (9, 7)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_PHONE_QUERY_RE = re.compile(r'^[\d\s+()\-]+$')
+
+
+def normalize_phone(phone):
+    """Telefon raqamidan faqat raqamlarni qoldirish"""
+    return re.sub(r'\D', '', phone or '')
+
+
+def tokenize(text):
+    """Matnni kichik harfli so'zlarga ajratish"""
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def build_search_text(full_name, phone_digits):
+    """Mijoz uchun indekslanadigan matn: ism tokenlari + telefon variantlari"""
+    tokens = tokenize(full_name)
+    if phone_digits:
+        tokens.append(phone_digits)
+        for length in PHONE_SUFFIX_LENGTHS:
+            if len(phone_digits) > length:
+                tokens.append(phone_digits[-length:])
+    # Takrorlarni olib tashlash, tartibni saqlagan holda
+    return ' '.join(dict.fromkeys(tokens))
+
+
+def is_fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def index_customer(customer_id, search_text):
+    """Mijozning FTS yozuvini yangilash (faqat SQLite; PostgreSQL indeksni o'zi yangilaydi)"""
+    if not is_fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {CUSTOMER_FTS_TABLE}(rowid, search_text) VALUES (%s, %s)",
+            [customer_id, search_text],
+        )
+
+
+def unindex_customer(customer_id):
+    if not is_fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {CUSTOMER_FTS_TABLE} WHERE rowid = %s", [customer_id])
+
+
+def rebuild_customer_index():
+    """FTS jadvalini chef_panel_customer.search_text dan to'liq qayta to'ldirish"""
+    if not is_fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {CUSTOMER_FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {CUSTOMER_FTS_TABLE}(rowid, search_text) "
+            f"SELECT id, search_text FROM chef_panel_customer"
+        )
+
+
+def _query_tokens(query):
+    """Qidiruv so'rovini tokenlarga ajratish; telefonga o'xshash so'rov bitta raqamli token bo'ladi"""
+    if _PHONE_QUERY_RE.match(query):
+        digits = normalize_phone(query)
+        return [digits] if digits else []
+    return tokenize(query)
+
+
+def _fts_match_expression(tokens):
+    # Har bir token prefiks sifatida, hammasi AND bilan: "ali"* "valiyev"*
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def _customer_filter(tokens):
+    """Tokenlarning hammasiga mos keladigan mijozlar bo'yicha Order filtri"""
+    if is_fts_enabled():
+        return Q(customer_id__in=RawSQL(
+            f"SELECT rowid FROM {CUSTOMER_FTS_TABLE} WHERE {CUSTOMER_FTS_TABLE} MATCH %s",
+            [_fts_match_expression(tokens)],
+        ))
+    # search_text allaqachon kichik harfda - contains (LIKE) trigram indeksidan foydalanadi
+    customer_q = Q()
+    for token in tokens:
+        customer_q &= Q(customer__search_text__contains=token)
+    return customer_q
+
+
+def search_orders(queryset, query):
+    """
+    Buyurtmalarni qidirish: buyurtma raqami (aniq/prefiks), telefon raqami
+    (to'liq yoki oxirgi raqamlari bo'yicha prefiks) va ism tokenlari (prefiks).
+    """
+    query = (query or '').strip()
+    number = query.lstrip('#').strip()
+    # '#12' - faqat buyurtma raqami bo'yicha
+    tokens = [] if query.startswith('#') else _query_tokens(query)
+    conditions = _customer_filter(tokens) if tokens else Q(pk__in=[])
+
+    if number.isdigit():
+        # Unique indeks bo'yicha oraliq: '12' -> 12, 120..129, 1200.. (LIKE indeksdan foydalanmaydi)
+        conditions |= Q(order_number__gte=number, order_number__lt=number + '\uffff')
+    elif not tokens:
+        return queryset
+
+    return queryset.filter(conditions)
@@ -0,0 +1,61 @@
+"""
+Statik fayllar saqlash joyi: hashlangan nomlar (ManifestStaticFilesStorage) -
+fayl o'zgarsa URL ham o'zgaradi, shuning uchun brauzer keshi muddatsiz bo'lishi mumkin.
+
+collectstatic paytida har bir matnli fayl yonida oldindan siqilgan .gz va .br
+nusxalar yoziladi: nginx (gzip_static / brotli_static) ularni Django siz va har
+so'rovda qayta siqmasdan beradi. brotli paketi o'rnatilmagan bo'lsa faqat .gz.
+"""
+import gzip
+import logging
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Rasmlar, shriftlarning woff2 va audio allaqachon siqilgan
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ttf', '.eot', '.ico')
+# Bundan kichik fayllarni siqishdan foyda yo'q (bitta TCP paketiga sig'adi)
+MIN_COMPRESS_SIZE = 512
+
+
+def _compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage + hashlangan fayllarning .gz/.br nusxalari"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        compressed = saved = 0
+        for name in sorted(set(self.hashed_files.values())):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            for suffix, compress in _compressors():
+                # Hashlangan nom - tarkib o'zgarmagan, avvalgi collectstatic nusxasi yaroqli
+                if self.exists(name + suffix):
+                    continue
+                with self.open(name) as original:
+                    data = original.read()
+                if len(data) < MIN_COMPRESS_SIZE:
+                    break
+                packed = compress(data)
+                if len(packed) >= len(data) * 0.9:
+                    continue
+                self._save(name + suffix, ContentFile(packed))
+                compressed += 1
+                saved += len(data) - len(packed)
+        if compressed:
+            logger.info(f"{compressed} ta siqilgan statik fayl yozildi, {saved // 1024} KB tejaldi")
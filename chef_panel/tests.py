@@ -0,0 +1,904 @@
+import asyncio
+import datetime
+import random
+from datetime import timedelta
+from decimal import Decimal
+import threading
+import time
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from telegram import Chat, Message, Update, User as TelegramUser
+from telegram.ext import ApplicationBuilder
+
+import telegram_bot
+
+from . import delivery, export, pagination, search, utils, views
+from .bot_persistence import DatabasePersistence
+from .management.commands.check_query_plans import plan_problems
+from .models import (
+    BotUserState, Branch, Category, Customer, DeliveryZone, Order, OrderDailyStats, OrderItem, OrderStatusHistory,
+    Product,
+)
+from .order_status import change_order_status
+from .order_history import get_customer_orders_page
+from .query_budget import assert_max_queries, get_query_budget
+
+
+def make_order(number, status='yangi', service_type='delivery', product=None):
+    """Test buyurtmasi: mijoz, bitta mahsulot va holat tarixi bilan"""
+    customer, _ = Customer.objects.get_or_create(
+        telegram_id=1000 + number,
+        defaults={'full_name': f"Mijoz {number}", 'phone_number': f"+99890123{number:04d}"},
+    )
+    if product is None:
+        category, _ = Category.objects.get_or_create(name="Osh")
+        product, _ = Product.objects.get_or_create(category=category, name="Palov", defaults={'price': Decimal('30000')})
+    order = Order.objects.create(
+        customer=customer, telegram_user_id=customer.telegram_id, status=status, service_type=service_type,
+        products_total=Decimal('30000'), total_amount=Decimal('30000'),
+    )
+    OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price, total=product.price)
+    OrderStatusHistory.objects.create(order=order, old_status='', new_status=status)
+    return order
+
+
+class ExportStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('oshpaz', password='x', is_staff=True)
+        for number in range(1, 4):
+            make_order(number)
+
+    async def test_asgi_export_is_read_chunk_by_chunk(self):
+        pulled = []
+
+        def writer(records):
+            for record in records:
+                pulled.append(record['order_number'])
+                yield f"{record['order_number']}\n".encode()
+
+        await self.async_client.aforce_login(self.staff)
+        today = timezone.localdate().isoformat()
+        with mock.patch.dict(export.WRITERS, {'csv': writer}):
+            response = await self.async_client.get(f'/chef_panel/orders/export/?format=csv&from={today}&to={today}')
+            self.assertTrue(response.is_async)
+            content = aiter(response.streaming_content)
+            first = await anext(content)
+            # Birinchi bo'lak yuborilganda qolgan buyurtmalar hali o'qilmagan
+            self.assertEqual(len(pulled), 1)
+            rest = [chunk async for chunk in content]
+
+        self.assertEqual(first, f"{pulled[0]}\n".encode())
+        self.assertEqual(len(rest), 2)
+        self.assertEqual(len(pulled), 3)
+
+    def test_wsgi_export_stays_sync(self):
+        self.client.force_login(self.staff)
+        today = timezone.localdate().isoformat()
+        response = self.client.get(f'/chef_panel/orders/export/?format=ndjson&from={today}&to={today}')
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+
+
+class CustomerOrderHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_recreated_customer_is_not_resolved_to_deleted_id(self):
+        order = make_order(1)
+        old_customer = order.customer
+        self.assertEqual(len(get_customer_orders_page(old_customer.telegram_id)['orders']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            old_customer.delete()
+        customer = Customer.upsert_for_checkout(old_customer.telegram_id, "Mijoz 1", "+998901230001")
+        Order.objects.create(
+            customer=customer, telegram_user_id=customer.telegram_id,
+            products_total=Decimal('30000'), total_amount=Decimal('30000'),
+        )
+        page = get_customer_orders_page(customer.telegram_id)
+        self.assertNotEqual(customer.pk, old_customer.pk)
+        self.assertEqual(len(page['orders']), 1)
+
+
+    @override_settings(CUSTOMER_ORDERS_CACHE_SECONDS=60)
+    def test_customer_id_mapping_expires(self):
+        customer = make_order(1).customer
+        get_customer_orders_page(customer.telegram_id)
+        # Boshqa jarayonda o'chirildi: on_commit dagi forget_customer bu keshga yetmaydi
+        Customer.objects.filter(pk=customer.pk).delete()
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 61):
+            self.assertIsNone(get_customer_orders_page(customer.telegram_id))
+
+class CustomerUpsertTests(TestCase):
+    """Checkout mijozi: yangi/o'zgargan - SELECT + upsert (+ SQLite FTS), qaytgan - bitta SELECT"""
+
+    def write_queries(self):
+        return 2 + search.is_fts_enabled()
+
+    def test_new_customer(self):
+        with self.assertNumQueries(self.write_queries()):
+            customer = Customer.upsert_for_checkout(501, "Ali Valiyev", "+998 90 111 22 33")
+        self.assertIsNotNone(customer.pk)
+        self.assertEqual(Customer.objects.get(telegram_id=501).phone_digits, customer.phone_digits)
+
+    def test_returning_customer(self):
+        first = Customer.upsert_for_checkout(502, "Ali Valiyev", "+998901112233")
+        with self.assertNumQueries(1):
+            customer = Customer.upsert_for_checkout(502, "Ali Valiyev", "+998901112233")
+        self.assertEqual(customer.pk, first.pk)
+
+    def test_returning_customer_with_new_phone(self):
+        first = Customer.upsert_for_checkout(503, "Ali Valiyev", "+998901112233")
+        Customer.objects.filter(pk=first.pk).update(order_count=4)
+        with self.assertNumQueries(self.write_queries()):
+            customer = Customer.upsert_for_checkout(503, "Ali Valiyev", "+998907778899")
+        self.assertEqual(customer.pk, first.pk)
+        stored = Customer.objects.get(pk=first.pk)
+        self.assertEqual(stored.phone_number, "+998907778899")
+        # Hisoblagichlar upsertda o'zgarmaydi
+        self.assertEqual(stored.order_count, 4)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN formati faqat SQLite uchun")
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertNotIn("XATO", out.getvalue())
+
+    def test_full_scan_is_reported(self):
+        plan = Order.objects.filter(address="Mustaqillik 1").order_by().explain()
+        self.assertEqual(plan_problems(plan, set()), ["to'liq skan: chef_panel_order"])
+        plan = Order.objects.order_by('address').explain()
+        self.assertIn("vaqtinchalik saralash (ORDER BY indeksdan olinmadi)", plan_problems(plan, set()))
+
+
+# Testlarda collectstatic manifesti yo'q
+@override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class ViewQueryBudgetTests(TestCase):
+    """View lar e'lon qilingan @query_budget dan oshmaydi - buyurtmalar soni qancha bo'lsa ham"""
+
+    def assert_within_budget(self, view, url):
+        budget = get_query_budget(view)
+        self.assertIsNotNone(budget, f"{view.__name__} uchun byudjet e'lon qilinmagan")
+        for count in (2, 12):
+            while Order.objects.count() < count:
+                make_order(Order.objects.count() + 1, status=('yangi', 'tasdiqlangan', 'tayor')[Order.objects.count() % 3])
+            path = url.format(order=Order.objects.order_by('id').first())
+            # Sovuq kesh - eng qimmat yo'l
+            cache.clear()
+            with assert_max_queries(budget, label=path):
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200, url)
+
+    def test_dashboard(self):
+        self.assert_within_budget(views.dashboard, '/chef_panel/')
+
+    def test_board(self):
+        self.assert_within_budget(views.new_orders, '/chef_panel/orders/new/')
+
+    def test_order_list(self):
+        self.assert_within_budget(views.order_list, '/chef_panel/orders/')
+
+    def test_order_list_search(self):
+        self.assert_within_budget(views.order_list, '/chef_panel/orders/?search=Mijoz')
+
+    def test_order_detail(self):
+        self.assert_within_budget(views.order_detail, '/chef_panel/orders/{order.id}/')
+
+    def test_order_details_api(self):
+        self.assert_within_budget(views.get_order_details_api, '/chef_panel/api/orders/{order.id}/details/')
+
+    def test_changes_board(self):
+        self.assert_within_budget(views.order_changes_api, '/chef_panel/api/orders/changes/')
+
+    def test_changes_single_order(self):
+        self.assert_within_budget(views.order_changes_api, '/chef_panel/api/orders/changes/?order={order.id}')
+
+
+# Testlarda collectstatic manifesti yo'q
+@override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class OrderCardCacheTests(TestCase):
+    """Kartochka/qator fragment keshi filial o'zgarsa eskirmaydi"""
+
+    def test_branch_rename_refreshes_cached_cards(self):
+        staff = User.objects.create_user('oshpaz', password='x', is_staff=True)
+        branch = Branch.objects.create(name="Chilonzor", latitude=41.28, longitude=69.2, chef_chat_id=-100, courier_chat_id=-200)
+        order = make_order(1)
+        Order.objects.filter(id=order.id).update(branch=branch)
+        self.client.force_login(staff)
+        cache.clear()
+        for url in ('/chef_panel/orders/new/', '/chef_panel/orders/'):
+            self.assertContains(self.client.get(url), "Chilonzor")
+
+        branch.name = "Yunusobod"
+        branch.save()
+        for url in ('/chef_panel/orders/new/', '/chef_panel/orders/'):
+            response = self.client.get(url)
+            self.assertContains(response, "Yunusobod")
+            self.assertNotContains(response, "Chilonzor")
+
+
+class OrderDetailsApiTests(TestCase):
+    def test_if_none_match_is_parsed(self):
+        self.client.force_login(User.objects.create_user('oshpaz', password='x', is_staff=True))
+        url = f'/chef_panel/api/orders/{make_order(1).id}/details/'
+        etag = self.client.get(url)['ETag']
+        for header, status in (
+            (etag, 304), (f'"boshqa", W/{etag}', 304), ('*', 304),
+            (f'"x{etag[1:]}', 200), (etag[:-2] + '"', 200),
+        ):
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': header}).status_code, status, header)
+
+
+class PanelStatusEndpointTests(TestCase):
+    """Panel tugmalari (tasdiqlash, tayor, bekor) ham VALID_TRANSITIONS bo'yicha, bir marta o'zgartiradi"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('oshpaz', password='x', is_staff=True))
+        patcher = mock.patch.object(views, 'send_telegram_message', return_value={'ok': True, 'result': {'message_id': 7}})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, order, action):
+        return self.client.post(f'/chef_panel/orders/{order.id}/{action}/').json()['success']
+
+    def test_transitions_follow_rules(self):
+        order = make_order(1)
+        self.assertFalse(self.post(order, 'ready'))
+        self.assertTrue(self.post(order, 'confirm'))
+        self.assertFalse(self.post(order, 'confirm'))
+        self.assertTrue(self.post(order, 'ready'))
+        self.assertTrue(self.post(order, 'cancel'))
+        self.assertFalse(self.post(order, 'cancel'))
+        self.assertEqual(
+            list(order.status_history.order_by('id').values_list('new_status', flat=True)),
+            ['yangi', 'tasdiqlangan', 'tayor', 'bekor_qilingan'],
+        )
+
+    def test_missing_order_is_404(self):
+        self.assertEqual(self.client.post('/chef_panel/orders/999/confirm/').status_code, 404)
+
+
+class OrderDailyStatsTests(TestCase):
+    """Rollup har bir o'zgarishdan keyin buyurtmalar ustidagi yangi agregat bilan bir xil"""
+
+    def assertRollupMatchesOrders(self):
+        expected = sorted(
+            Order.objects
+            .annotate(date=TruncDate('created_at'))
+            .values_list('date', 'branch_id', 'status', 'service_type', 'payment_method')
+            .annotate(Count('id'), Sum('products_total'), Sum('delivery_cost'), Sum('total_amount'))
+            .order_by(),
+            key=str,
+        )
+        actual = sorted(OrderDailyStats.objects.values_list(
+            'date', 'branch_id', 'status', 'service_type', 'payment_method',
+            'order_count', 'products_total', 'delivery_cost', 'total_amount',
+        ), key=str)
+        self.assertEqual(actual, expected)
+
+    def test_rollup_follows_order_lifecycle(self):
+        branch = Branch.objects.create(name="Chilonzor", latitude=41.28, longitude=69.2, chef_chat_id=-100, courier_chat_id=-200)
+        orders = [make_order(number) for number in range(1, 5)]
+        self.assertRollupMatchesOrders()
+
+        change_order_status(orders[0].id, 'tasdiqlangan', None, '')
+        change_order_status(orders[0].id, 'tayor', None, '')
+        change_order_status(orders[1].id, 'bekor_qilingan', None, '')
+        self.assertRollupMatchesOrders()
+
+        order = orders[2]
+        order.branch = branch
+        order.payment_method = 'karta'
+        order.delivery_cost = Decimal('8000')
+        order.total_amount = Decimal('38000')
+        order.save()
+        self.assertRollupMatchesOrders()
+
+        # Toshkent vaqti bilan ertasi kun (UTC da hali oldingi kun)
+        order.created_at = datetime.datetime(2026, 1, 1, 20, 30, tzinfo=datetime.timezone.utc)
+        order.save()
+        self.assertEqual(OrderDailyStats.objects.get(branch=branch).date, datetime.date(2026, 1, 2))
+        self.assertRollupMatchesOrders()
+
+        orders[3].delete()
+        order.delete()
+        self.assertRollupMatchesOrders()
+        self.assertFalse(OrderDailyStats.objects.filter(branch=branch).exists())
+
+    def test_rebuild_restores_rollup(self):
+        for number in range(1, 4):
+            make_order(number)
+        change_order_status(Order.objects.first().id, 'bekor_qilingan', None, '')
+        OrderDailyStats.objects.update(order_count=99, total_amount=0)
+        OrderDailyStats.objects.create(
+            date=datetime.date(2020, 1, 1), status='yangi', service_type='pickup', payment_method='naqd', order_count=5,
+        )
+
+        call_command('rebuild_order_stats', batch_size=1, stdout=StringIO())
+        self.assertRollupMatchesOrders()
+
+
+class CustomerCountersTests(TestCase):
+    """Mijoz hisoblagichlari buyurtmalar ustidagi yangi agregat bilan bir xil (bekor qilinganlarsiz)"""
+
+    def counters(self, customer):
+        customer.refresh_from_db()
+        return customer.order_count, customer.total_spent
+
+    def expected(self, customer):
+        active = Order.objects.filter(customer=customer).exclude(status='bekor_qilingan')
+        return active.count(), active.aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
+
+    def test_counters_follow_order_lifecycle(self):
+        first = make_order(1)
+        customer = first.customer
+        second = Order.objects.create(
+            customer=customer, telegram_user_id=customer.telegram_id,
+            products_total=Decimal('45000'), total_amount=Decimal('45000'),
+        )
+        self.assertEqual(self.counters(customer), (2, Decimal('75000')))
+        self.assertEqual(customer.last_order_at, second.created_at)
+
+        change_order_status(first.id, 'tasdiqlangan', None, '')
+        self.assertEqual(self.counters(customer), self.expected(customer))
+
+        # Eski nusxa saqlansa ham hisoblagichlar ustidan yozilmaydi
+        stale = Customer.objects.get(pk=customer.pk)
+        change_order_status(second.id, 'bekor_qilingan', None, '')
+        stale.full_name = "Yangi ism"
+        stale.save()
+        self.assertEqual(self.counters(customer), (1, Decimal('30000')))
+
+        first.refresh_from_db()
+        first.total_amount = Decimal('32000')
+        first.save()
+        self.assertEqual(self.counters(customer), (1, Decimal('32000')))
+
+        first.delete()
+        self.assertEqual(self.counters(customer), (0, Decimal('0')))
+        Order.objects.get(pk=second.pk).delete()
+        self.assertEqual(self.counters(customer), (0, Decimal('0')))
+
+    def test_rebuild_restores_counters(self):
+        orders = [make_order(number) for number in (1, 1, 2)]
+        change_order_status(orders[0].id, 'bekor_qilingan', None, '')
+        empty = Customer.objects.create(telegram_id=5000, full_name="Bo'sh", phone_number="+998900000000")
+        Customer.objects.update(order_count=9, total_spent=Decimal('1'), last_order_at=None)
+
+        call_command('rebuild_customer_stats', stdout=StringIO())
+        for customer in Customer.objects.all():
+            self.assertEqual(self.counters(customer), self.expected(customer))
+            latest = Order.objects.filter(customer=customer).order_by('-created_at').first()
+            self.assertEqual(customer.last_order_at, latest and latest.created_at)
+        self.assertEqual(self.counters(orders[0].customer), (1, Decimal('30000')))
+        self.assertEqual(self.counters(empty), (0, Decimal('0')))
+
+
+class KeysetPaginationTests(TestCase):
+    """Kursor sahifalari bir xil created_at li qatorlarni tashlab ketmaydi va takrorlamaydi"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ids = [make_order(number).id for number in range(1, 8)]
+        moment = timezone.now().replace(microsecond=0)
+        # Bir xil created_at li ikki guruh (3 va 4 qator): sahifa chegaralari guruhlar ichiga tushadi
+        Order.objects.filter(id__in=ids[:3]).update(created_at=moment)
+        Order.objects.filter(id__in=ids[3:]).update(created_at=moment - timedelta(minutes=5))
+        cls.expected = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def ids(self, page):
+        return [order.id for order in page]
+
+    def test_token_round_trip(self):
+        created_at = timezone.now()
+        token = pagination.encode_token(created_at, 42, pagination.PREV)
+        self.assertEqual(pagination.decode_token(token), (created_at, 42, pagination.PREV))
+        for bad in (None, '', 'x', 'bm90LWpzb24', token[:-3],
+                    pagination.encode_token(created_at, 42, 'z')):
+            self.assertIsNone(pagination.decode_token(bad), bad)
+
+    def test_next_and_previous_walk_all_rows(self):
+        pages = [pagination.keyset_paginate(Order.objects.all(), None, 2)]
+        self.assertFalse(pages[0].has_previous())
+        while pages[-1].has_next() and len(pages) <= len(self.expected):
+            pages.append(pagination.keyset_paginate(Order.objects.all(), pages[-1].next_token, 2))
+        self.assertEqual([order_id for page in pages for order_id in self.ids(page)], self.expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+        page = pages[-1]
+        for expected_page in reversed(pages[:-1]):
+            self.assertTrue(page.has_previous())
+            page = pagination.keyset_paginate(Order.objects.all(), page.previous_token, 2)
+            self.assertEqual(self.ids(page), self.ids(expected_page))
+            self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_cursor_without_rows_falls_back_to_first_page(self):
+        oldest = Order.objects.get(id=self.expected[-1])
+        first_page = self.ids(pagination.keyset_paginate(Order.objects.all(), None, 2))
+        for token in (pagination.encode_token(oldest.created_at, oldest.id, pagination.NEXT), 'buzilgan'):
+            page = pagination.keyset_paginate(Order.objects.all(), token, 2)
+            self.assertEqual(self.ids(page), first_page)
+            self.assertFalse(page.has_previous())
+            self.assertTrue(page.has_next())
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Parallel checkoutlar (web + bot): buyurtma raqamlari takrorlanmaydi va mijoz hisoblagichlari yo'qolmaydi"""
+
+    THREADS = 4
+    ORDERS_PER_THREAD = 8
+    CUSTOMERS = 3
+
+    def setUp(self):
+        category = Category.objects.create(name="Osh")
+        Product.objects.create(category=category, name="Palov", price=Decimal('30000'))
+
+    def checkout(self, worker, errors):
+        try:
+            for i in range(self.ORDERS_PER_THREAD):
+                # Hamma oqimlar bir xil mijozlar uchun - hisoblagichlar uchun raqobat
+                customer = i % self.CUSTOMERS
+                views._create_order_from_api({
+                    'user_id': 9000 + customer,
+                    'full_name': f"Mijoz {customer}",
+                    'phone': f"+99890000000{customer}",
+                    'service_type': 'pickup',
+                    'products_total': Decimal('30000'),
+                    'delivery_cost': Decimal('0'),
+                    'total': Decimal('30000') + worker,
+                    'products': [["Palov", 1, Decimal('30000')]],
+                })
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    def test_parallel_checkouts(self):
+        errors = []
+        threads = [threading.Thread(target=self.checkout, args=(worker, errors)) for worker in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+        total = self.THREADS * self.ORDERS_PER_THREAD
+        numbers = sorted(int(number) for number in Order.objects.values_list('order_number', flat=True))
+        self.assertEqual(numbers, list(range(1, total + 1)))
+
+        expected = {
+            row['customer_id']: (row['count'], row['spent'])
+            for row in Order.objects.values('customer_id').annotate(count=Count('id'), spent=Sum('total_amount'))
+        }
+        self.assertEqual(len(expected), self.CUSTOMERS)
+        for customer in Customer.objects.all():
+            self.assertEqual((customer.order_count, customer.total_spent), expected[customer.id])
+
+
+@override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class OrderChangesApiTests(TestCase):
+    url = '/chef_panel/api/orders/changes/'
+
+    def setUp(self):
+        cache.clear()
+        self.first = make_order(1)
+
+    def poll(self, since, **headers):
+        return self.client.get(self.url, {'since': since}, headers=headers)
+
+    def test_late_commit_inside_overlap_is_returned(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        late = make_order(2)
+        # Kursordan oldingi updated_at bilan kechroq commit bo'lgan qator
+        Order.objects.filter(pk=late.pk).update(updated_at=views._cursor_to_datetime(cursor) - timedelta(seconds=2))
+        data = self.poll(cursor).json()
+        self.assertIn(late.pk, [order['id'] for order in data['orders']])
+        self.assertFalse(data['full'])
+
+    def test_late_commit_changes_etag(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        etag = self.poll(cursor)['ETag']
+        self.assertEqual(self.poll(cursor, if_none_match=etag).status_code, 304)
+        late = make_order(2)
+        Order.objects.filter(pk=late.pk).update(updated_at=views._cursor_to_datetime(cursor) - timedelta(seconds=1))
+        self.assertEqual(self.poll(cursor, if_none_match=etag).status_code, 200)
+
+    def test_deleted_order_is_reported(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        order_id = self.first.pk
+        self.first.delete()
+        data = self.poll(cursor).json()
+        self.assertEqual(data['deleted'], [order_id])
+        self.assertEqual(data['orders'], [])
+
+    def test_stale_cursor_gets_full_board(self):
+        data = self.poll(1).json()
+        self.assertTrue(data['full'])
+        self.assertEqual([order['id'] for order in data['orders']], [self.first.pk])
+
+    def test_if_none_match_is_parsed(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        etag = self.poll(cursor)['ETag']
+        self.assertEqual(self.poll(cursor, if_none_match=f'"boshqa", W/{etag}').status_code, 304)
+        self.assertEqual(self.poll(cursor, if_none_match='*').status_code, 304)
+        # Qism-satr mos kelishi yetarli emas
+        self.assertEqual(self.poll(cursor, if_none_match=etag[:-2] + '"').status_code, 200)
+        self.assertEqual(self.poll(cursor, if_none_match=f'"x{etag[1:]}').status_code, 200)
+
+    def test_incremental_poll_within_budget(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        for number in range(2, 8):
+            make_order(number)
+        make_order(8).delete()
+        with assert_max_queries(get_query_budget(views.order_changes_api)):
+            data = self.poll(cursor).json()
+        self.assertEqual(len(data['orders']), 7)
+        self.assertEqual(len(data['deleted']), 1)
+
+
+class BotUpdateProcessorTests(SimpleTestCase):
+    """Bitta foydalanuvchining navbatdagi update'lari boshqalarning slotlarini band qilmaydi"""
+
+    @staticmethod
+    def make_update(user_id, update_id):
+        user = TelegramUser(user_id, "Mijoz", False)
+        message = Message(update_id, timezone.now(), Chat(user_id, Chat.PRIVATE), from_user=user, text="/start")
+        return Update(update_id, message=message)
+
+    async def test_waiting_user_does_not_hold_slot(self):
+        processor = telegram_bot.PerUserUpdateProcessor(2)
+        release = asyncio.Event()
+        finished = []
+
+        async def handle(tag, wait=False):
+            if wait:
+                await release.wait()
+            finished.append(tag)
+
+        busy = [
+            asyncio.create_task(processor.process_update(self.make_update(1, number), handle(number, wait=True)))
+            for number in range(4)
+        ]
+        await asyncio.sleep(0)
+        # 1-foydalanuvchi birinchi update'ni bajarmoqda, qolgan uchtasi uning lockini kutmoqda
+        await asyncio.wait_for(processor.process_update(self.make_update(2, 99), handle('other')), timeout=1)
+        self.assertEqual(finished, ['other'])
+
+        release.set()
+        await asyncio.gather(*busy)
+        self.assertEqual(finished, ['other', 0, 1, 2, 3])
+
+
+class BotStatusMessagesTests(TransactionTestCase):
+    """Bot tugmalari: holat qulf ostida o'zgaradi, xabarlar async klient orqali (DB oqimida HTTP yo'q)"""
+
+    @staticmethod
+    def tap(data):
+        update = mock.Mock()
+        update.callback_query.data = data
+        update.callback_query.answer = mock.AsyncMock()
+        return telegram_bot.handle_chef_courier_status_update(update, None)
+
+    async def test_status_change_uses_async_client(self):
+        order = await sync_to_async(make_order)(1)
+        sent = mock.AsyncMock(return_value={'ok': True, 'result': {'message_id': 55}})
+        with mock.patch.object(telegram_bot, 'asend_telegram_message', sent):
+            await self.tap(f"chef_confirm:{order.id}")
+
+        sent.assert_awaited_once()
+        self.assertEqual(sent.await_args.kwargs['chat_id'], order.telegram_user_id)
+        self.assertIn("Palov", sent.await_args.kwargs['text'])
+        refreshed = await Order.objects.aget(id=order.id)
+        self.assertEqual((refreshed.status, refreshed.user_message_id), ('tasdiqlangan', 55))
+
+    async def test_parallel_taps_change_status_once(self):
+        order = await sync_to_async(make_order)(1)
+        sent = mock.AsyncMock(return_value={'ok': True, 'result': {'message_id': 55}})
+        rejected = mock.AsyncMock()
+        with mock.patch.object(telegram_bot, 'asend_telegram_message', sent), \
+                mock.patch.object(telegram_bot, 'edit_message_based_on_type', rejected):
+            await asyncio.gather(*(self.tap(f"chef_confirm:{order.id}") for _ in range(4)))
+
+        self.assertEqual(rejected.await_count, 3)
+        history = [
+            (row.old_status, row.new_status)
+            async for row in OrderStatusHistory.objects.filter(order=order).order_by('id')
+        ]
+        self.assertEqual(history, [('', 'yangi'), ('yangi', 'tasdiqlangan')])
+
+
+class ZoneIndexTests(SimpleTestCase):
+    """Slab indeksi va ZoneIndex oddiy ray casting (point_in_polygon) bilan bir xil javob beradi"""
+
+    SQUARE = [[0, 0], [0, 1], [1, 1], [1, 0]]
+    # "C" shakli: [0.25, 0.75] x [0.5, 1] o'yig'i - tashqi chegara ichidagi teshik
+    NOTCHED = [[0, 0], [0, 1], [0.25, 1], [0.25, 0.5], [0.75, 0.5], [0.75, 1], [1, 1], [1, 0]]
+
+    @staticmethod
+    def tariff(zone_id):
+        return delivery.ZoneTariff(zone_id, f"Hudud {zone_id}", Decimal(zone_id * 1000), Decimal(0))
+
+    def assert_matches_reference(self, polygon, points):
+        compiled = delivery.compile_polygon(polygon)
+        for lat, lon in points:
+            self.assertEqual(
+                delivery.point_in_compiled(compiled, lat, lon), delivery.point_in_polygon(polygon, lat, lon), (lat, lon),
+            )
+
+    def test_inside_and_outside(self):
+        compiled = delivery.compile_polygon(self.SQUARE)
+        self.assertTrue(delivery.point_in_compiled(compiled, 0.5, 0.5))
+        for lat, lon in ((-0.5, 0.5), (1.5, 0.5), (0.5, -0.5), (0.5, 1.5), (2, 2)):
+            self.assertFalse(delivery.point_in_compiled(compiled, lat, lon), (lat, lon))
+
+    def test_edges_and_vertices_are_half_open(self):
+        # Pastki/chap chegara ichida, yuqori/o'ng tashqarida - qo'shni hududlar umumiy qirrani bo'lishmaydi
+        compiled = delivery.compile_polygon(self.SQUARE)
+        for lat, lon, inside in (
+            (0, 0.5, True), (0.5, 0, True), (1, 0.5, False), (0.5, 1, False),
+            (0, 0, True), (0, 1, False), (1, 0, False), (1, 1, False),
+        ):
+            self.assertEqual(delivery.point_in_compiled(compiled, lat, lon), inside, (lat, lon))
+        boundary = [(lat / 4, lon / 4) for lat in range(5) for lon in range(5)]
+        self.assert_matches_reference(self.SQUARE, boundary)
+        self.assert_matches_reference(self.NOTCHED, boundary)
+
+    def test_notch_is_outside(self):
+        compiled = delivery.compile_polygon(self.NOTCHED)
+        self.assertFalse(delivery.point_in_compiled(compiled, 0.5, 0.75))
+        self.assertTrue(delivery.point_in_compiled(compiled, 0.5, 0.25))
+        self.assertTrue(delivery.point_in_compiled(compiled, 0.1, 0.75))
+
+    def test_random_points_match_ray_casting(self):
+        from .management.commands.benchmark_delivery_zones import synthetic_zones
+
+        rng = random.Random(7)
+        for _, polygon, _ in synthetic_zones(5, 60, rng):
+            lats = [lat for lat, _ in polygon]
+            lons = [lon for _, lon in polygon]
+            points = [
+                (rng.uniform(min(lats) - 0.01, max(lats) + 0.01), rng.uniform(min(lons) - 0.01, max(lons) + 0.01))
+                for _ in range(500)
+            ]
+            # Uchlar ham. Qiya qirra ustidagi nuqtalar bu yerda yo'q: ikki usul qirrani turlicha
+            # yaxlitlaydi - chegaradagi xulq aniq koordinatalarda yuqorida tekshirilgan
+            points += [tuple(point) for point in polygon]
+            self.assert_matches_reference(polygon, points)
+
+    def test_zone_index_priority_and_holes(self):
+        outer = [[0, 0], [0, 4], [4, 4], [4, 0]]
+        inner = [[1, 1], [1, 3], [3, 3], [3, 1]]
+        side = [[0, 4], [0, 6], [4, 6], [4, 4]]
+        # Ichki hudud ustuvorroq - tashqi hudud ichida boshqa tarifli "teshik"
+        index = delivery.ZoneIndex([
+            (self.tariff(2), delivery.compile_polygon(inner)),
+            (self.tariff(1), delivery.compile_polygon(outer)),
+            (self.tariff(3), delivery.compile_polygon(side)),
+        ], grid_size=8)
+        self.assertEqual(index.lookup(2, 2).zone_id, 2)
+        self.assertEqual(index.lookup(0.5, 0.5).zone_id, 1)
+        self.assertEqual(index.lookup(2, 5).zone_id, 3)
+        # Umumiy qirra (lon=4) faqat bitta hududga tegishli
+        self.assertEqual(index.lookup(2, 4).zone_id, 3)
+        self.assertIsNone(index.lookup(5, 5))
+        self.assertIsNone(index.lookup(-1, 2))
+        self.assertIsNone(delivery.ZoneIndex([]).lookup(2, 2))
+
+    def test_zone_index_matches_reference(self):
+        from .management.commands.benchmark_delivery_zones import synthetic_zones
+
+        rng = random.Random(11)
+        zones = synthetic_zones(8, 40, rng)
+        index = delivery.ZoneIndex([
+            (self.tariff(number), delivery.compile_polygon(polygon)) for number, (_, polygon, _) in enumerate(zones)
+        ])
+        min_lat, min_lon, max_lat, max_lon = index.bbox
+        for _ in range(2000):
+            lat, lon = rng.uniform(min_lat - 0.01, max_lat + 0.01), rng.uniform(min_lon - 0.01, max_lon + 0.01)
+            expected = next(
+                (number for number, (_, polygon, _) in enumerate(zones) if delivery.point_in_polygon(polygon, lat, lon)),
+                None,
+            )
+            found = index.lookup(lat, lon)
+            self.assertEqual(found.zone_id if found else None, expected, (lat, lon))
+
+
+class QuoteCacheTests(SimpleTestCase):
+    def test_lru_eviction_and_counters(self):
+        quotes = delivery.QuoteCache(2)
+        computed = []
+
+        def compute(key):
+            return lambda: computed.append(key) or key.upper()
+
+        self.assertEqual(quotes.get_or_compute('a', compute('a')), 'A')
+        quotes.get_or_compute('b', compute('b'))
+        self.assertEqual(quotes.get_or_compute('a', compute('a')), 'A')  # a - eng yangi
+        quotes.get_or_compute('c', compute('c'))  # b chiqib ketadi
+        quotes.get_or_compute('a', compute('a'))
+        quotes.get_or_compute('b', compute('b'))
+        self.assertEqual(computed, ['a', 'b', 'c', 'b'])
+        self.assertEqual(
+            quotes.stats(), {'size': 2, 'hits': 2, 'misses': 4, 'evictions': 2, 'hit_rate': 0.333},
+        )
+
+        quotes.clear()
+        self.assertEqual(len(quotes), 0)
+        self.assertEqual(quotes.stats()['hit_rate'], None)
+
+
+class GeohashTests(SimpleTestCase):
+    def test_known_value(self):
+        self.assertEqual(delivery.geohash_encode(42.6, -5.6, 5), 'ezs42')
+        lat, lon = delivery.geohash_center('ezs42')
+        self.assertAlmostEqual(lat, 42.605, places=3)
+        self.assertAlmostEqual(lon, -5.603, places=3)
+
+    def test_round_trip(self):
+        rng = random.Random(3)
+        for precision in (5, 7, 8):
+            for _ in range(200):
+                lat, lon = rng.uniform(-89, 89), rng.uniform(-179, 179)
+                cell = delivery.geohash_encode(lat, lon, precision)
+                self.assertEqual(len(cell), precision)
+                center = delivery.geohash_center(cell)
+                self.assertEqual(delivery.geohash_encode(*center, precision), cell)
+                # Markaz nuqtaga katak o'lchamining yarmidan yaqin
+                lat_size = 180 / 2 ** (precision * 5 // 2)
+                lon_size = 360 / 2 ** (precision * 5 - precision * 5 // 2)
+                self.assertLessEqual(abs(center[0] - lat), lat_size / 2)
+                self.assertLessEqual(abs(center[1] - lon), lon_size / 2)
+
+
+class DeliveryQuoteInvalidationTests(TestCase):
+    """Hudud yoki filial o'zgarsa keshlangan narx ishlatilmaydi"""
+
+    def setUp(self):
+        patcher = mock.patch.object(telegram_bot, 'delivery_quotes', delivery.QuoteCache(100))
+        self.quotes = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.moment = timezone.make_aware(datetime.datetime(2026, 1, 5, 12, 0))
+
+    def quote(self):
+        return telegram_bot.quote_delivery_sync(41.01, 69.01, self.moment)[0]
+
+    def test_zone_change_invalidates(self):
+        zone = DeliveryZone.objects.create(
+            name="Markaz", polygon=[[40.9, 68.9], [40.9, 69.2], [41.2, 69.2], [41.2, 68.9]], base_cost=7000,
+        )
+        self.assertEqual(self.quote().cost, 7000)
+        self.assertEqual(self.quote().cost, 7000)
+        self.assertEqual((self.quotes.hits, self.quotes.misses), (1, 1))
+
+        zone.base_cost = 9000
+        zone.save()
+        self.assertEqual(self.quote().cost, 9000)
+        zone.delete()
+        # Hudud ham filial ham yo'q - yagona oshxona radiusi (bu nuqta undan uzoq)
+        with mock.patch.object(telegram_bot, 'bot_settings', mock.Mock(delivery_max_radius_km=10.0)):
+            self.assertIsNone(self.quote().cost)
+        self.assertEqual((self.quotes.hits, self.quotes.misses), (1, 3))
+
+    def test_branch_change_invalidates(self):
+        DeliveryZone.objects.create(
+            name="Markaz", polygon=[[40.9, 68.9], [40.9, 69.2], [41.2, 69.2], [41.2, 68.9]], base_cost=7000,
+        )
+        branch = Branch.objects.create(
+            name="Chilonzor", latitude=41.0, longitude=69.0, chef_chat_id=-100, courier_chat_id=-200,
+            opening_time=datetime.time(0, 0), closing_time=datetime.time(23, 59),
+        )
+        self.assertEqual(self.quote().branch.id, branch.id)
+        branch.is_active = False
+        branch.save()
+        self.assertIsNone(self.quote().branch)
+        self.assertEqual((self.quotes.hits, self.quotes.misses), (0, 2))
+
+
+class BotSessionEvictionTests(TransactionTestCase):
+    """Xotiradan chiqarish bazadagi holatni o'chirmaydi; haqiqiy drop_user_data o'chiradi"""
+
+    def setUp(self):
+        self.persistence = DatabasePersistence(session_ttl=3600)
+        self.application = ApplicationBuilder().token("123:test").persistence(self.persistence).build()
+
+    async def visit(self, user_id):
+        """Update kelgandagi PTB yo'li: holat yuklanadi, handler yozadi, keyin persistence"""
+        user_data = self.application.user_data[user_id]
+        await self.persistence.refresh_user_data(user_id, user_data)
+        return user_data
+
+    async def persist(self, *user_ids):
+        if user_ids:
+            self.application.mark_data_for_update_persistence(user_ids=user_ids)
+        await self.application.update_persistence()
+        await self.persistence.flush()
+
+    async def stored(self, user_id):
+        return await BotUserState.objects.filter(telegram_id=user_id).values_list('data', flat=True).afirst()
+
+    async def test_evict_reload_then_delete(self):
+        (await self.visit(1))['savat'] = {'Palov': 2}
+        (await self.visit(2))['phone'] = '+998901234567'
+        await self.persist(1, 2)
+        self.assertEqual(await self.stored(1), {'savat': {'Palov': 2}})
+
+        # 1-foydalanuvchi eskirdi - xotiradan chiqariladi, bazada qoladi
+        self.persistence._last_seen[1] -= 7200
+        stats = await self.persistence.evict_sessions(self.application)
+        self.assertEqual(stats['evicted'], 1)
+        self.assertNotIn(1, self.application.user_data)
+        await self.persist()
+        self.assertEqual(await self.stored(1), {'savat': {'Palov': 2}})
+        self.assertNotIn(1, self.persistence._evicted)
+
+        # Qaytib keldi - holat bazadan yuklanadi
+        user_data = await self.visit(1)
+        self.assertEqual(user_data, {'savat': {'Palov': 2}})
+        user_data['savat']['Somsa'] = 1
+        await self.persist(1)
+        self.assertEqual(await self.stored(1), {'savat': {'Palov': 2, 'Somsa': 1}})
+
+        # Haqiqiy o'chirish (PTB drop_user_data) - bazadan ham o'chadi
+        self.application.drop_user_data(1)
+        await self.persist()
+        self.assertIsNone(await self.stored(1))
+        self.assertEqual(await self.stored(2), {'phone': '+998901234567'})
+
+    async def test_returning_user_during_eviction_is_persisted(self):
+        (await self.visit(1))['savat'] = {'Palov': 1}
+        await self.persist(1)
+        self.persistence._last_seen[1] -= 7200
+        await self.persistence.evict_sessions(self.application)
+
+        # drop_user_data persistence ga yetmasdan qaytib keldi
+        (await self.visit(1))['savat'] = {'Palov': 3}
+        self.application.mark_data_for_update_persistence(user_ids=1)
+        await self.persist()
+        await self.persist()
+        self.assertEqual(await self.stored(1), {'savat': {'Palov': 3}})
+
+
+class BotDeliveryQuoteTests(SimpleTestCase):
+    def test_branch_radius_limits_delivery(self):
+        branch = delivery.BranchInfo(
+            1, "Chilonzor", "", 41.0, 69.0, datetime.time(0, 0), datetime.time(23, 59), -100, -200, 20.0,
+        )
+        index = delivery.BranchIndex([branch])
+        moment = timezone.make_aware(datetime.datetime(2026, 1, 5, 12, 0))
+        # ~15 km shimolda: filial radiusi ichida, eski 10 km chegarasidan tashqarida
+        quote = telegram_bot._compute_delivery_quote(41.135, 69.0, moment, None, index)
+        self.assertEqual(quote.branch, branch)
+        self.assertGreater(quote.distance_km, 10)
+        self.assertEqual(quote.cost, telegram_bot.calculate_delivery_cost(quote.distance_km, 20.0))
+        self.assertIsNotNone(quote.cost)
+
+
+class TelegramRequestTests(SimpleTestCase):
+    @override_settings(TELEGRAM_TIMEOUT=3.5)
+    def test_sync_requests_have_timeout(self):
+        with mock.patch.object(utils.requests, 'post') as post:
+            post.return_value.json.return_value = {'ok': True}
+            utils.send_telegram_message(1, "salom")
+            utils.send_telegram_location(1, 41.3, 69.2)
+        self.assertEqual([call.kwargs['timeout'] for call in post.call_args_list], [3.5, 3.5])
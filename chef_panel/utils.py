@@ -1,12 +1,18 @@
+import asyncio
+import weakref
+
+import httpx
 import requests
 import json
 import logging
 from django.conf import settings
 
+from .profiling import span
+
 logger = logging.getLogger(__name__)
 
-def send_telegram_message(chat_id, text, reply_markup=None, message_id=None, parse_mode="Markdown"):
-    """Telegram Bot API orqali xabar yuborish/tahrirlash"""
+def _message_request(chat_id, text, reply_markup=None, message_id=None, parse_mode="Markdown"):
+    """sendMessage/editMessageText uchun URL va payload"""
     url = f"{settings.TELEGRAM_API_BASE_URL}{settings.TELEGRAM_BOT_TOKEN}/"
     payload = {
         'chat_id': chat_id,
@@ -15,15 +21,23 @@ def send_telegram_message(chat_id, text, reply_markup=None, message_id=None, par
     }
     if reply_markup:
         payload['reply_markup'] = json.dumps(reply_markup)
+    if message_id:
+        url += "editMessageText"
+        payload['message_id'] = message_id
+    else:
+        url += "sendMessage"
+    return url, payload
 
-    try:
-        if message_id:
-            url += "editMessageText"
-            payload['message_id'] = message_id
-        else:
-            url += "sendMessage"
+def _location_request(chat_id, latitude, longitude):
+    url = f"{settings.TELEGRAM_API_BASE_URL}{settings.TELEGRAM_BOT_TOKEN}/sendLocation"
+    return url, {'chat_id': chat_id, 'latitude': latitude, 'longitude': longitude}
 
-        response = requests.post(url, json=payload)
+def send_telegram_message(chat_id, text, reply_markup=None, message_id=None, parse_mode="Markdown"):
+    """Telegram Bot API orqali xabar yuborish/tahrirlash"""
+    url, payload = _message_request(chat_id, text, reply_markup, message_id, parse_mode)
+    try:
+        with span('telegram'):
+            response = requests.post(url, json=payload, timeout=settings.TELEGRAM_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -32,16 +46,45 @@ def send_telegram_message(chat_id, text, reply_markup=None, message_id=None, par
 
 def send_telegram_location(chat_id, latitude, longitude):
     """Telegram Bot API orqali lokatsiya yuborish"""
-    url = f"{settings.TELEGRAM_API_BASE_URL}{settings.TELEGRAM_BOT_TOKEN}/sendLocation"
-    payload = {
-        'chat_id': chat_id,
-        'latitude': latitude,
-        'longitude': longitude
-    }
+    url, payload = _location_request(chat_id, latitude, longitude)
     try:
-        response = requests.post(url, json=payload)
+        with span('telegram'):
+            response = requests.post(url, json=payload, timeout=settings.TELEGRAM_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         logger.error(f"Telegram lokatsiya yuborishda xato: {e}")
         return None
+
+# Event loop -> httpx.AsyncClient: ulanishlar (TLS) bitta worker ichidagi so'rovlar
+# orasida qayta ishlatiladi. Klient o'z loopiga bog'langan, shuning uchun loop bo'yicha
+_async_clients = weakref.WeakKeyDictionary()
+
+def _async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(timeout=settings.TELEGRAM_TIMEOUT)
+    return client
+
+async def _apost(url, payload):
+    with span('telegram'):
+        response = await _async_client().post(url, json=payload)
+    response.raise_for_status()
+    return response.json()
+
+async def asend_telegram_message(chat_id, text, reply_markup=None, message_id=None, parse_mode="Markdown"):
+    """send_telegram_message ning async varianti (ASGI view lar uchun - workerni bloklamaydi)"""
+    try:
+        return await _apost(*_message_request(chat_id, text, reply_markup, message_id, parse_mode))
+    except httpx.HTTPError as e:
+        logger.error(f"Telegram xabar yuborishda xato: {e}")
+        return None
+
+async def asend_telegram_location(chat_id, latitude, longitude):
+    """send_telegram_location ning async varianti"""
+    try:
+        return await _apost(*_location_request(chat_id, latitude, longitude))
+    except httpx.HTTPError as e:
+        logger.error(f"Telegram lokatsiya yuborishda xato: {e}")
+        return None
@@ -1,106 +1,222 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from django.db.models import Count, Q, Sum
-from django.core.paginator import Paginator
+from django.utils.http import parse_etags
+from django.db import connection
+from django.db.models import Q, Sum, Max, Prefetch
+from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+import asyncio
+import hashlib
 import json
 import logging
-from datetime import timedelta
+from functools import partial, wraps
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
 from django.conf import settings
-from .utils import send_telegram_message, send_telegram_location
-from .models import Order, Product, Category, OrderItem, OrderStatusHistory, Customer
+from .utils import send_telegram_message, send_telegram_location, asend_telegram_message, asend_telegram_location
+from .models import Order, Product, Category, OrderItem, OrderStatusHistory, Customer, OrderDailyStats, Branch, OrderTombstone
 from .forms import ProductForm, CategoryForm
+from .query_budget import query_budget
+from .db import write_transaction
+from .order_status import change_order_status
+from .search import search_orders
+from .pagination import keyset_paginate
+from . import export, profiling
+from .order_history import get_customer_orders_page
 
 logger = logging.getLogger(__name__)
 
-def dashboard(request):
-    """Oshpaz dashboard"""
-    # Statistika
-    today = timezone.now().date()
-    
-    stats = {
-        'yangi_buyurtmalar': Order.objects.filter(status='yangi').count(),
-        'tasdiqlangan_buyurtmalar': Order.objects.filter(status='tasdiqlangan').count(),
-        'tayor_buyurtmalar': Order.objects.filter(status='tayor').count(),
-        'bugungi_buyurtmalar': Order.objects.filter(created_at__date=today).count(),
-        'pickup_buyurtmalar': Order.objects.filter(service_type='pickup', status__in=['yangi', 'tasdiqlangan', 'tayor']).count(),
-        'delivery_buyurtmalar': Order.objects.filter(service_type='delivery', status__in=['yangi', 'tasdiqlangan', 'tayor', 'yolda']).count(),
+# Oshpaz doskasida ko'rinadigan buyurtmalar (pickup buyurtmalar olib ketilmaguncha)
+BOARD_ORDERS_Q = Q(status__in=['yangi', 'tasdiqlangan']) | Q(status='tayor', service_type='pickup')
+
+CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+DASHBOARD_CACHE_KEY = 'chef_panel:dashboard_stats'
+
+# Panel qaysi filial buyurtmalarini ko'rsatadi: ?branch=<id> (?branch=all - hammasi)
+# cookie da eslab qolinadi - har bir oshxona planshetida o'z filiali
+BRANCH_COOKIE = 'chef_branch'
+BRANCH_COOKIE_MAX_AGE = 365 * 24 * 3600
+
+# Holat kodi -> ko'rinadigan nomi
+STATUS_DISPLAY = dict(Order.STATUS_CHOICES)
+
+# Buyurtma kartochkasi va ro'yxat qatori uchun kerakli ustunlar
+ORDER_ROW_FIELDS = (
+    'id', 'order_number', 'status', 'service_type', 'payment_method', 'address',
+    'total_amount', 'created_at', 'updated_at',
+    'customer', 'customer__full_name', 'customer__phone_number',
+    'branch', 'branch__name', 'branch__updated_at',
+)
+
+def _with_row_data(queryset):
+    """Ro'yxat qatori uchun mijoz va filialni JOIN bilan, faqat kerakli ustunlarni yuklash"""
+    return queryset.select_related('customer', 'branch').only(*ORDER_ROW_FIELDS)
+
+def _panel_branch_id(request):
+    """Panelda tanlangan filial ID si (?branch= yoki cookie), hammasi bo'lsa None"""
+    value = request.GET.get('branch', request.COOKIES.get(BRANCH_COOKIE, ''))
+    return int(value) if value.isdigit() else None
+
+def _branch_scoped(view_func):
+    """
+    Sahifa view lari uchun: request.branch_id ni o'rnatadi, ?branch= bilan tanlangan
+    filialni cookie ga yozadi. Shablonga filiallar ro'yxati 'branches' orqali beriladi.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        request.branch_id = _panel_branch_id(request)
+        response = view_func(request, *args, **kwargs)
+        if 'branch' in request.GET:
+            if request.branch_id:
+                response.set_cookie(BRANCH_COOKIE, str(request.branch_id), max_age=BRANCH_COOKIE_MAX_AGE, samesite='Lax')
+            else:
+                response.delete_cookie(BRANCH_COOKIE)
+        return response
+    return wrapper
+
+def _branch_context(request):
+    """Filial tanlash ro'yxati (filiallar bo'lmasa bo'sh - selektor ko'rinmaydi)"""
+    return {
+        'branches': list(Branch.objects.filter(is_active=True).only('id', 'name')),
+        'branch_id': request.branch_id,
     }
-    
-    # Oxirgi buyurtmalar
-    recent_orders = Order.objects.filter(
-        Q(status__in=['yangi', 'tasdiqlangan']) |
-        Q(status='tayor', service_type='pickup')
-    ).order_by('-created_at')[:10]
-    
-    # Mijozlar statistikasi: eng ko'p buyurtma bergan mijozlar
-    top_customers = Customer.objects.annotate(
-        order_count=Count('order')
-    ).order_by('-order_count')[:10]
-
-    # Haftalik buyurtmalar statistikasi
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    weekly_orders_queryset = Order.objects.filter(created_at__gte=seven_days_ago)
-    
-    weekly_stats = {
-        'total_orders': weekly_orders_queryset.count(),
-        'total_amount': weekly_orders_queryset.aggregate(Sum('total_amount'))['total_amount__sum'] or 0,
-        'pickup_orders': weekly_orders_queryset.filter(service_type='pickup').count(),
-        'delivery_orders': weekly_orders_queryset.filter(service_type='delivery').count(),
+
+def _scope_branch(queryset, branch_id):
+    return queryset.filter(branch_id=branch_id) if branch_id else queryset
+
+def _with_card_data(queryset):
+    """Kartochka uchun qatordan tashqari mahsulotlarni ham bitta so'rovda oldindan yuklash"""
+    return _with_row_data(queryset).prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product').only(
+            'order', 'quantity', 'total', 'product', 'product__name'
+        ))
+    )
+
+def _order_items(order):
+    """Buyurtma mahsulotlari mahsulot nomi bilan bitta JOIN so'rovida"""
+    return list(order.items.select_related('product'))
+
+def _is_board_order(order):
+    """Buyurtma oshpaz doskasida ko'rinadimi (BOARD_ORDERS_Q bilan bir xil shart)"""
+    return order.status in ('yangi', 'tasdiqlangan') or (order.status == 'tayor' and order.service_type == 'pickup')
+
+def _change_cursor(updated_at):
+    """updated_at ni delta API kursoriga (epoch mikrosekund) aylantirish"""
+    if updated_at is None:
+        return 0
+    return (updated_at - CURSOR_EPOCH) // timedelta(microseconds=1)
+
+def _cursor_to_datetime(cursor):
+    """Delta API kursorini datetime ga qaytarish"""
+    return CURSOR_EPOCH + timedelta(microseconds=cursor)
+
+def _board_cursor(branch_id=None):
+    """Buyurtmalar bo'yicha oxirgi o'zgarish kursori (updated_at indeksi orqali)"""
+    return _change_cursor(_scope_branch(Order.objects.all(), branch_id).aggregate(last=Max('updated_at'))['last'])
+
+def _dashboard_stats(branch_id=None):
+    """
+    Dashboard statistikasi - OrderDailyStats rollup jadvali bo'yicha bitta shartli
+    agregatsiya so'rovi (buyurtmalar soniga emas, kunlar soniga bog'liq)
+    """
+    today = timezone.localdate()
+    today_q = Q(date=today)
+    week_q = Q(date__gt=today - timedelta(days=7), date__lte=today)
+
+    aggregates = {
+        'yangi_buyurtmalar': Sum('order_count', filter=Q(status='yangi')),
+        'tasdiqlangan_buyurtmalar': Sum('order_count', filter=Q(status='tasdiqlangan')),
+        'tayor_buyurtmalar': Sum('order_count', filter=Q(status='tayor')),
+        'bugungi_buyurtmalar': Sum('order_count', filter=today_q),
+        'pickup_buyurtmalar': Sum('order_count', filter=Q(service_type='pickup', status__in=['yangi', 'tasdiqlangan', 'tayor'])),
+        'delivery_buyurtmalar': Sum('order_count', filter=Q(service_type='delivery', status__in=['yangi', 'tasdiqlangan', 'tayor', 'yolda'])),
+        'today_sales': Sum('total_amount', filter=today_q),
+        'weekly_total_orders': Sum('order_count', filter=week_q),
+        'weekly_total_amount': Sum('total_amount', filter=week_q),
+        'weekly_pickup_orders': Sum('order_count', filter=week_q & Q(service_type='pickup')),
+        'weekly_delivery_orders': Sum('order_count', filter=week_q & Q(service_type='delivery')),
     }
+    for status, _ in Order.STATUS_CHOICES:
+        aggregates[f'status_sales__{status}'] = Sum('total_amount', filter=Q(status=status))
+    for service_type, _ in Order.SERVICE_TYPE_CHOICES:
+        aggregates[f'service_orders__{service_type}'] = Sum('order_count', filter=Q(service_type=service_type))
+        aggregates[f'service_sales__{service_type}'] = Sum('total_amount', filter=Q(service_type=service_type))
 
-    # Bugungi umumiy savdo
-    today_sales = Order.objects.filter(created_at__date=today).aggregate(Sum('total_amount'))['total_amount__sum'] or 0
+    totals = _scope_branch(OrderDailyStats.objects.all(), branch_id).aggregate(**aggregates)
 
-    # Holatlar bo'yicha savdo
-    sales_by_status = Order.objects.values('status').annotate(total_sales=Sum('total_amount')).order_by('status')
-    
-    # Status nomlarini olish uchun lug'at yaratamiz
-    status_display_map = dict(Order.STATUS_CHOICES)
-    sales_by_status_display = []
-    for item in sales_by_status:
-        sales_by_status_display.append({
-            'status': status_display_map.get(item['status'], item['status']),
-            'total_sales': item['total_sales']
-        })
+    stats = {key: totals[key] or 0 for key in (
+        'yangi_buyurtmalar', 'tasdiqlangan_buyurtmalar', 'tayor_buyurtmalar',
+        'bugungi_buyurtmalar', 'pickup_buyurtmalar', 'delivery_buyurtmalar',
+    )}
+    weekly_stats = {
+        'total_orders': totals['weekly_total_orders'] or 0,
+        'total_amount': totals['weekly_total_amount'] or 0,
+        'pickup_orders': totals['weekly_pickup_orders'] or 0,
+        'delivery_orders': totals['weekly_delivery_orders'] or 0,
+    }
+
+    # Holatlar bo'yicha savdo (faqat buyurtmasi bor holatlar, kod bo'yicha tartiblangan)
+    sales_by_status = []
+    for status, label in sorted(Order.STATUS_CHOICES):
+        total_sales = totals[f'status_sales__{status}']
+        if total_sales is not None:
+            sales_by_status.append({'status': label, 'total_sales': total_sales})
 
     # Service type bo'yicha statistika
-    service_stats = Order.objects.values('service_type').annotate(
-        total_orders=Count('id'),
-        total_sales=Sum('total_amount')
-    ).order_by('service_type')
-    
-    service_display_map = dict(Order.SERVICE_TYPE_CHOICES)
-    service_stats_display = []
-    for item in service_stats:
-        service_stats_display.append({
-            'service_type': service_display_map.get(item['service_type'], item['service_type']),
-            'total_orders': item['total_orders'],
-            'total_sales': item['total_sales']
-        })
+    service_stats = []
+    for service_type, label in sorted(Order.SERVICE_TYPE_CHOICES):
+        if totals[f'service_orders__{service_type}']:
+            service_stats.append({
+                'service_type': label,
+                'total_orders': totals[f'service_orders__{service_type}'],
+                'total_sales': totals[f'service_sales__{service_type}'],
+            })
 
-    context = {
+    # Oxirgi buyurtmalar
+    recent_orders = list(_with_row_data(_scope_branch(Order.objects.filter(BOARD_ORDERS_Q), branch_id)).order_by('-created_at')[:10])
+
+    # Mijozlar statistikasi: eng ko'p buyurtma bergan mijozlar (Customer.order_count indeksi bo'yicha)
+    top_customers = list(Customer.objects.order_by('-order_count', '-id')[:10])
+
+    return {
         'stats': stats,
         'recent_orders': recent_orders,
         'top_customers': top_customers,
         'weekly_stats': weekly_stats,
-        'today_sales': today_sales,
-        'sales_by_status': sales_by_status_display,
-        'service_stats': service_stats_display,
+        'today_sales': totals['today_sales'] or 0,
+        'sales_by_status': sales_by_status,
+        'service_stats': service_stats,
     }
-    return render(request, 'chef_panel/dashboard.html', context)
 
+@query_budget(4)
+@_branch_scoped
+def dashboard(request):
+    """Oshpaz dashboard"""
+    # Bir nechta ochiq dashboard bazaga bir necha soniyada bir marta murojaat qiladi
+    context = cache.get_or_set(
+        f'{DASHBOARD_CACHE_KEY}:{request.branch_id or "all"}',
+        partial(_dashboard_stats, request.branch_id),
+        settings.DASHBOARD_CACHE_SECONDS,
+    )
+    return render(request, 'chef_panel/dashboard.html', {**context, **_branch_context(request)})
+
+@query_budget(3)
+@_branch_scoped
 def order_list(request):
     """Barcha buyurtmalar ro'yxati"""
     status_filter = request.GET.get('status', '')
     service_type_filter = request.GET.get('service_type', '')
     search = request.GET.get('search', '')
     
-    orders = Order.objects.all().order_by('-created_at')
+    orders = _with_row_data(_scope_branch(Order.objects.all(), request.branch_id))
     
     if status_filter:
         orders = orders.filter(status=status_filter)
@@ -109,15 +225,20 @@ def order_list(request):
         orders = orders.filter(service_type=service_type_filter)
     
     if search:
-        orders = orders.filter(
-            Q(order_number__icontains=search) |
-            Q(customer__full_name__icontains=search) |
-            Q(customer__phone_number__icontains=search)
-        )
+        # Indeks bo'yicha qidiruv: buyurtma raqami, telefon, ism tokenlari
+        orders = search_orders(orders, search)
     
-    paginator = Paginator(orders, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Taxminiy son COUNT(*) o'rniga rollup jadvalidan (qidiruvda hisoblanmaydi)
+    approximate_count = None
+    if not search:
+        stats = _scope_branch(OrderDailyStats.objects.all(), request.branch_id)
+        if status_filter:
+            stats = stats.filter(status=status_filter)
+        if service_type_filter:
+            stats = stats.filter(service_type=service_type_filter)
+        approximate_count = stats.aggregate(total=Sum('order_count'))['total'] or 0
+
+    page_obj = keyset_paginate(orders, request.GET.get('cursor'), 20, approximate_count)
     
     context = {
         'page_obj': page_obj,
@@ -126,171 +247,342 @@ def order_list(request):
         'search': search,
         'status_choices': Order.STATUS_CHOICES,
         'service_type_choices': Order.SERVICE_TYPE_CHOICES,
+        **_branch_context(request),
     }
     return render(request, 'chef_panel/order_list.html', context)
 
+@query_budget(4)
+@_branch_scoped
 def new_orders(request):
     """Yangi buyurtmalar - pickup buyurtmalar olib ketilmaguncha ko'rinadi"""
-    orders = Order.objects.filter(
-        Q(status__in=['yangi', 'tasdiqlangan']) |
-        Q(status='tayor', service_type='pickup')
-    ).order_by('-created_at')
+    # Kursor buyurtmalardan oldin olinadi: oraliqdagi o'zgarishlar keyingi deltada qayta keladi
+    cursor = _board_cursor(request.branch_id)
+    orders = _with_card_data(_scope_branch(Order.objects.filter(BOARD_ORDERS_Q), request.branch_id)).order_by('-created_at')
     
     context = {
         'orders': orders,
         'title': 'Yangi buyurtmalar',
+        'cursor': cursor,
+        **_branch_context(request),
     }
     return render(request, 'chef_panel/new_orders.html', context)
 
+@query_budget(3)
 def order_detail(request, order_id):
     """Buyurtma tafsilotlari"""
-    order = get_object_or_404(Order, id=order_id)
-    order_items = order.items.all()
-    status_history = order.status_history.all()
+    order = get_object_or_404(Order.objects.select_related('customer', 'branch'), id=order_id)
+    order_items = order.items.select_related('product')
+    status_history = order.status_history.select_related('changed_by')
     
     context = {
         'order': order,
         'order_items': order_items,
         'status_history': status_history,
+        'cursor': _change_cursor(order.updated_at),
     }
     return render(request, 'chef_panel/order_detail.html', context)
 
+def _order_changes_data(request, changed, order_id, ordered):
+    """order_changes_api: o'zgargan buyurtmalar va ularning HTML qismlari"""
+    if order_id:
+        # Detal sahifasi timeline uchun to'liq satrni ishlatadi
+        changed = changed.select_related('customer')
+    else:
+        changed = _with_card_data(changed)
+    if ordered:
+        changed = changed.order_by('created_at')
+    else:
+        # id lar bo'yicha tanlangan (updated_at oynasi) - kam, Python da saralanadi
+        changed = sorted(changed.order_by(), key=lambda order: (order.created_at, order.id))
+
+    orders_data = []
+    for order in changed:
+        order_data = {
+            'id': order.id,
+            'order_number': order.order_number,
+            'status': order.status,
+            'status_display': order.get_status_display(),
+            'service_type': order.service_type,
+            'cursor': _change_cursor(order.updated_at),
+            'on_board': _is_board_order(order),
+        }
+        if order_id:
+            context = {'order': order, 'status_history': order.status_history.select_related('changed_by')}
+            order_data['status_html'] = render_to_string('chef_panel/partials/order_status_badge.html', context, request)
+            order_data['timeline_html'] = render_to_string('chef_panel/partials/order_timeline.html', context, request)
+            order_data['actions_html'] = render_to_string('chef_panel/partials/order_actions.html', context, request)
+            order_data['history_html'] = render_to_string('chef_panel/partials/order_history.html', context, request)
+        elif order_data['on_board']:
+            order_data['card_html'] = render_to_string('chef_panel/partials/order_card.html', {'order': order}, request)
+        orders_data.append(order_data)
+    return orders_data
+
+def _etag_matches(if_none_match, etag):
+    """If-None-Match: vergul bilan ajratilgan teglar, '*' va zaif (W/) taqqoslash (RFC 9110)"""
+    tags = parse_etags(if_none_match)
+    if tags == ['*']:
+        return True
+    def opaque(tag):
+        return tag[2:] if tag.startswith('W/') else tag
+    return opaque(etag) in {opaque(tag) for tag in tags}
+
+def _changes_digest(window, tombstones):
+    """Oyna tarkibi (id, updated_at) va o'chirilganlar bo'yicha qisqa xesh - ETag uchun"""
+    payload = repr((sorted(window), sorted(tombstones))).encode()
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
 @csrf_exempt
-def create_order_api(request):
+@query_budget(4)
+async def order_changes_api(request):
+    """API: Kursordan keyin yaratilgan, o'zgargan yoki o'chirilgan buyurtmalar (delta)
+
+    ?since=<kursor> - oxirgi olingan kursor (bo'sh bo'lsa doska to'liq qaytariladi)
+    ?order=<id>     - faqat bitta buyurtma (order_detail sahifasi uchun)
+    Doska panelda tanlangan filial (cookie) bo'yicha cheklanadi.
+
+    updated_at - devor soati: PostgreSQL da kechroq commit bo'lgan qator kursordan
+    oldingi vaqt bilan paydo bo'lishi mumkin, shuning uchun kursordan
+    ORDER_CHANGES_OVERLAP_SECONDS oldingi o'zgarishlar ham qayta yuboriladi (mijoz id
+    bo'yicha birlashtiradi). ETag shu oyna tarkibidan - o'zgarish bo'lmasa 304.
+    O'chirilganlar 'deleted' da (OrderTombstone); kursor izlar saqlanish muddatidan
+    eski bo'lsa javob 'full': true - doska to'liq almashtiriladi.
+    """
+    if request.method == 'GET':
+        try:
+            since = int(request.GET.get('since') or 0)
+            order_id = request.GET.get('order')
+            branch_id = None
+            scope = Order.objects.all()
+            tombstones = OrderTombstone.objects.all()
+            if order_id:
+                order_id = int(order_id)
+                scope = scope.filter(id=order_id)
+                tombstones = tombstones.filter(order_id=order_id)
+            else:
+                branch_id = _panel_branch_id(request)
+                scope = _scope_branch(scope, branch_id)
+                tombstones = _scope_branch(tombstones, branch_id)
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Noto\'g\'ri kursor yoki buyurtma ID'}, status=400)
+
+        try:
+            retention = timedelta(hours=settings.ORDER_TOMBSTONE_RETENTION_HOURS)
+            if not since or _cursor_to_datetime(since) < timezone.now() - retention:
+                # Birinchi yuklash yoki juda eski kursor - to'liq holat
+                cursor = _change_cursor((await scope.aaggregate(last=Max('updated_at')))['last'])
+                changed = scope if order_id else scope.filter(BOARD_ORDERS_Q)
+                orders_data = await sync_to_async(_order_changes_data)(request, changed, order_id, True)
+                return JsonResponse({
+                    'success': True, 'full': True, 'cursor': cursor, 'orders': orders_data,
+                    'deleted': [order_id] if order_id and not orders_data else [],
+                })
+
+            # Ikkala so'rov ham indeks bo'yicha (updated_at, deleted_at) va faqat ID/vaqt
+            window_start = _cursor_to_datetime(since) - timedelta(seconds=settings.ORDER_CHANGES_OVERLAP_SECONDS)
+            window = [row async for row in scope.filter(updated_at__gt=window_start).order_by().values_list('id', 'updated_at')]
+            deleted = [row async for row in tombstones.filter(deleted_at__gt=window_start).values_list('order_id', 'deleted_at')]
+            cursor = max([since] + [_change_cursor(changed_at) for _, changed_at in window + deleted])
+            etag = f'"{order_id or "board"}-{branch_id or 0}-{cursor}-{_changes_digest(window, deleted)}"'
+            if _etag_matches(request.headers.get('If-None-Match', ''), etag):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            orders_data = []
+            if window:
+                changed = scope.filter(id__in=[order_pk for order_pk, _ in window])
+                orders_data = await sync_to_async(_order_changes_data)(request, changed, order_id, False)
+
+            response = JsonResponse({
+                'success': True, 'full': False, 'cursor': cursor, 'orders': orders_data,
+                'deleted': sorted({order_pk for order_pk, _ in deleted}),
+            })
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+            return response
+        except Exception as e:
+            logger.error(f"Buyurtma o'zgarishlarini olishda xato: {e}", exc_info=True)
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    return JsonResponse({'success': False, 'message': 'Faqat GET so\'rov qabul qilinadi'}, status=405)
+
+@write_transaction
+def _create_order_from_api(data):
+    """Mijoz, buyurtma, elementlar va holat tarixi - bitta yozish tranzaksiyasida"""
+    # Mijozni topish yoki yaratish (ma'lumotlari o'zgargan bo'lsa yangilash)
+    telegram_id = data.get('user_id')
+    full_name = data.get('full_name', 'Noma\'lum')
+    phone_number = data.get('phone', 'Noma\'lum')
+
+    customer = Customer.upsert_for_checkout(telegram_id, full_name, phone_number)
+    branch_id = data.get('branch_id')
+    branch = Branch.objects.filter(id=branch_id, is_active=True).first() if branch_id else None
+
+    # Buyurtma yaratish
+    order = Order.objects.create(
+        customer=customer,
+        branch=branch,
+        telegram_user_id=telegram_id,
+        status='yangi',
+        payment_method=data.get('payment_method', 'naqd'),
+        service_type=data.get('service_type', 'delivery'),
+        latitude=data.get('location', {}).get('latitude') if data.get('service_type') == 'delivery' else None,
+        longitude=data.get('location', {}).get('longitude') if data.get('service_type') == 'delivery' else None,
+        address=data.get('address', '') if data.get('service_type') == 'delivery' else None,
+        products_total=data.get('products_total'),
+        delivery_cost=data.get('delivery_cost', 0),
+        total_amount=data.get('total'),
+    )
+
+    # Buyurtma elementlarini qo'shish
+    for item_data in data.get('products', []):
+        product_name, quantity, item_price = item_data
+        product = Product.objects.filter(name=product_name).first()
+        if product:
+            OrderItem.objects.create(
+                order=order,
+                product=product,
+                quantity=quantity,
+                price=item_price,
+                total=quantity * item_price
+            )
+        else:
+            logger.warning(f"Mahsulot topilmadi: {product_name} (Buyurtma ID: {order.id})")
+
+    # Holat tarixini saqlash
+    OrderStatusHistory.objects.create(
+        order=order,
+        old_status='',
+        new_status='yangi',
+        notes='Telegram bot orqali yaratildi'
+    )
+
+    return order
+
+def _new_order_messages(order, items):
+    """Yangi buyurtma xabarlari: oshpazga (tugmalar, delivery bo'lsa lokatsiya) va mijozga"""
+    full_name = order.customer.full_name
+    phone_number = order.customer.phone_number
+
+    # Oshpazga xabar
+    chef_text = f"🍽 **Yangi buyurtma #{order.order_number}**\n\n"
+    chef_text += f"👨‍💼 Ism: {full_name}\n"
+    chef_text += f"📱 Telefon: {phone_number}\n"
+    chef_text += f"💳 To'lov usuli: {order.get_payment_method_display()}\n"
+    chef_text += f"🚀 Xizmat turi: {order.get_service_type_display()}\n"
+
+    if order.service_type == 'delivery':
+        if order.address:
+            chef_text += f"🏠 Manzil: {order.address}\n"
+        else:
+            chef_text += "📍 Manzil: Faqat lokatsiya\n"
+    else:
+        chef_text += "🏪 Olib ketish uchun: Restoranidan\n"
+
+    chef_text += f"\n🍽 **Mahsulotlar:**\n"
+    for item in items:
+        chef_text += f"• {item.quantity} dona {item.product.name} - {item.total:,} so'm\n"
+    chef_text += f"\n💰 Jami: {order.total_amount:,} so'm"
+
+    keyboard_chef = [
+        [
+            {'text': "✅ Tasdiqlash", 'callback_data': f"chef_confirm:{order.id}"},
+            {'text': "❌ Bekor qilish", 'callback_data': f"chef_cancel:{order.id}"}
+        ]
+    ]
+    messages = [('chef_message_id', 'message', {
+        'chat_id': order.chef_chat_id,
+        'text': chef_text,
+        'reply_markup': {'inline_keyboard': keyboard_chef},
+    })]
+
+    # Lokatsiya yuborish faqat delivery uchun
+    if order.service_type == 'delivery' and order.latitude and order.longitude:
+        messages.append((None, 'location', {
+            'chat_id': order.chef_chat_id,
+            'latitude': order.latitude,
+            'longitude': order.longitude,
+        }))
+
+    # Foydalanuvchiga xabar
+    user_text = f"✅ **Buyurtmangiz qabul qilindi!**\n\n"
+    user_text += f"📋 Buyurtma ID: **{order.order_number}**\n"
+    user_text += f"👨‍💼 Ism: {full_name}\n"
+    user_text += f"📱 Telefon: {phone_number}\n"
+    user_text += f"💳 To'lov usuli: {order.get_payment_method_display()}\n"
+    user_text += f"🚀 Xizmat turi: {order.get_service_type_display()}\n"
+
+    if order.service_type == 'delivery':
+        if order.address:
+            user_text += f"🏠 Manzil: {order.address}\n"
+        else:
+            user_text += "📍 Manzil: Faqat lokatsiya\n"
+        if order.latitude and order.longitude:
+            user_text += f"📍 Lokatsiya: https://www.google.com/maps?q={order.latitude},{order.longitude}\n"
+    else:
+        user_text += "🏪 Olib ketish uchun: Restoranidan\n"
+
+    user_text += f"\n🍽 **Mahsulotlar:**\n"
+    for item in items:
+        user_text += f"• {item.quantity} dona {item.product.name} - {item.total:,} so'm\n"
+    user_text += f"\n💰 Jami: {order.total_amount:,} so'm\n🆕 Status: **Yangi**"
+
+    user_keyboard = [[{'text': "⬅️ Bosh menu", 'callback_data': "main_menu"}]]
+    messages.append(('user_message_id', 'message', {
+        'chat_id': order.telegram_user_id,
+        'text': user_text,
+        'reply_markup': {'inline_keyboard': user_keyboard},
+    }))
+    return messages
+
+def _send_messages(order, messages):
+    """
+    (message_id maydoni, 'message'|'location', kwargs) ro'yxatini ketma-ket yuborish.
+    Yangi xabar ID lari order ga yoziladi; o'zgargan maydonlar ro'yxati qaytadi.
+    """
+    updated_fields = []
+    for field, kind, kwargs in messages:
+        send = send_telegram_location if kind == 'location' else send_telegram_message
+        response = send(**kwargs)
+        if field and response and response.get('ok'):
+            setattr(order, field, response['result']['message_id'])
+            updated_fields.append(field)
+    return updated_fields
+
+async def _asend_messages(order, messages):
+    """
+    _send_messages ning async varianti: turli chatlarga parallel, bitta chat
+    ichida esa tartib bilan (lokatsiya o'z xabaridan keyin keladi).
+    """
+    by_chat = {}
+    for message in messages:
+        by_chat.setdefault(message[2]['chat_id'], []).append(message)
+    updated_fields = []
+
+    async def send_chat(chat_messages):
+        for field, kind, kwargs in chat_messages:
+            send = asend_telegram_location if kind == 'location' else asend_telegram_message
+            response = await send(**kwargs)
+            if field and response and response.get('ok'):
+                setattr(order, field, response['result']['message_id'])
+                updated_fields.append(field)
+
+    await asyncio.gather(*(send_chat(chat_messages) for chat_messages in by_chat.values()))
+    return updated_fields
+
+@csrf_exempt
+async def create_order_api(request):
     """Telegram botdan yangi buyurtma qabul qilish API"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            
-            # Mijozni topish yoki yaratish
-            telegram_id = data.get('user_id')
-            full_name = data.get('full_name', 'Noma\'lum')
-            phone_number = data.get('phone', 'Noma\'lum')
-            
-            customer, created = Customer.objects.get_or_create(
-                telegram_id=telegram_id,
-                defaults={'full_name': full_name, 'phone_number': phone_number}
-            )
-            if not created:
-                # Agar mijoz mavjud bo'lsa, ma'lumotlarini yangilash
-                customer.full_name = full_name
-                customer.phone_number = phone_number
-                customer.save()
-
-            # Buyurtma yaratish
-            order = Order.objects.create(
-                customer=customer,
-                telegram_user_id=telegram_id,
-                status='yangi',
-                payment_method=data.get('payment_method', 'naqd'),
-                service_type=data.get('service_type', 'delivery'),
-                latitude=data.get('location', {}).get('latitude') if data.get('service_type') == 'delivery' else None,
-                longitude=data.get('location', {}).get('longitude') if data.get('service_type') == 'delivery' else None,
-                address=data.get('address', '') if data.get('service_type') == 'delivery' else None,
-                products_total=data.get('products_total'),
-                delivery_cost=data.get('delivery_cost', 0),
-                total_amount=data.get('total'),
-            )
 
-            # Buyurtma elementlarini qo'shish
-            for item_data in data.get('products', []):
-                product_name, quantity, item_price = item_data
-                product = Product.objects.filter(name=product_name).first()
-                if product:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        quantity=quantity,
-                        price=item_price,
-                        total=quantity * item_price
-                    )
-                else:
-                    logger.warning(f"Mahsulot topilmadi: {product_name} (Buyurtma ID: {order.id})")
-
-            # Holat tarixini saqlash
-            OrderStatusHistory.objects.create(
-                order=order,
-                old_status='',
-                new_status='yangi',
-                notes='Telegram bot orqali yaratildi'
-            )
+            order = await sync_to_async(_create_order_from_api)(data)
+            items = await sync_to_async(_order_items)(order)
 
-            # Oshpazga xabar yuborish
-            chef_text = f"🍽 **Yangi buyurtma #{order.order_number}**\n\n"
-            chef_text += f"👨‍💼 Ism: {full_name}\n"
-            chef_text += f"📱 Telefon: {phone_number}\n"
-            chef_text += f"💳 To'lov usuli: {order.get_payment_method_display()}\n"
-            chef_text += f"🚀 Xizmat turi: {order.get_service_type_display()}\n"
-            
-            if order.service_type == 'delivery':
-                if order.address:
-                    chef_text += f"🏠 Manzil: {order.address}\n"
-                else:
-                    chef_text += "📍 Manzil: Faqat lokatsiya\n"
-            else:
-                chef_text += "🏪 Olib ketish uchun: Restoranidan\n"
-                
-            chef_text += f"\n🍽 **Mahsulotlar:**\n"
-            for item in order.items.all():
-                chef_text += f"• {item.quantity} dona {item.product.name} - {item.total:,} so'm\n"
-            chef_text += f"\n💰 Jami: {order.total_amount:,} so'm"
-
-            keyboard_chef = [
-                [
-                    {'text': "✅ Tasdiqlash", 'callback_data': f"chef_confirm:{order.id}"},
-                    {'text': "❌ Bekor qilish", 'callback_data': f"chef_cancel:{order.id}"}
-                ]
-            ]
-            
-            chef_msg_response = send_telegram_message(
-                chat_id=settings.CHEF_CHAT_ID, 
-                text=chef_text, 
-                reply_markup={'inline_keyboard': keyboard_chef}
-            )
-            if chef_msg_response and chef_msg_response.get('ok'):
-                order.chef_message_id = chef_msg_response['result']['message_id']
-            
-            # Lokatsiya yuborish faqat delivery uchun
-            if order.service_type == 'delivery' and order.latitude and order.longitude:
-                send_telegram_location(
-                    chat_id=settings.CHEF_CHAT_ID,
-                    latitude=order.latitude,
-                    longitude=order.longitude
-                )
-
-            # Foydalanuvchiga xabar
-            user_text = f"✅ **Buyurtmangiz qabul qilindi!**\n\n"
-            user_text += f"📋 Buyurtma ID: **{order.order_number}**\n"
-            user_text += f"👨‍💼 Ism: {full_name}\n"
-            user_text += f"📱 Telefon: {phone_number}\n"
-            user_text += f"💳 To'lov usuli: {order.get_payment_method_display()}\n"
-            user_text += f"🚀 Xizmat turi: {order.get_service_type_display()}\n"
-            
-            if order.service_type == 'delivery':
-                if order.address:
-                    user_text += f"🏠 Manzil: {order.address}\n"
-                else:
-                    user_text += "📍 Manzil: Faqat lokatsiya\n"
-                if order.latitude and order.longitude:
-                    user_text += f"📍 Lokatsiya: https://www.google.com/maps?q={order.latitude},{order.longitude}\n"
-            else:
-                user_text += "🏪 Olib ketish uchun: Restoranidan\n"
-                
-            user_text += f"\n🍽 **Mahsulotlar:**\n"
-            for item in order.items.all():
-                user_text += f"• {item.quantity} dona {item.product.name} - {item.total:,} so'm\n"
-            user_text += f"\n💰 Jami: {order.total_amount:,} so'm\n🆕 Status: **Yangi**"
-
-            user_keyboard = [[{'text': "⬅️ Bosh menu", 'callback_data': "main_menu"}]]
-            user_msg_response = send_telegram_message(
-                chat_id=telegram_id,
-                text=user_text,
-                reply_markup={'inline_keyboard': user_keyboard}
-            )
-            if user_msg_response and user_msg_response.get('ok'):
-                order.user_message_id = user_msg_response['result']['message_id']
-            
-            order.save() # Save message IDs
+            # Oshpaz va mijozga xabarlar bir vaqtda yuboriladi
+            updated_fields = await _asend_messages(order, _new_order_messages(order, items))
+            if updated_fields:
+                await order.asave(update_fields=updated_fields) # Save message IDs
 
             return JsonResponse({'success': True, 'order_id': order.id, 'order_number': order.order_number})
         except Exception as e:
@@ -298,8 +590,8 @@ def create_order_api(request):
             return JsonResponse({'success': False, 'message': str(e)}, status=400)
     return JsonResponse({'success': False, 'message': 'Faqat POST so\'rov qabul qilinadi'}, status=405)
 
-def _update_telegram_messages(order, old_status, new_status, changed_by_user=None):
-    """Buyurtma holati o'zgarganda Telegram xabarlarini yangilash"""
+def _status_messages(order, new_status, items):
+    """Buyurtma holati o'zgarganda yangilanadigan/yuboriladigan Telegram xabarlari"""
     status_emoji = {
         "yangi": "🆕",
         "tasdiqlangan": "✅",
@@ -310,6 +602,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
         "bekor_qilingan": "❌"
     }
     emoji = status_emoji.get(new_status, "📋")
+    messages = []
 
     # Foydalanuvchi xabarini yangilash
     user_text = f"✅ **Buyurtmangiz qabul qilindi!**\n\n"
@@ -318,7 +611,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
     user_text += f"📱 Telefon: {order.customer.phone_number}\n"
     user_text += f"💳 To'lov usuli: {order.get_payment_method_display()}\n"
     user_text += f"🚀 Xizmat turi: {order.get_service_type_display()}\n"
-    
+
     if order.service_type == 'delivery':
         if order.address:
             user_text += f"🏠 Manzil: {order.address}\n"
@@ -328,33 +621,29 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
             user_text += f"📍 Lokatsiya: https://www.google.com/maps?q={order.latitude},{order.longitude}\n"
     else:
         user_text += "🏪 Olib ketish uchun: Restoranidan\n"
-        
+
     user_text += f"\n🍽 **Mahsulotlar:**\n"
-    for item in order.items.all():
+    for item in items:
         user_text += f"• {item.quantity} dona {item.product.name} - {item.total:,} so'm\n"
     user_text += f"\n💰 Jami: {order.total_amount:,} so'm\n"
     user_text += f"{emoji} Status: **{order.get_status_display()}**"
 
     user_keyboard = [[{'text': "⬅️ Bosh menu", 'callback_data': "main_menu"}]]
-    
+
     if order.user_message_id and order.telegram_user_id:
-        send_telegram_message(
-            chat_id=order.telegram_user_id,
-            text=user_text,
-            reply_markup={'inline_keyboard': user_keyboard},
-            message_id=order.user_message_id
-        )
-    else:
+        messages.append((None, 'message', {
+            'chat_id': order.telegram_user_id,
+            'text': user_text,
+            'reply_markup': {'inline_keyboard': user_keyboard},
+            'message_id': order.user_message_id,
+        }))
+    elif order.telegram_user_id:
         # Agar message_id yo'q bo'lsa, yangi xabar yuborish
-        if order.telegram_user_id:
-            response = send_telegram_message(
-                chat_id=order.telegram_user_id,
-                text=user_text,
-                reply_markup={'inline_keyboard': user_keyboard}
-            )
-            if response and response.get('ok'):
-                order.user_message_id = response['result']['message_id']
-                order.save()
+        messages.append(('user_message_id', 'message', {
+            'chat_id': order.telegram_user_id,
+            'text': user_text,
+            'reply_markup': {'inline_keyboard': user_keyboard},
+        }))
 
     # Oshpaz xabarini yangilash
     if order.chef_message_id:
@@ -363,7 +652,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
         chef_text += f"📱 Telefon: {order.customer.phone_number}\n"
         chef_text += f"💳 To'lov usuli: {order.get_payment_method_display()}\n"
         chef_text += f"🚀 Xizmat turi: {order.get_service_type_display()}\n"
-        
+
         if order.service_type == 'delivery':
             if order.address:
                 chef_text += f"🏠 Manzil: {order.address}\n"
@@ -371,9 +660,9 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
                 chef_text += "📍 Manzil: Faqat lokatsiya\n"
         else:
             chef_text += "🏪 Olib ketish uchun: Restoranidan\n"
-            
+
         chef_text += f"\n🍽 **Mahsulotlar:**\n"
-        for item in order.items.all():
+        for item in items:
             chef_text += f"• {item.quantity} dona {item.product.name} - {item.total:,} so'm\n"
         chef_text += f"\n💰 Jami: {order.total_amount:,} so'm"
 
@@ -394,13 +683,13 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
                 [{'text': "❌ Bekor qilish", 'callback_data': f"chef_cancel:{order.id}"}]
             ]
         # If status is 'tayor' (delivery), 'yolda', 'yetkazildi', 'olib_ketildi', 'bekor_qilingan', no more actions for chef
-        
-        send_telegram_message(
-            chat_id=settings.CHEF_CHAT_ID,
-            text=chef_text,
-            reply_markup={'inline_keyboard': chef_keyboard},
-            message_id=order.chef_message_id
-        )
+
+        messages.append((None, 'message', {
+            'chat_id': order.chef_chat_id,
+            'text': chef_text,
+            'reply_markup': {'inline_keyboard': chef_keyboard},
+            'message_id': order.chef_message_id,
+        }))
 
     # Kuryer xabarini yangilash (faqat delivery uchun)
     if order.service_type == 'delivery':
@@ -414,7 +703,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
             else:
                 courier_text += "📍 Manzil: Faqat lokatsiya\n"
             courier_text += f"\n🍽 **Mahsulotlar:**\n"
-            for item in order.items.all():
+            for item in items:
                 courier_text += f"• {item.quantity} dona {item.product.name} - {item.total:,} so'm\n"
             courier_text += f"\n💰 Jami: {order.total_amount:,} so'm"
 
@@ -429,13 +718,13 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
                     [{'text': "✅ Yetkazildi", 'callback_data': f"courier_delivered:{order.id}"}],
                     [{'text': "❌ Bekor qilish", 'callback_data': f"courier_cancel:{order.id}"}]
                 ]
-            
-            send_telegram_message(
-                chat_id=settings.ADMIN_CHAT_ID, # Assuming ADMIN_CHAT_ID is courier's chat ID
-                text=courier_text,
-                reply_markup={'inline_keyboard': courier_keyboard},
-                message_id=order.courier_message_id
-            )
+
+            messages.append((None, 'message', {
+                'chat_id': order.courier_chat_id,
+                'text': courier_text,
+                'reply_markup': {'inline_keyboard': courier_keyboard},
+                'message_id': order.courier_message_id,
+            }))
         elif new_status == 'tayor': # If order is ready, send new message to courier if no existing message_id
             courier_text = f"🚚 **Yetkazib berish uchun yangi buyurtma #{order.order_number}**\n\n"
             courier_text += f"👨‍💼 Ism: {order.customer.full_name}\n"
@@ -446,7 +735,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
             else:
                 courier_text += "📍 Manzil: Faqat lokatsiya\n"
             courier_text += f"\n🍽 **Mahsulotlar:**\n"
-            for item in order.items.all():
+            for item in items:
                 courier_text += f"• {item.quantity} dona {item.product.name} - {item.total:,} so'm\n"
             courier_text += f"\n💰 Jami: {order.total_amount:,} so'm"
 
@@ -454,84 +743,59 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
                 [{'text': "🚚 Yo'lda", 'callback_data': f"courier_on_way:{order.id}"}],
                 [{'text': "❌ Bekor qilish", 'callback_data': f"courier_cancel:{order.id}"}]
             ]
-            courier_msg_response = send_telegram_message(
-                chat_id=settings.ADMIN_CHAT_ID,
-                text=courier_text,
-                reply_markup={'inline_keyboard': courier_keyboard}
-            )
-            if courier_msg_response and courier_msg_response.get('ok'):
-                order.courier_message_id = courier_msg_response['result']['message_id']
-                order.save()
-            
+            messages.append(('courier_message_id', 'message', {
+                'chat_id': order.courier_chat_id,
+                'text': courier_text,
+                'reply_markup': {'inline_keyboard': courier_keyboard},
+            }))
+
             if order.latitude and order.longitude:
-                send_telegram_location(
-                    chat_id=settings.ADMIN_CHAT_ID,
-                    latitude=order.latitude,
-                    longitude=order.longitude
-                )
+                messages.append((None, 'location', {
+                    'chat_id': order.courier_chat_id,
+                    'latitude': order.latitude,
+                    'longitude': order.longitude,
+                }))
+    return messages
+
+def _update_telegram_messages(order, old_status, new_status, changed_by_user=None):
+    """Buyurtma holati o'zgarganda Telegram xabarlarini yangilash"""
+    items = _order_items(order)  # Barcha xabarlar uchun bitta so'rov
+    updated_fields = _send_messages(order, _status_messages(order, new_status, items))
+    if updated_fields:
+        order.save(update_fields=updated_fields)
+
+async def _aupdate_telegram_messages(order, old_status, new_status, changed_by_user=None):
+    """_update_telegram_messages ning async varianti (xabarlar parallel yuboriladi)"""
+    items = await sync_to_async(_order_items)(order)
+    updated_fields = await _asend_messages(order, _status_messages(order, new_status, items))
+    if updated_fields:
+        await order.asave(update_fields=updated_fields)
 
 @csrf_exempt
-def update_order_status(request):
+@query_budget(11)
+async def update_order_status(request):
     """Buyurtma holatini yangilash API"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             order_id = data.get('order_id')
             new_status = data.get('status')
-            
-            order = get_object_or_404(Order, id=order_id)
-            old_status = order.status
-            
-            # Valid transitions for different service types
-            if order.service_type == 'pickup':
-                valid_transitions = {
-                    'yangi': ['tasdiqlangan', 'bekor_qilingan'],
-                    'tasdiqlangan': ['tayor', 'bekor_qilingan'],
-                    'tayor': ['olib_ketildi', 'bekor_qilingan'],
-                }
-            else:  # delivery
-                valid_transitions = {
-                    'yangi': ['tasdiqlangan', 'bekor_qilingan'],
-                    'tasdiqlangan': ['tayor', 'bekor_qilingan'],
-                    'tayor': ['yolda', 'bekor_qilingan'],
-                    'yolda': ['yetkazildi', 'bekor_qilingan'],
-                }
-
-            if new_status not in valid_transitions.get(old_status, []):
+            user = await request.auser()
+
+            order, old_status, changed = await sync_to_async(change_order_status)(
+                order_id, new_status, user if user.is_authenticated else None, 'Web panel orqali yangilandi'
+            )
+            if not changed:
                 return JsonResponse({
-                    'success': False, 
+                    'success': False,
                     'message': f'Holat {old_status} dan {new_status} ga o\'zgartirishga ruxsat berilmagan.'
                 }, status=400)
-            
-            # Holatni yangilash
-            order.status = new_status
-            
-            # Vaqt belgilarini yangilash
-            if new_status == 'tasdiqlangan':
-                order.confirmed_at = timezone.now()
-            elif new_status == 'tayor':
-                order.ready_at = timezone.now()
-            elif new_status == 'yetkazildi':
-                order.delivered_at = timezone.now()
-            elif new_status == 'olib_ketildi':
-                order.picked_up_at = timezone.now()
-            
-            order.save()
-            
-            # Holat tarixini saqlash
-            OrderStatusHistory.objects.create(
-                order=order,
-                old_status=old_status,
-                new_status=new_status,
-                changed_by=request.user if request.user.is_authenticated else None,
-                notes=f'Web panel orqali yangilandi'
-            )
-            
+
             # Telegram xabarlarini yangilash
-            _update_telegram_messages(order, old_status, new_status, request.user)
-            
+            await _aupdate_telegram_messages(order, old_status, new_status, user)
+
             return JsonResponse({
-                'success': True, 
+                'success': True,
                 'message': f'Buyurtma holati {old_status} dan {new_status} ga o\'zgartirildi.'
             })
         except Exception as e:
@@ -543,25 +807,13 @@ def update_order_status(request):
 def confirm_order(request, order_id):
     """Buyurtmani tasdiqlash"""
     if request.method == 'POST':
-        order = get_object_or_404(Order, id=order_id)
-        
-        if order.status == 'yangi':
-            old_status = order.status
-            order.status = 'tasdiqlangan'
-            order.confirmed_at = timezone.now()
-            order.save()
-            
-            # Holat tarixini saqlash
-            OrderStatusHistory.objects.create(
-                order=order,
-                old_status=old_status,
-                new_status='tasdiqlangan',
-                changed_by=request.user if request.user.is_authenticated else None,
-                notes='Oshpaz tomonidan tasdiqlandi'
-            )
-            
+        # Tekshiruv va yozuv qulflangan qator ustida (change_order_status)
+        order, old_status, changed = change_order_status(
+            order_id, 'tasdiqlangan', request.user if request.user.is_authenticated else None, 'Oshpaz tomonidan tasdiqlandi'
+        )
+        if changed:
             _update_telegram_messages(order, old_status, 'tasdiqlangan', request.user)
-            
+
             messages.success(request, f'Buyurtma #{order.order_number} tasdiqlandi!')
             return JsonResponse({'success': True, 'message': 'Buyurtma tasdiqlandi'})
         else:
@@ -573,25 +825,13 @@ def confirm_order(request, order_id):
 def mark_ready(request, order_id):
     """Buyurtmani tayor deb belgilash"""
     if request.method == 'POST':
-        order = get_object_or_404(Order, id=order_id)
-        
-        if order.status == 'tasdiqlangan':
-            old_status = order.status
-            order.status = 'tayor'
-            order.ready_at = timezone.now()
-            order.save()
-            
-            # Holat tarixini saqlash
-            OrderStatusHistory.objects.create(
-                order=order,
-                old_status=old_status,
-                new_status='tayor',
-                changed_by=request.user if request.user.is_authenticated else None,
-                notes='Oshpaz tomonidan tayor deb belgilandi'
-            )
-            
+        # Tekshiruv va yozuv qulflangan qator ustida (change_order_status)
+        order, old_status, changed = change_order_status(
+            order_id, 'tayor', request.user if request.user.is_authenticated else None, 'Oshpaz tomonidan tayor deb belgilandi'
+        )
+        if changed:
             _update_telegram_messages(order, old_status, 'tayor', request.user)
-            
+
             messages.success(request, f'Buyurtma #{order.order_number} tayor!')
             return JsonResponse({'success': True, 'message': 'Buyurtma tayor'})
         else:
@@ -603,25 +843,13 @@ def mark_ready(request, order_id):
 def mark_picked_up(request, order_id):
     """Pickup buyurtmani olib ketildi deb belgilash"""
     if request.method == 'POST':
-        order = get_object_or_404(Order, id=order_id)
-        
-        if order.status == 'tayor' and order.service_type == 'pickup':
-            old_status = order.status
-            order.status = 'olib_ketildi'
-            order.picked_up_at = timezone.now()
-            order.save()
-            
-            # Holat tarixini saqlash
-            OrderStatusHistory.objects.create(
-                order=order,
-                old_status=old_status,
-                new_status='olib_ketildi',
-                changed_by=request.user if request.user.is_authenticated else None,
-                notes='Oshpaz tomonidan olib ketildi deb belgilandi'
-            )
-            
+        # Tekshiruv va yozuv qulflangan qator ustida (change_order_status)
+        order, old_status, changed = change_order_status(
+            order_id, 'olib_ketildi', request.user if request.user.is_authenticated else None, 'Oshpaz tomonidan olib ketildi deb belgilandi'
+        )
+        if changed:
             _update_telegram_messages(order, old_status, 'olib_ketildi', request.user)
-            
+
             messages.success(request, f'Buyurtma #{order.order_number} olib ketildi!')
             return JsonResponse({'success': True, 'message': 'Buyurtma olib ketildi'})
         else:
@@ -633,24 +861,13 @@ def mark_picked_up(request, order_id):
 def cancel_order(request, order_id):
     """Buyurtmani bekor qilish"""
     if request.method == 'POST':
-        order = get_object_or_404(Order, id=order_id)
-        
-        if order.status not in ['yetkazildi', 'olib_ketildi', 'bekor_qilingan']:
-            old_status = order.status
-            order.status = 'bekor_qilingan'
-            order.save()
-            
-            # Holat tarixini saqlash
-            OrderStatusHistory.objects.create(
-                order=order,
-                old_status=old_status,
-                new_status='bekor_qilingan',
-                changed_by=request.user if request.user.is_authenticated else None,
-                notes='Oshpaz tomonidan bekor qilindi'
-            )
-            
+        # Tekshiruv va yozuv qulflangan qator ustida (change_order_status)
+        order, old_status, changed = change_order_status(
+            order_id, 'bekor_qilingan', request.user if request.user.is_authenticated else None, 'Oshpaz tomonidan bekor qilindi'
+        )
+        if changed:
             _update_telegram_messages(order, old_status, 'bekor_qilingan', request.user)
-            
+
             messages.success(request, f'Buyurtma #{order.order_number} bekor qilindi!')
             return JsonResponse({'success': True, 'message': 'Buyurtma bekor qilindi'})
         else:
@@ -659,9 +876,10 @@ def cancel_order(request, order_id):
     return JsonResponse({'success': False, 'message': 'Noto\'g\'ri so\'rov'})
 
 # Mahsulotlar boshqaruvi
+@query_budget(2)
 def product_list(request):
     """Mahsulotlar ro'yxati"""
-    products = Product.objects.all().order_by('category', 'name')
+    products = Product.objects.select_related('category').order_by('category', 'name')
     categories = Category.objects.filter(is_active=True)
     
     category_filter = request.GET.get('category')
@@ -719,122 +937,97 @@ def add_category(request):
     return render(request, 'chef_panel/add_category.html', {'form': form})
 
 @csrf_exempt
-def update_order_status_api(request):
+async def update_order_status_api(request):
     """API: Buyurtma holatini yangilash (Telegram botdan keladigan so'rovlar uchun)"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             order_id = data.get('order_id')
             new_status = data.get('status')
-            
-            order = get_object_or_404(Order, id=order_id)
-            old_status = order.status
-            
-            # Valid transitions for different service types
-            if order.service_type == 'pickup':
-                valid_transitions = {
-                    'yangi': ['tasdiqlangan', 'bekor_qilingan'],
-                    'tasdiqlangan': ['tayor', 'bekor_qilingan'],
-                    'tayor': ['olib_ketildi', 'bekor_qilingan'],
-                }
-            else:  # delivery
-                valid_transitions = {
-                    'yangi': ['tasdiqlangan', 'bekor_qilingan'],
-                    'tasdiqlangan': ['tayor', 'bekor_qilingan'],
-                    'tayor': ['yolda', 'bekor_qilingan'],
-                    'yolda': ['yetkazildi', 'bekor_qilingan'],
-                }
-
-            if new_status not in valid_transitions.get(old_status, []):
-                return JsonResponse({'success': False, 'message': f"Holat {old_status} dan {new_status} ga o'zgartirishga ruxsat berilmagan."}, status=400)
 
-            order.status = new_status
-            
-            # Vaqt belgilarini yangilash
-            if new_status == 'tasdiqlangan':
-                order.confirmed_at = timezone.now()
-            elif new_status == 'tayor':
-                order.ready_at = timezone.now()
-            elif new_status == 'yetkazildi':
-                order.delivered_at = timezone.now()
-            elif new_status == 'olib_ketildi':
-                order.picked_up_at = timezone.now()
-            
-            order.save()
-            
-            # Holat tarixini saqlash
-            OrderStatusHistory.objects.create(
-                order=order,
-                old_status=old_status,
-                new_status=new_status,
-                notes=f'Telegram bot orqali yangilandi'
+            order, old_status, changed = await sync_to_async(change_order_status)(
+                order_id, new_status, None, 'Telegram bot orqali yangilandi'
             )
-            
-            _update_telegram_messages(order, old_status, new_status) # Update messages after status change
-            
+            if not changed:
+                return JsonResponse({'success': False, 'message': f"Holat {old_status} dan {new_status} ga o'zgartirishga ruxsat berilmagan."}, status=400)
+
+            await _aupdate_telegram_messages(order, old_status, new_status) # Update messages after status change
+
             return JsonResponse({
-                'success': True, 
+                'success': True,
                 'message': f'Buyurtma holati {new_status}ga o\'zgartirildi'
             })
-            
+
         except Exception as e:
             logger.error(f"API orqali buyurtma holatini yangilashda xato: {e}", exc_info=True)
             return JsonResponse({'success': False, 'message': str(e)}, status=400)
-    
+
     return JsonResponse({'success': False, 'message': 'Faqat POST so\'rov qabul qilinadi'}, status=405)
 
 @csrf_exempt
-def get_user_orders_api(request, telegram_id):
-    """API: Foydalanuvchining buyurtmalarini olish"""
+@query_budget(2)
+async def get_user_orders_api(request, telegram_id):
+    """API: Foydalanuvchining buyurtmalarini olish (?page=1&per_page=20)"""
     if request.method == 'GET':
         try:
-            customer = get_object_or_404(Customer, telegram_id=telegram_id)
-            orders = Order.objects.filter(customer=customer).order_by('-created_at')
-            
-            orders_data = []
-            for order in orders:
-                orders_data.append({
-                    'order_id': order.order_number,
-                    'date': order.created_at.strftime("%Y-%m-%d %H:%M"),
-                    'total': float(order.total_amount),
-                    'status': order.status,
-                    'status_display': order.get_status_display(),
-                    'service_type': order.service_type,
-                    'service_type_display': order.get_service_type_display(),
-                })
+            page = int(request.GET.get('page', 1))
+            per_page = min(max(int(request.GET.get('per_page', 20)), 1), 100)
+            orders_page = await sync_to_async(get_customer_orders_page)(telegram_id, page, per_page)
+            if orders_page is None:
+                return JsonResponse({'success': False, 'message': 'Mijoz topilmadi'}, status=404)
             
-            return JsonResponse({'success': True, 'orders': orders_data})
+            return JsonResponse({'success': True, **orders_page})
         except Exception as e:
             logger.error(f"Foydalanuvchi buyurtmalarini olishda xato: {e}", exc_info=True)
             return JsonResponse({'success': False, 'message': str(e)}, status=400)
     return JsonResponse({'success': False, 'message': 'Faqat GET so\'rov qabul qilinadi'}, status=405)
 
+def _order_details_related(order):
+    """Popup uchun elementlar va holat tarixi (2 ta so'rov)"""
+    order_items_data = []
+    for item in order.items.select_related('product'):
+        order_items_data.append({
+            'product_name': item.product.name,
+            'quantity': item.quantity,
+            'price': float(item.price),
+            'total': float(item.total),
+        })
+
+    status_history_data = []
+    for history in order.status_history.select_related('changed_by').order_by('changed_at'):
+        status_history_data.append({
+            'old_status': history.old_status,
+            'new_status': history.new_status,
+            'new_status_display': STATUS_DISPLAY.get(history.new_status, history.new_status),
+            'timestamp': history.changed_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'notes': history.notes,
+            'changed_by': history.changed_by.username if history.changed_by else 'Tizim',
+        })
+    return {'items': order_items_data, 'status_history': status_history_data}
+
 @csrf_exempt
-def get_order_details_api(request, order_id):
-    """API: Buyurtma tafsilotlarini olish (popup uchun)"""
+@query_budget(3)
+async def get_order_details_api(request, order_id):
+    """
+    API: Buyurtma tafsilotlarini olish (popup uchun).
+    Elementlar va tarix (order_id, versiya) bo'yicha keshlanadi; versiya o'zgarmagan
+    bo'lsa If-None-Match ga 304 qaytadi. Keshda bo'lsa 1 ta, bo'lmasa 3 ta so'rov.
+    """
     if request.method == 'GET':
         try:
-            order = get_object_or_404(Order, id=order_id)
-            
-            order_items_data = []
-            for item in order.items.all():
-                order_items_data.append({
-                    'product_name': item.product.name,
-                    'quantity': item.quantity,
-                    'price': float(item.price),
-                    'total': float(item.total),
-                })
-                
-            status_history_data = []
-            for history in order.status_history.all().order_by('changed_at'):
-                status_history_data.append({
-                    'old_status': history.old_status,
-                    'new_status': history.new_status,
-                    'new_status_display': dict(Order.STATUS_CHOICES).get(history.new_status, history.new_status),
-                    'timestamp': history.changed_at.strftime("%Y-%m-%d %H:%M:%S"),
-                    'notes': history.notes,
-                    'changed_by': history.changed_by.username if history.changed_by else 'Tizim',
-                })
+            order = await Order.objects.select_related('customer', 'branch').aget(id=order_id)
+            version = order.cache_version
+            etag = f'"order-{order.id}-{version}"'
+            if _etag_matches(request.headers.get('If-None-Match', ''), etag):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            cache_key = f'chef_panel:order_details:{order.id}:{version}'
+            related = await cache.aget(cache_key)
+            if related is None:
+                related = await sync_to_async(_order_details_related)(order)
+                await cache.aset(cache_key, related, settings.ORDER_DETAILS_CACHE_SECONDS)
 
             order_data = {
                 'id': order.id,
@@ -856,11 +1049,16 @@ def get_order_details_api(request, order_id):
                     'full_name': order.customer.full_name,
                     'phone_number': order.customer.phone_number,
                 },
-                'items': order_items_data,
-                'status_history': status_history_data,
+                'items': related['items'],
+                'status_history': related['status_history'],
             }
             
-            return JsonResponse({'success': True, 'order': order_data})
+            response = JsonResponse({'success': True, 'order': order_data})
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+            return response
+        except Order.DoesNotExist:
+            return JsonResponse({'success': False, 'message': 'Buyurtma topilmadi'}, status=404)
         except Exception as e:
             logger.error(f"Buyurtma tafsilotlarini olishda xato: {e}", exc_info=True)
             return JsonResponse({'success': False, 'message': str(e)}, status=400)
@@ -887,3 +1085,56 @@ def toggle_product_availability(request, product_id):
             logger.error(f"Mahsulot mavjudligini yangilashda xato: {e}", exc_info=True)
             return JsonResponse({'success': False, 'message': str(e)}, status=500)
     return JsonResponse({'success': False, 'message': 'Faqat POST so\'rov qabul qilinadi'}, status=405)
+
+@staff_member_required
+def export_orders(request):
+    """Buyurtmalarni eksport qilish (oqim bilan): ?format=csv|ndjson|xlsx&from=YYYY-MM-DD&to=YYYY-MM-DD&gzip=1"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in export.FORMATS:
+        return JsonResponse({'success': False, 'message': f"Noma'lum format: {export_format}"}, status=400)
+    try:
+        date_to = date.fromisoformat(request.GET['to']) if request.GET.get('to') else timezone.localdate()
+        date_from = date.fromisoformat(request.GET['from']) if request.GET.get('from') else date_to - timedelta(days=30)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': "Sana YYYY-MM-DD formatida bo'lishi kerak"}, status=400)
+    if date_from > date_to:
+        return JsonResponse({'success': False, 'message': "'from' sanasi 'to' dan keyin bo'lishi mumkin emas"}, status=400)
+
+    use_gzip = request.GET.get('gzip') == '1'
+    chunks = export.export_chunks(export_format, date_from, date_to, use_gzip=use_gzip)
+    if isinstance(request, ASGIRequest):
+        # ASGI sync iteratorni to'liq xotiraga yig'adi - bo'laklab o'qiladigan async iterator
+        chunks = export.async_chunks(chunks)
+    response = StreamingHttpResponse(
+        chunks,
+        content_type='application/gzip' if use_gzip else export.FORMATS[export_format][0],
+    )
+    filename = export.export_filename(export_format, date_from, date_to, use_gzip=use_gzip)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@staff_member_required
+def profiling_report(request):
+    """Jarayon ichidagi profiling buferi: eng sekin va oxirgi so'rovlar"""
+    def rows(records):
+        return [
+            dict(record, started_at=datetime.fromtimestamp(record['started_at'], tz=dt_timezone.utc))
+            for record in records
+        ]
+
+    return render(request, 'chef_panel/profiling.html', {
+        'enabled': settings.PROFILING_ENABLED,
+        'buffer_size': profiling.store.size,
+        'slowest': rows(profiling.store.slowest()),
+        'recent': rows(profiling.store.recent()),
+    })
+
+def health(request):
+    """Docker healthcheck: baza ulanishini tekshirish"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Exception as e:
+        logger.error(f"Health check: baza bilan ulanishda xato: {e}")
+        return JsonResponse({'success': False, 'database': connection.vendor, 'message': str(e)}, status=503)
+    return JsonResponse({'success': True, 'database': connection.vendor})
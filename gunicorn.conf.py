@@ -0,0 +1,80 @@
+"""
+Gunicorn production sozlamalari (gunicorn avtomatik o'qiydi: `gunicorn` buyrug'i
+loyiha ildizida ishga tushiriladi). Hammasi muhit o'zgaruvchilari orqali:
+
+    GUNICORN_WORKER_CLASS  sync | gthread | uvicorn (standart: uvicorn - async view lar uchun)
+    WEB_CONCURRENCY        workerlar soni (standart: sync - 2*CPU+1, gthread/uvicorn - CPU+1)
+    GUNICORN_THREADS       gthread da har bir workerdagi oqimlar soni
+    GUNICORN_PRELOAD       Django ni master jarayonda yuklash (fork dan keyin xotira umumiy)
+    GUNICORN_KEEPALIVE     keep-alive, soniya - 3 soniyalik polling dan uzun bo'lishi kerak
+    GUNICORN_TIMEOUT, GUNICORN_GRACEFUL_TIMEOUT, GUNICORN_MAX_REQUESTS
+
+Qayta yuklash (so'rovlar uzilmaydi):
+    kill -HUP <master>     sozlamalar qayta o'qiladi, workerlar navbatma-navbat
+                           almashtiriladi (eski worker joriy so'rovlarini tugatadi).
+                           preload bo'lsa kod master da qoladi - yangi kod uchun:
+    kill -USR2 <master>    yangi master (yangi kod bilan) ishga tushadi, so'ng
+    kill -QUIT <eski>      eski master graceful_timeout ichida to'xtaydi.
+
+Lokal yuklama sinovi (manage.py load_test, concurrency 30; SQLite, 1 vCPU - server,
+yuklama generatori va 150 ms kechikishli soxta Telegram API bitta mashinada):
+
+    sozlama               create_order_api         order_changes (polling)
+    sync x2               4.9 req/s  p99 6257 ms   171.3 req/s  p99  325 ms
+    gthread x2 (4 oqim)   9.2 req/s  p99 3501 ms   100.8 req/s  p99 1331 ms
+    uvicorn x2           32.5 req/s  p99 4382 ms    90.4 req/s  p99 1482 ms
+
+Telegram ga bog'liq so'rovlar ko'p bo'lsa - uvicorn; faqat qisqa o'qishlar bo'lsa sync.
+"""
+import multiprocessing
+import os
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn_worker.UvicornWorker',
+}
+
+_worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn')
+if _worker_class not in WORKER_CLASSES:
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS noto'g'ri: {_worker_class} ({', '.join(WORKER_CLASSES)})")
+worker_class = WORKER_CLASSES[_worker_class]
+
+# uvicorn workeri ASGI ilovani, sync/gthread WSGI ilovani ishlatadi
+wsgi_app = 'restaurant_system.asgi:application' if _worker_class == 'uvicorn' else 'restaurant_system.wsgi:application'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+_cpus = multiprocessing.cpu_count()
+# sync worker Telegram javobini kutganda band - ko'proq jarayon kerak; gthread/uvicorn
+# kutish paytida boshqa so'rovlarni oladi. SQLite da yozuvchi bitta, ko'p worker foyda bermaydi
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * _cpus + 1 if _worker_class == 'sync' else _cpus + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '4')) if _worker_class == 'gthread' else 1
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Oshpaz paneli har 3 soniyada so'raydi: keep-alive undan uzun bo'lsa ulanish qayta
+# ishlatiladi (sync worker keep-alive ni qo'llamaydi - har so'rov yangi ulanish)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+# Sync Telegram so'rovlari (requests) uchun ham yetarli; osilib qolgan worker qayta tug'iladi
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '20'))
+
+# Xotira sizib chiqmasligi uchun workerlar vaqti-vaqti bilan (bir vaqtda emas) almashtiriladi
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+# Docker da /tmp diskda bo'lishi mumkin - heartbeat fayli xotirada
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-') or None  # bo'sh - access log o'chirilgan
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def pre_fork(server, worker):
+    # preload_app: master da ochilgan baza ulanishi workerlarga meros qolmasin
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+    connections.close_all()
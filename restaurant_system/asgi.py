@@ -0,0 +1,20 @@
+"""
+ASGI config for restaurant_system project.
+
+Async view lar (chef_panel: buyurtma yaratish, holat yangilash, API lar)
+Telegram javobini kutganda workerni bloklamaydi. DEBUG da statik fayllar
+ham shu yerdan beriladi (runserver kabi).
+"""
+
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant_system.settings')
+
+application = get_asgi_application()
+
+if settings.DEBUG:
+    application = ASGIStaticFilesHandler(application)
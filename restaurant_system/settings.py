@@ -35,13 +35,50 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'chef_panel.middleware.QueryBudgetMiddleware',
+    'chef_panel.middleware.ProfilingMiddleware',
 ]
 
+# So'rovlar byudjeti (chef_panel.query_budget): DEBUG rejimida yoqilgan,
+# STRICT bo'lsa byudjetdan oshgan view xato qaytaradi (aks holda faqat log)
+QUERY_BUDGET_ENABLED = os.environ.get('QUERY_BUDGET_ENABLED', str(DEBUG)) == 'True'
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'False') == 'True'
+
+# So'rov profiling (chef_panel.profiling): Server-Timing sarlavhasi, JSON log va
+# /chef_panel/profiling/ sahifasi. O'chirilganda middleware zanjirdan chiqariladi
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', str(DEBUG)) == 'True'
+PROFILING_PATH_PREFIXES = tuple(os.environ.get('PROFILING_PATH_PREFIXES', '/chef_panel/').split(','))
+# Oxirgi va eng sekin so'rovlar buferining hajmi (har biri)
+PROFILING_BUFFER_SIZE = int(os.environ.get('PROFILING_BUFFER_SIZE', '50'))
+
+# Dashboard statistikasi keshda necha soniya saqlanadi
+DASHBOARD_CACHE_SECONDS = int(os.environ.get('DASHBOARD_CACHE_SECONDS', '5'))
+
+# Mijoz buyurtmalar tarixi keshi (chef_panel.order_history). Yangi buyurtmada
+# invalidatsiya qilinadi; muddat - jarayonlar orasida kesh umumiy bo'lmaganda eskirish chegarasi
+# (tarix sahifalari va telegram_id -> mijoz id bog'lanishi uchun)
+CUSTOMER_ORDERS_CACHE_SECONDS = int(os.environ.get('CUSTOMER_ORDERS_CACHE_SECONDS', '60'))
+
+# Buyurtma popup (get_order_details_api) elementlari/tarixi keshi - kalit versiyalangan,
+# shuning uchun muddat faqat xotirani bo'shatish uchun
+ORDER_DETAILS_CACHE_SECONDS = int(os.environ.get('ORDER_DETAILS_CACHE_SECONDS', '600'))
+
+# Kesh: standart - jarayon ichidagi locmem. Bot va web bir-birining keshini
+# invalidatsiya qila olishi uchun umumiy backend bering, masalan
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache CACHE_LOCATION=/app/.cache
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
 ROOT_URLCONF = 'restaurant_system.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates + render vaqtini profilga yozish (chef_panel.profiling)
+        'BACKEND': 'chef_panel.profiling.ProfilingDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -58,12 +95,87 @@ TEMPLATES = [
 WSGI_APPLICATION = 'restaurant_system.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Baza: DATABASE_ENGINE=sqlite (standart) yoki postgresql.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    # Django 5.1+ psycopg pool (DATABASE_POOL=True, psycopg[pool] kerak) - jarayon ichida
+    # ulanishlar qayta ishlatiladi. Pool bilan CONN_MAX_AGE 0 bo'lishi shart; pool
+    # o'chirilsa ulanish CONN_MAX_AGE soniya saqlanadi va health check bilan tekshiriladi.
+    DATABASE_POOL = os.environ.get('DATABASE_POOL', 'True') == 'True'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'restaurant'),
+            'USER': os.environ.get('POSTGRES_USER', 'restaurant'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DATABASE_POOL else int(os.environ.get('CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', '10')),
+                    'timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', '10')),
+                } if DATABASE_POOL else False,
+            },
+        }
     }
-}
+else:
+    # web va bot bitta db.sqlite3 ga yozadi (chef_panel.db ga qarang):
+    #   WAL          - o'quvchilar yozuvchini, yozuvchi o'quvchilarni kutmaydi
+    #   timeout      - busy_timeout, qulf bo'shashini necha soniya kutish
+    #   IMMEDIATE    - atomic() yozish qulfini boshidayoq oladi (deadlock o'rniga kutish)
+    #   synchronous=NORMAL WAL bilan xavfsiz; cache 64 MB, mmap 256 MB
+    SQLITE_INIT_COMMAND = (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA cache_size=-65536;'
+        'PRAGMA mmap_size=268435456;'
+        'PRAGMA temp_store=MEMORY'
+    )
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', '20')),
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': SQLITE_INIT_COMMAND,
+            },
+            # Test bazasi ham faylda: xotiradagi (shared cache) baza busy_timeout ni
+            # hisobga olmaydi - parallel checkout testlari production qulflarini sinaydi
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
+
+# chef_panel.db.write_transaction: busy_timeout ham yetmasa qayta urinishlar soni
+# va birinchi pauza (soniya, har safar ikki barobar)
+WRITE_TRANSACTION_ATTEMPTS = int(os.environ.get('WRITE_TRANSACTION_ATTEMPTS', '3'))
+WRITE_TRANSACTION_BACKOFF = float(os.environ.get('WRITE_TRANSACTION_BACKOFF', '0.1'))
+
+# Bot ORM chaqiruvlari uchun oqimlar soni (chef_panel.db.db_sync). PostgreSQL pool
+# ishlatilsa DATABASE_POOL_MAX_SIZE dan oshmasin
+BOT_DB_THREADS = int(os.environ.get('BOT_DB_THREADS', '4'))
+# Bot bir vaqtda nechta update ni qayta ishlaydi (bitta foydalanuvchiniki - ketma-ket)
+BOT_CONCURRENT_UPDATES = int(os.environ.get('BOT_CONCURRENT_UPDATES', '16'))
+# Bot foydalanuvchi holatlari (savat, telefon...) bazaga necha soniyada bir yoziladi
+# (chef_panel.bot_persistence)
+BOT_PERSISTENCE_INTERVAL = float(os.environ.get('BOT_PERSISTENCE_INTERVAL', '10'))
+# Xotiradagi bot sessiyalari chegarasi: shuncha soniya faol bo'lmagan, yoki soni/hajmi
+# (JSON baytlarda) oshganda eng eskilari bazaga yozilib xotiradan chiqariladi
+BOT_SESSION_TTL = float(os.environ.get('BOT_SESSION_TTL', '3600'))
+BOT_SESSION_MAX_USERS = int(os.environ.get('BOT_SESSION_MAX_USERS', '5000'))
+BOT_SESSION_MAX_BYTES = int(os.environ.get('BOT_SESSION_MAX_BYTES', str(32 * 1024 * 1024)))
+BOT_SESSION_EVICT_INTERVAL = float(os.environ.get('BOT_SESSION_EVICT_INTERVAL', '60'))
+
+# Delta API (order_changes_api): kursordan shuncha soniya oldingi o'zgarishlar ham qayta
+# o'qiladi - PostgreSQL da kechroq commit bo'lgan (updated_at i eskiroq) qatorlar tushib
+# qolmasin; mijoz buyurtmalarni id bo'yicha birlashtiradi
+ORDER_CHANGES_OVERLAP_SECONDS = float(os.environ.get('ORDER_CHANGES_OVERLAP_SECONDS', '10'))
+# O'chirilgan buyurtmalar izi shuncha saqlanadi; kursori bundan eski mijoz doskani to'liq oladi
+ORDER_TOMBSTONE_RETENTION_HOURS = float(os.environ.get('ORDER_TOMBSTONE_RETENTION_HOURS', '24'))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -93,6 +205,12 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
+# Statik fayllar hashlangan nomlar bilan (chef_panel.storage): collectstatic .gz/.br
+# nusxalarni ham yozadi, production da ularni nginx beradi (nginx/default.conf)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'chef_panel.storage.CompressedManifestStaticFilesStorage'},
+}
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -100,11 +218,22 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Yuklangan mahsulot rasmlari shu o'lchamgacha (px, uzun tomoni) kichraytirilib qayta siqiladi
+PRODUCT_IMAGE_MAX_SIZE = int(os.environ.get('PRODUCT_IMAGE_MAX_SIZE', '1280'))
+PRODUCT_IMAGE_QUALITY = int(os.environ.get('PRODUCT_IMAGE_QUALITY', '82'))
 
 # Telegram Bot Settings
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '7823584139:AAEwKx3qgXrd8df9IwQLC2_OMxoqm7Lsia4') # BotFather dan olingan token
-TELEGRAM_API_BASE_URL = "https://api.telegram.org/bot"
+TELEGRAM_API_BASE_URL = os.environ.get('TELEGRAM_API_BASE_URL', "https://api.telegram.org/bot")
+# Telegram so'rovi vaqt chegarasi, soniya (sync send_* va async asend_* uchun)
+TELEGRAM_TIMEOUT = float(os.environ.get('TELEGRAM_TIMEOUT', '10'))
 CHEF_CHAT_ID = int(os.environ.get('CHEF_CHAT_ID', '6963429482'))   # Oshpaz chat ID - O'ZGARTIRING!
 ADMIN_CHAT_ID = int(os.environ.get('ADMIN_CHAT_ID', '8194156959')) # Kuryer/Admin chat ID - O'ZGARTIRING!
 SITE_URL = "http://13.60.32.150:8000"
 
+# Yetkazib berish narxi uchun masofa manbai (chef_panel.delivery.DistanceProvider vorisi)
+DELIVERY_DISTANCE_PROVIDER = os.environ.get('DELIVERY_DISTANCE_PROVIDER', 'chef_panel.delivery.HaversineProvider')
+# Narx keshi: geohash aniqligi (7 ~ 150 m, 8 ~ 38x19 m katak) va yozuvlar soni (LRU)
+DELIVERY_QUOTE_GEOHASH_PRECISION = int(os.environ.get('DELIVERY_QUOTE_GEOHASH_PRECISION', '8'))
+DELIVERY_QUOTE_CACHE_SIZE = int(os.environ.get('DELIVERY_QUOTE_CACHE_SIZE', '10000'))
+
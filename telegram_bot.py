@@ -1,20 +1,18 @@
 import os
+import sys
+import asyncio
+import weakref
 import django
 import logging
-import json
 import math
-import requests # Still needed for Telegram API calls
 import datetime # Added for time comparison
 from decimal import Decimal
 from telegram import (
     Update, InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton,
     ReplyKeyboardMarkup, InputMediaPhoto, ReplyKeyboardRemove)
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, CallbackQueryHandler, MessageHandler,
+    ApplicationBuilder, BaseUpdateProcessor, CommandHandler, CallbackQueryHandler, MessageHandler,
     ContextTypes, filters)
-# Import sync_to_async for bridging sync Django ORM with async bot
-from asgiref.sync import sync_to_async
-from django.db import transaction # For atomic operations
 
 # Configure logging
 logging.basicConfig(
@@ -29,10 +27,19 @@ django.setup()
 
 # Now you can import Django models and settings
 from django.conf import settings
-from chef_panel.models import Category, Product, Customer, Order, OrderItem, OrderStatusHistory, BotSettings # Import BotSettings
+from chef_panel.models import Category, Product, Customer, Order, OrderItem, OrderStatusHistory, BotSettings, Branch # Import BotSettings
+from chef_panel.order_history import get_customer_orders_page
+from chef_panel.delivery import ( # Filiallar, yetkazib berish hududlari va narx keshi
+    DeliveryQuote, QuoteCache, geohash_center, geohash_encode, get_branch_index, get_distance_provider, get_zone_index)
+from chef_panel.db import db_sync, write_transaction # ORM chaqiruvlari DB oqimlar pulida; atomic + qayta urinish
+from chef_panel.bot_persistence import DatabasePersistence # user_data (savat va h.k.) qayta ishga tushishda saqlanadi
+from chef_panel.order_status import change_order_status # Holat o'zgarishi: qator qulfi + VALID_TRANSITIONS
+from chef_panel.utils import asend_telegram_message, asend_telegram_location # httpx: event loop va DB oqimlarini bloklamaydi
+from django.http import Http404
 from django.utils import timezone # For setting timestamps
 
 # Global variables
+# Filiallar (Branch) kiritilmagan bo'lsa - yagona oshxona joylashuvi
 STORE_LAT = 40.665236
 STORE_LON = 72.563908
 mahsulotlar = {}
@@ -42,50 +49,8 @@ bot_settings = None # Global variable to hold bot settings
 # Placeholder image URL for cases where local image is not found or cannot be sent
 PLACEHOLDER_IMAGE_URL = "https://i.postimg.cc/kgbRwBbN/photo-2025-07-24-23-50-48.jpg"
 
-# --- Utility functions for Telegram API (adapted from chef_panel/utils.py) ---
-def send_telegram_message(chat_id, text, reply_markup=None, message_id=None, parse_mode="Markdown"):
-    """Telegram Bot API orqali xabar yuborish/tahrirlash"""
-    url = f"{settings.TELEGRAM_API_BASE_URL}{settings.TELEGRAM_BOT_TOKEN}/"
-    payload = {
-        'chat_id': chat_id,
-        'text': text,
-        'parse_mode': parse_mode
-    }
-    if reply_markup:
-        payload['reply_markup'] = json.dumps(reply_markup)
-    try:
-        if message_id:
-            url += "editMessageText"
-            payload['message_id'] = message_id
-        else:
-            url += "sendMessage"
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        logger.info(f"Telegram message sent successfully to chat_id: {chat_id}")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Telegram xabar yuborishda xato: {e}")
-        return None
-
-def send_telegram_location(chat_id, latitude, longitude):
-    """Telegram Bot API orqali lokatsiya yuborish"""
-    url = f"{settings.TELEGRAM_API_BASE_URL}{settings.TELEGRAM_BOT_TOKEN}/sendLocation"
-    payload = {
-        'chat_id': chat_id,
-        'latitude': latitude,
-        'longitude': longitude
-    }
-    try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        logger.info(f"Telegram location sent successfully to chat_id: {chat_id}")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Telegram lokatsiya yuborishda xato: {e}")
-        return None
-
 # --- Data loading from Django ORM ---
-@sync_to_async
+@db_sync
 def load_data():
     global mahsulotlar, kategoriyalar, bot_settings
     mahsulotlar = {}
@@ -131,9 +96,18 @@ def load_data():
         })() # Create a dummy object with default attributes
 
 # --- Order status update logic (adapted from chef_panel/views.py) ---
-@sync_to_async
-def _update_telegram_messages(order, old_status, new_status, changed_by_user=None):
-    """Buyurtma holati o'zgarganda Telegram xabarlarini yangilash"""
+@db_sync
+def _order_items(order):
+    """Buyurtma mahsulotlari mahsulot nomi bilan bitta JOIN so'rovida"""
+    return list(order.items.select_related('product'))
+
+async def _update_telegram_messages(order, old_status, new_status, changed_by_user=None):
+    """
+    Buyurtma holati o'zgarganda Telegram xabarlarini yangilash.
+    HTTP so'rovlar async klient orqali - DB oqimi Telegram javobini kutib band turmaydi.
+    order.customer oldindan yuklangan bo'lishi kerak.
+    """
+    items = await _order_items(order)
     status_emoji = {
         "yangi": "🆕",
         "tasdiqlangan": "✅",
@@ -164,7 +138,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
         user_text += "🏪 Олиб кетиш учун: Ресторандан\n"
     
     user_text += f"\n🍽 **Маҳсулотлар:**\n"
-    for item in list(order.items.all()): # Convert queryset to list in sync context
+    for item in items:
         user_text += f"• {item.quantity} дона {item.product.name} - {item.total:,} сўм\n"
     user_text += f"\n💰 Жами: {order.total_amount:,} сўм\n"
     user_text += f"{emoji} Статус: **{order.get_status_display()}**"
@@ -172,7 +146,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
     user_keyboard = [[{'text': "⬅️ Бош меню", 'callback_data': "main_menu"}]]
     
     if order.user_message_id and order.telegram_user_id:
-        send_telegram_message(
+        await asend_telegram_message(
             chat_id=order.telegram_user_id,
             text=user_text,
             reply_markup={'inline_keyboard': user_keyboard},
@@ -181,14 +155,14 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
     else:
         # Agar message_id yo'q bo'lsa, yangi xabar yuborish
         if order.telegram_user_id:
-            response = send_telegram_message(
+            response = await asend_telegram_message(
                 chat_id=order.telegram_user_id,
                 text=user_text,
                 reply_markup={'inline_keyboard': user_keyboard}
             )
             if response and response.get('ok'):
                 order.user_message_id = response['result']['message_id']
-                order.save()
+                await db_sync(order.save)(update_fields=['user_message_id'])
 
     # Oshpaz xabarini yangilash
     if order.chef_message_id:
@@ -207,7 +181,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
             chef_text += "🏪 Олиб кетиш учун: Ресторандан\n"
             
         chef_text += f"\n🍽 **Маҳсулотлар:**\n"
-        for item in list(order.items.all()): # Convert queryset to list in sync context
+        for item in items:
             chef_text += f"• {item.quantity} дона {item.product.name} - {item.total:,} сўм\n"
         chef_text += f"\n💰 Жами: {order.total_amount:,} сўм"
 
@@ -229,8 +203,8 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
             ]
         # If status is 'tayor' (delivery), 'yolda', 'yetkazildi', 'olib_ketildi', 'bekor_qilingan', no more actions for chef
         
-        send_telegram_message(
-            chat_id=settings.CHEF_CHAT_ID,
+        await asend_telegram_message(
+            chat_id=order.chef_chat_id,
             text=chef_text,
             reply_markup={'inline_keyboard': chef_keyboard},
             message_id=order.chef_message_id
@@ -251,7 +225,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
             else:
                 courier_text += "📍 Манзил: Фақат локация\n"
             courier_text += f"\n🍽 **Маҳсулотлар:**\n"
-            for item in list(order.items.all()): # Convert queryset to list in sync context
+            for item in items:
                 courier_text += f"• {item.quantity} дона {item.product.name} - {item.total:,} сўм\n"
             courier_text += f"\n💰 Жами: {order.total_amount:,} сўм"
 
@@ -267,8 +241,8 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
                     [{'text': "❌ Бекор қилиш", 'callback_data': f"courier_cancel:{order.id}"}]
                 ]
             
-            courier_response = send_telegram_message(
-                chat_id=settings.ADMIN_CHAT_ID, # Assuming ADMIN_CHAT_ID is courier's chat ID
+            courier_response = await asend_telegram_message(
+                chat_id=order.courier_chat_id,
                 text=courier_text,
                 reply_markup={'inline_keyboard': courier_keyboard},
                 message_id=order.courier_message_id
@@ -288,7 +262,7 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
             else:
                 courier_text += "📍 Манзил: Фақат локация\n"
             courier_text += f"\n🍽 **Маҳсулотлар:**\n"
-            for item in list(order.items.all()): # Convert queryset to list in sync context
+            for item in items:
                 courier_text += f"• {item.quantity} дона {item.product.name} - {item.total:,} сўм\n"
             courier_text += f"\n💰 Жами: {order.total_amount:,} сўм"
 
@@ -297,16 +271,16 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
                 [{'text': "❌ Бекор қилиш", 'callback_data': f"courier_cancel:{order.id}"}]
             ]
             
-            logger.info(f"Sending courier message to chat_id: {settings.ADMIN_CHAT_ID}")
-            courier_msg_response = send_telegram_message(
-                chat_id=settings.ADMIN_CHAT_ID,
+            logger.info(f"Sending courier message to chat_id: {order.courier_chat_id}")
+            courier_msg_response = await asend_telegram_message(
+                chat_id=order.courier_chat_id,
                 text=courier_text,
                 reply_markup={'inline_keyboard': courier_keyboard}
             )
             
             if courier_msg_response and courier_msg_response.get('ok'):
                 order.courier_message_id = courier_msg_response['result']['message_id']
-                order.save()
+                await db_sync(order.save)(update_fields=['courier_message_id'])
                 logger.info(f"Courier message sent successfully for order {order.id}, message_id: {order.courier_message_id}")
             else:
                 logger.error(f"Failed to send courier message for order {order.id}")
@@ -315,8 +289,8 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
             # Send location after sending the message
             if order.latitude and order.longitude:
                 logger.info(f"Sending location to courier for order {order.id}")
-                location_response = send_telegram_location(
-                    chat_id=settings.ADMIN_CHAT_ID,
+                location_response = await asend_telegram_location(
+                    chat_id=order.courier_chat_id,
                     latitude=order.latitude,
                     longitude=order.longitude
                 )
@@ -329,27 +303,14 @@ def _update_telegram_messages(order, old_status, new_status, changed_by_user=Non
 # ----------------------------------------------------
 # 1) Masofa va yetkazib berish narxi hisoblash
 # ----------------------------------------------------
-def calculate_distance_km(lat1, lon1, lat2, lon2):
-    """
-    Haversine formula orqali (lat1, lon1) dan (lat2, lon2) ga bo'lgan
-    masofani (kmda) qaytaradi.
-    """
-    R = 6371.0  # Yer shari radiusi (km)
-    d_lat = math.radians(lat2 - lat1)
-    d_lon = math.radians(lon2 - lon1)
-    a = (math.sin(d_lat / 2))**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * (math.sin(d_lon / 2))**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    distance = R * c
-    return distance
-
-def calculate_delivery_cost(distance_km, bot_settings_obj=None):
+def calculate_delivery_cost(distance_km, max_radius_km):
     """
     Yetkazib berish narxini yangi qoidalar asosida hisoblaydi:
     - Boshlang'ich narx: 5000 so'm (har qanday masofa uchun)
     - Qo'shimcha: har km uchun 5000 so'm (1 km dan keyin)
-    - Maksimal radius: 10 km
+    - Maksimal radius: tanlangan filialniki (yoki BotSettings.delivery_max_radius_km)
     """
-    if distance_km > 10.0:  # Fixed 10km max radius
+    if distance_km > max_radius_km:
         return None  # Maksimal radiusdan uzoq joylarga xizmat yo'q
 
     base_cost = Decimal('5000')  # Fixed base cost
@@ -360,6 +321,52 @@ def calculate_delivery_cost(distance_km, bot_settings_obj=None):
         additional_cost = Decimal('5000') * additional_km
         return base_cost + additional_cost
 
+# Yetkazib berish narxlari geohash katagi bo'yicha keshlanadi (bitta uy/ofis - bitta hisob)
+delivery_quotes = QuoteCache(settings.DELIVERY_QUOTE_CACHE_SIZE)
+
+def _compute_delivery_quote(lat, lon, moment, zone_index, branch_index):
+    """Eng yaqin ochiq filial (filiallar bo'lmasa - yagona oshxona), masofa va narx"""
+    provider = get_distance_provider()
+    if branch_index:
+        branch, _ = branch_index.nearest(lat, lon, moment)
+        if branch is None:
+            # Radiusi ichida ochiq filial yo'q
+            return DeliveryQuote(None, None, None, None)
+        distance_km = provider.distance_km(branch.latitude, branch.longitude, lat, lon)
+    else:
+        branch = None
+        distance_km = provider.distance_km(STORE_LAT, STORE_LON, lat, lon)
+
+    if zone_index:
+        # Hududlar sozlangan - narx lokatsiya tushgan hudud tarifi bo'yicha
+        zone = zone_index.lookup(lat, lon)
+        return DeliveryQuote(branch, zone, distance_km, zone.delivery_cost(distance_km) if zone else None)
+    max_radius_km = branch.delivery_radius_km if branch else float(bot_settings.delivery_max_radius_km)
+    return DeliveryQuote(branch, None, distance_km, calculate_delivery_cost(distance_km, max_radius_km))
+
+def quote_delivery_sync(lat, lon, moment):
+    """
+    Lokatsiya uchun DeliveryQuote (keshdan). Narx katak markazi uchun hisoblanadi - katakdagi
+    hamma mijozlarga bir xil; kalitda tarif versiyalari va hozir ochiq filiallar bor.
+    """
+    branch_index = get_branch_index()
+    zone_index = get_zone_index()
+    cell = geohash_encode(lat, lon, settings.DELIVERY_QUOTE_GEOHASH_PRECISION)
+    open_ids = tuple(branch.id for branch in branch_index.open_branches(moment))
+    key = (cell, zone_index.version, branch_index.version, open_ids)
+    quote = delivery_quotes.get_or_compute(
+        key, lambda: _compute_delivery_quote(*geohash_center(cell), moment, zone_index, branch_index)
+    )
+    return quote, zone_index, branch_index
+
+def delivery_area_text(zone_index, branch_index=None):
+    """Rad javobi uchun: filiallar radiusi, hududlar yoki yagona oshxona radiusi"""
+    if branch_index:
+        return "ҳозир очиқ филиалларимиз етказиб бериш радиусидан"
+    if zone_index:
+        return "бизнинг етказиб бериш ҳудудларимиздан"
+    return f"бизнинг {bot_settings.delivery_max_radius_km} км радиусимиздан"
+
 def is_service_time_active(current_time, start_time, end_time):
     """
     Hozirgi vaqt xizmat ko'rsatish vaqti oralig'ida ekanligini tekshiradi.
@@ -396,6 +403,20 @@ def main_inline_menu(context: ContextTypes.DEFAULT_TYPE) -> InlineKeyboardMarkup
         buttons[0].append(InlineKeyboardButton("🛒 Сават", callback_data="show_cart"))
     return InlineKeyboardMarkup(buttons)
 
+def get_selected_quantity(context, product_name):
+    """Mahsulot sahifasida tanlangan miqdor (standart 1)"""
+    return context.user_data.get('miqdor', {}).get(product_name, 1)
+
+def set_selected_quantity(context, product_name, quantity):
+    # Barcha mahsulotlar uchun bitta lug'at, 1 (standart) saqlanmaydi - sessiya ixcham qoladi
+    miqdor = context.user_data.setdefault('miqdor', {})
+    if quantity == 1:
+        miqdor.pop(product_name, None)
+    else:
+        miqdor[product_name] = quantity
+    if not miqdor:
+        del context.user_data['miqdor']
+
 def build_cart_message(user_savat, context):
     if not user_savat:
         return "🛒 Савтингиз бўш!"
@@ -625,7 +646,15 @@ async def handle_service_type(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     service_type = query.data.split(":")[1]
     context.user_data['service_type'] = service_type
-    
+    # Filial delivery da lokatsiya bo'yicha, pickup da mijoz tanlovi bo'yicha qayta aniqlanadi
+    context.user_data.pop('branch_id', None)
+
+    if service_type == 'pickup':
+        branch_index = await db_sync(get_branch_index)()
+        if branch_index:
+            await ask_pickup_branch(query, branch_index)
+            return
+
     if service_type == 'delivery':
         text = "🚚 Етказиб бериш хизмати танланди!\n\n🍽 Энди буюртма беришингиз мумкин:"
     else:
@@ -633,6 +662,42 @@ async def handle_service_type(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     await edit_message_based_on_type(query, text, main_inline_menu(context).inline_keyboard)
 
+async def ask_pickup_branch(query, branch_index):
+    """Olib ketish uchun hozir ochiq filiallardan birini tanlash"""
+    keyboard = [
+        [InlineKeyboardButton(f"🏪 {branch.name}", callback_data=f"pickup_branch:{branch.id}")]
+        for branch in branch_index.open_branches(timezone.now())
+    ]
+    text = "🏪 Қайси филиалдан олиб кетасиз?" if keyboard else "😔 Ҳозирда очиқ филиал йўқ. Кейинроқ уриниб кўринг."
+    keyboard.append([InlineKeyboardButton("⬅️ Бош меню", callback_data="main_menu")])
+    await edit_message_based_on_type(query, text, keyboard)
+
+def pickup_branch_missing(context, branch_index):
+    """Filiallar bor, lekin olib ketish uchun ochiq filial tanlanmagan"""
+    if not branch_index or context.user_data.get('service_type') != 'pickup':
+        return False
+    branch = branch_index.get(context.user_data.get('branch_id'))
+    return branch is None or not branch.is_open(timezone.now())
+
+async def handle_pickup_branch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    branch_index = await db_sync(get_branch_index)()
+    branch = branch_index.get(int(query.data.split(":")[1]))
+    if branch is None or not branch.is_open(timezone.now()):
+        # Filial shu orada yopilgan yoki faolsizlantirilgan
+        await ask_pickup_branch(query, branch_index)
+        return
+
+    context.user_data['service_type'] = 'pickup'
+    context.user_data['branch_id'] = branch.id
+    text = f"🏪 Олиб кетиш хизмати танланди!\n📍 Филиал: {branch.name}\n"
+    if branch.address:
+        text += f"🏠 Манзил: {branch.address}\n"
+    text += "\n🍽 Энди буюртма беришингиз мумкин:"
+    await edit_message_based_on_type(query, text, main_inline_menu(context).inline_keyboard)
+
 # ----------------------------------------------------
 # Lokatsiya + masofa + yetkazib berish narxi (faqat delivery uchun)
 # ----------------------------------------------------
@@ -642,16 +707,17 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_lat = location.latitude
         user_lon = location.longitude
 
-        # Masofani hisoblaymiz
-        distance_km = calculate_distance_km(STORE_LAT, STORE_LON, user_lat, user_lon)
-        delivery_cost = calculate_delivery_cost(distance_km)
+        # Eng yaqin ochiq filial, masofa va narx (geohash katagi bo'yicha keshlangan)
+        quote, zone_index, branch_index = await db_sync(quote_delivery_sync)(user_lat, user_lon, timezone.now())
+        branch, zone = quote.branch, quote.zone
+        distance_km, delivery_cost = quote.distance_km, quote.cost
 
         if delivery_cost is None:
-            # Maksimal radiusdan uzoq => yetkazib berish yo'q
+            # Hududdan (yoki maksimal radiusdan) tashqarida => yetkazib berish yo'q
             del context.user_data['awaiting_location']
             context.user_data['delivery_possible'] = False
             await update.message.reply_text(
-                f"😔 Узр, сизнинг манзилингиз бизнинг {bot_settings.delivery_max_radius_km} км радиусимиздан ташқарида.\n"
+                f"😔 Узр, сизнинг манзилингиз {delivery_area_text(zone_index, branch_index)} ташқарида.\n"
                 "🚫 Шу сабаб етказиб бериш хизмати мавжуд эмас.\n"
                 "💡 Лекин сиз олиб кетиш хизматидан фойдаланишингиз мумкин!\n\n"
                 "🏪 Олиб кетиш хизматига ўтишни хоҳлайсизми?",
@@ -665,6 +731,7 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
             context.user_data['delivery_possible'] = True
             context.user_data['delivery_distance'] = distance_km
             context.user_data['delivery_cost'] = delivery_cost
+            context.user_data['branch_id'] = branch.id if branch else None
             context.user_data['location'] = {
                 'latitude': user_lat,
                 'longitude': user_lon
@@ -676,7 +743,9 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(
                 f"📍 Локация қабул қилинди!\n"
                 f"📏 Масофа: таҳминан {distance_km:.1f} км\n"
-                f"💰 Етказиб бериш нархи: {delivery_cost:,} сўм",
+                + (f"🏪 Филиал: {branch.name}\n" if branch else "")
+                + (f"🗺 Ҳудуд: {zone.name}\n" if zone else "")
+                + f"💰 Етказиб бериш нархи: {delivery_cost:,} сўм",
                 reply_markup=ReplyKeyboardRemove()
             )
 
@@ -726,8 +795,9 @@ async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Django ORM dan foydalanuvchi buyurtmalarini olish
     try:
-        customer = await sync_to_async(Customer.objects.filter(telegram_id=user_id).first)()
-        order_count = await sync_to_async(Order.objects.filter(customer=customer).count)() if customer else 0
+        order_count = await db_sync(
+            Customer.objects.filter(telegram_id=user_id).values_list('order_count', flat=True).first
+        )() or 0
     except Exception as e:
         logger.error(f"Django ORM dan buyurtmalarni olishda xato: {e}")
         order_count = "Юклаб бўлмади"
@@ -747,26 +817,12 @@ async def show_user_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _, page_str = data.split(":")
     page = int(page_str)
     user = update.effective_user
+    items_per_page = 5 # Changed to 5 for more compact view, can be adjusted
     
-    # Django ORM dan foydalanuvchi buyurtmalarini olish
-    orders_data = []
+    # Faqat joriy sahifa bazadan olinadi (LIMIT), natija mijoz bo'yicha keshlanadi
     try:
-        customer = await sync_to_async(Customer.objects.filter(telegram_id=user.id).first)()
-        if customer:
-            # Ensure the queryset is evaluated in the sync context before passing to async
-            all_orders_queryset = await sync_to_async(list)(Order.objects.filter(customer=customer).order_by('-created_at'))
-            for order in all_orders_queryset:
-                orders_data.append({
-                    'order_id': order.order_number,
-                    'date': order.created_at.strftime("%Y-%m-%d %H:%M"),
-                    'total': float(order.total_amount),
-                    'status': order.status,
-                    'status_display': order.get_status_display(),
-                    'service_type': order.service_type,
-                    'service_type_display': order.get_service_type_display(),
-                })
-            logger.info(f"Foydalanuvchi {user.id} uchun {len(orders_data)} ta buyurtma topildi.")
-        else:
+        orders_page = await db_sync(get_customer_orders_page)(user.id, page, items_per_page)
+        if orders_page is None:
             logger.info(f"Foydalanuvchi {user.id} uchun mijoz topilmadi, buyurtmalar yo'q.")
             await edit_message_based_on_type(
                 query,
@@ -779,18 +835,9 @@ async def show_user_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await edit_message_based_on_type(query, "Буюртмаларни юклашда техник хато юз берди. Илтимос, кейинроқ уриниб кўринг.", [[InlineKeyboardButton("⬅️ Орқага", callback_data="main_menu")]])
         return # Exit early on error
 
-    # Pagination logic
-    items_per_page = 5 # Changed to 5 for more compact view, can be adjusted
-    total_orders = len(orders_data)
-    total_pages = math.ceil(total_orders / items_per_page)
-    
-    start_idx = (page - 1) * items_per_page
-    end_idx = start_idx + items_per_page
-    subset = orders_data[start_idx:end_idx]
+    subset = orders_page['orders']
 
     if not subset:
-        # This case should ideally be caught by the 'if customer' block above,
-        # but keeping it for robustness if pagination results in empty subset.
         await edit_message_based_on_type(
             query,
             "📋 Бу саҳифада буюртма топилмади.",
@@ -826,9 +873,9 @@ async def show_user_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Tugmalar
     buttons = []
     nav_buttons = []
-    if page > 1:
+    if orders_page['has_previous']:
         nav_buttons.append(InlineKeyboardButton("◀️ Олдинги", callback_data=f"user_orders:{page-1}"))
-    if page < total_pages:
+    if orders_page['has_next']:
         nav_buttons.append(InlineKeyboardButton("Кейинги ▶️", callback_data=f"user_orders:{page+1}"))
     if nav_buttons:
         buttons.append(nav_buttons)
@@ -949,7 +996,7 @@ async def show_product(update: Update, context: ContextTypes.DEFAULT_TYPE):
             product_category = cat
             break
 
-    context.user_data[product_name] = context.user_data.get(product_name, 1)
+    quantity = get_selected_quantity(context, product_name)
 
     text = f"🍽 **{product_name}**\n"
     text += f"💰 Нархи: {narx:,} сўм\n"
@@ -960,7 +1007,7 @@ async def show_product(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [
         [
             InlineKeyboardButton("➖", callback_data=f"quantity:{product_name}:-1"),
-            InlineKeyboardButton(f"{context.user_data[product_name]}", callback_data="noop"),
+            InlineKeyboardButton(f"{quantity}", callback_data="noop"),
             InlineKeyboardButton("➕", callback_data=f"quantity:{product_name}:1")
         ],
         [InlineKeyboardButton("🛒 Саватга қўшиш", callback_data=f"add_to_cart:{product_name}")]
@@ -1064,9 +1111,8 @@ async def handle_quantity(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Invalid callback data format for quantity: {query.data}")
         return
 
-    current_quantity = context.user_data.get(product_name, 1)
-    new_quantity = max(1, current_quantity + change)
-    context.user_data[product_name] = new_quantity
+    new_quantity = max(1, get_selected_quantity(context, product_name) + change)
+    set_selected_quantity(context, product_name, new_quantity)
 
     product_data = mahsulotlar.get(product_name, {})
     narx = product_data.get("narx", Decimal('0'))
@@ -1137,7 +1183,7 @@ async def add_to_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     product_name = query.data.split(":")[1]
-    selected_quantity = context.user_data.get(product_name, 1)
+    selected_quantity = get_selected_quantity(context, product_name)
 
     # Check service time before adding to cart
     current_bot_settings = context.bot_data.get('bot_settings')
@@ -1319,7 +1365,11 @@ async def checkout(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         context.user_data['awaiting_location'] = True
     else:
-        # Pickup uchun location kerak emas, to'g'ridan-to'g'ri tasdiqlash
+        # Pickup uchun location kerak emas, to'g'ridan-to'g'ri tasdiqlash (filiallar bo'lsa - avval filial)
+        branch_index = await db_sync(get_branch_index)()
+        if pickup_branch_missing(context, branch_index):
+            await ask_pickup_branch(query, branch_index)
+            return
         keyboard = [
             [InlineKeyboardButton("✅ Тасдиқлаш", callback_data="final_confirm_order")],
             [InlineKeyboardButton("❌ Бекор қилиш", callback_data="cancel_order")]
@@ -1334,20 +1384,24 @@ async def checkout(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ----------------------------------------------------
 # Buyurtmani tasdiqlash va Django ga yuborish (ORM orqali)
 # ----------------------------------------------------
-@sync_to_async
-@transaction.atomic
-def _create_order_and_items_sync(telegram_user_id, full_name, phone, payment_method, service_type, location, address, products_total, delivery_cost, total_amount, order_items_data):
-    customer, created = Customer.objects.get_or_create(
-        telegram_id=telegram_user_id,
-        defaults={'full_name': full_name, 'phone_number': phone}
-    )
-    if not created:
-        customer.full_name = full_name
-        customer.phone_number = phone
-        customer.save()
+@db_sync
+def _products_by_name(names):
+    """Nomi bo'yicha mahsulotlar (bir xil nomlilardan .first() tartibidagi birinchisi)"""
+    products = {}
+    for product in Product.objects.filter(name__in=names):
+        products.setdefault(product.name, product)
+    return products
+
+@db_sync
+@write_transaction
+def _create_order_and_items_sync(telegram_user_id, full_name, phone, payment_method, service_type, location, address, products_total, delivery_cost, total_amount, order_items_data, branch_id=None):
+    customer = Customer.upsert_for_checkout(telegram_user_id, full_name, phone)
+    # Filial obyekti order ga biriktiriladi - chat ID lar async kodda so'rovsiz o'qiladi
+    branch = Branch.objects.filter(id=branch_id).first() if branch_id else None
 
     order = Order.objects.create(
         customer=customer,
+        branch=branch,
         telegram_user_id=telegram_user_id,
         status='yangi',
         payment_method=payment_method,
@@ -1410,12 +1464,18 @@ async def final_confirm_order(update: Update, context: ContextTypes.DEFAULT_TYPE
     if service_type == 'delivery' and context.user_data.get('delivery_possible') is False:
         await edit_message_based_on_type(
             query,
-            f"😔 Узр, сизнинг ҳудудингизга етказиб бериш хизмати мавжуд эмас (максимал {bot_settings.delivery_max_radius_km} км)."
+            "😔 Узр, сизнинг ҳудудингизга етказиб бериш хизмати мавжуд эмас. "
             "🍽 Меню орқали танишиб кўришингиз мумкин.",
             [[InlineKeyboardButton("⬅️ Орқага", callback_data="main_menu")]]
         )
         return
 
+    if service_type == 'pickup':
+        branch_index = await db_sync(get_branch_index)()
+        if pickup_branch_missing(context, branch_index):
+            await ask_pickup_branch(query, branch_index)
+            return
+
     user = update.effective_user
     phone = context.user_data.get('phone_number', 'Номаълум')
     full_name = context.user_data.get('full_name', 'Номаълум')
@@ -1437,8 +1497,10 @@ async def final_confirm_order(update: Update, context: ContextTypes.DEFAULT_TYPE
     total_products_price = Decimal('0')
     order_items_data = []
 
+    # Savatdagi barcha mahsulotlar bitta so'rovda (har bir qator uchun alohida emas)
+    products_by_name = await _products_by_name(list(user_savat))
     for product_name, qty in user_savat.items():
-        product_obj = await sync_to_async(Product.objects.filter(name=product_name).first)()
+        product_obj = products_by_name.get(product_name)
         if product_obj:
             item_price = product_obj.price  # Keep as Decimal
             total_products_price += item_price * qty
@@ -1459,7 +1521,8 @@ async def final_confirm_order(update: Update, context: ContextTypes.DEFAULT_TYPE
     try:
         order = await _create_order_and_items_sync(
             telegram_user_id, full_name, phone, payment_method, service_type, location, address,
-            total_products_price, delivery_cost, total_amount, order_items_data
+            total_products_price, delivery_cost, total_amount, order_items_data,
+            branch_id=context.user_data.get('branch_id'),
         )
         
         # Telegram xabarlarini yuborish va message_id'larni saqlash
@@ -1489,8 +1552,8 @@ async def final_confirm_order(update: Update, context: ContextTypes.DEFAULT_TYPE
             ]
         ]
         
-        chef_msg_response = send_telegram_message(
-            chat_id=settings.CHEF_CHAT_ID, 
+        chef_msg_response = await asend_telegram_message(
+            chat_id=order.chef_chat_id, 
             text=chef_text, 
             reply_markup={'inline_keyboard': keyboard_chef}
         )
@@ -1499,8 +1562,8 @@ async def final_confirm_order(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         # Lokatsiya yuborish faqat delivery uchun
         if service_type == 'delivery' and order.latitude and order.longitude:
-            send_telegram_location(
-                chat_id=settings.CHEF_CHAT_ID,
+            await asend_telegram_location(
+                chat_id=order.chef_chat_id,
                 latitude=order.latitude,
                 longitude=order.longitude
             )
@@ -1529,7 +1592,7 @@ async def final_confirm_order(update: Update, context: ContextTypes.DEFAULT_TYPE
         user_text += f"\n💰 Жами: {order.total_amount:,} сўм\n🆕 Статус: **Янги**"
 
         user_keyboard = [[{'text': "⬅️ Бош меню", 'callback_data': "main_menu"}]]
-        user_msg_response = send_telegram_message(
+        user_msg_response = await asend_telegram_message(
             chat_id=telegram_user_id,
             text=user_text,
             reply_markup={'inline_keyboard': user_keyboard}
@@ -1537,7 +1600,7 @@ async def final_confirm_order(update: Update, context: ContextTypes.DEFAULT_TYPE
         if user_msg_response and user_msg_response.get('ok'):
             order.user_message_id = user_msg_response['result']['message_id']
             
-        await sync_to_async(order.save)() # Save message IDs
+        await db_sync(order.save)(update_fields=['chef_message_id', 'user_message_id']) # Faqat message ID lar - oraliqdagi holat o'zgarishi ustidan yozilmaydi
 
         await edit_message_based_on_type(query, f"✅ Буюртмангиз #{order.order_number} қабул қилинди!", main_inline_menu(context).inline_keyboard)
 
@@ -1567,35 +1630,6 @@ async def cancel_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ----------------------------------------------------
 # Oshpaz va Kuryer paneli callbacklari (ORM orqali)
 # ----------------------------------------------------
-@sync_to_async
-@transaction.atomic
-def _update_order_status_sync(order_id, new_status, old_status):
-    logger.info(f"Attempting to update order {order_id} status from {old_status} to {new_status}")
-    order = Order.objects.get(id=order_id)
-    order.status = new_status
-    
-    if new_status == 'tasdiqlangan':
-        order.confirmed_at = timezone.now()
-    elif new_status == 'tayor':
-        order.ready_at = timezone.now()
-    elif new_status == 'yetkazildi':
-        order.delivered_at = timezone.now()
-    elif new_status == 'olib_ketildi':
-        order.picked_up_at = timezone.now()
-    
-    order.save()
-    logger.info(f"Order {order_id} status successfully updated to {order.status} in DB.")
-    
-    OrderStatusHistory.objects.create(
-        order=order,
-        old_status=old_status,
-        new_status=new_status,
-        changed_by=None, # Bot orqali o'zgargani uchun user None
-        notes=f'Telegram bot orqali yangilandi'
-    )
-    logger.info(f"Order status history created for order {order_id}: {old_status} -> {new_status}")
-    return order
-
 async def handle_chef_courier_status_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -1604,12 +1638,6 @@ async def handle_chef_courier_status_update(update: Update, context: ContextType
         action, order_id = query.data.split(":")
         logger.info(f"Callback received: action={action}, order_id={order_id}")
         
-        # Fetch order to get old_status before passing to sync function
-        order_obj_for_status_check = await sync_to_async(Order.objects.get)(id=int(order_id))
-        old_status = order_obj_for_status_check.status
-        service_type = order_obj_for_status_check.service_type
-        logger.info(f"Order {order_id} current status: {old_status}, service_type: {service_type}")
-
         status_map = {
             "chef_confirm": "tasdiqlangan",
             "chef_ready": "tayor",
@@ -1628,33 +1656,20 @@ async def handle_chef_courier_status_update(update: Update, context: ContextType
             logger.warning(f"Unknown status change action: {action}")
             return
 
-        # Valid transitions for different service types
-        if service_type == 'pickup':
-            valid_transitions = {
-                'yangi': ['tasdiqlangan', 'bekor_qilingan'],
-                'tasdiqlangan': ['tayor', 'bekor_qilingan'],
-                'tayor': ['olib_ketildi', 'bekor_qilingan'],
-            }
-        else:  # delivery
-            valid_transitions = {
-                'yangi': ['tasdiqlangan', 'bekor_qilingan'],
-                'tasdiqlangan': ['tayor', 'bekor_qilingan'],
-                'tayor': ['yolda', 'bekor_qilingan'],
-                'yolda': ['yetkazildi', 'bekor_qilingan'],
-            }
-
-        if new_status not in valid_transitions.get(old_status, []):
+        # Holat qulflangan qator ustida tekshiriladi va yoziladi (web panel bilan bir xil yo'l)
+        order, old_status, changed = await db_sync(change_order_status)(
+            int(order_id), new_status, None, 'Telegram bot orqali yangilandi'
+        )
+        if not changed:
             await edit_message_based_on_type(query, f"Ҳолат {old_status} дан {new_status} га ўзгартиришга рухсат берилмаган.", [])
-            logger.warning(f"Invalid transition for order {order_id}: {old_status} -> {new_status} (service_type: {service_type})")
+            logger.warning(f"Invalid transition for order {order_id}: {old_status} -> {new_status} (service_type: {order.service_type})")
             return
+        logger.info(f"Order {order_id} status updated to {order.status}. Now updating Telegram messages.")
 
-        updated_order = await _update_order_status_sync(int(order_id), new_status, old_status)
-        logger.info(f"Order {order_id} status updated to {updated_order.status}. Now updating Telegram messages.")
-            
-        await _update_telegram_messages(updated_order, old_status, new_status) # Pass the updated order object
+        await _update_telegram_messages(order, old_status, new_status)
         logger.info(f"Telegram messages updated for order {order_id}.")
         
-    except Order.DoesNotExist:
+    except Http404:
         logger.error(f"Order with ID {order_id} not found.", exc_info=True)
         await edit_message_based_on_type(query, "❌ Буюртма топилмади.", [])
     except Exception as e:
@@ -1725,12 +1740,62 @@ async def post_init(application):
     await load_data()
     # Store bot_settings in application.bot_data for easy access in handlers
     application.bot_data['bot_settings'] = bot_settings # Use the global bot_settings loaded by load_data
+    # Eskirgan sessiyalar Application.drop_user_data bilan chiqariladi (bazadagi holat qoladi)
+    application.persistence.start_eviction(application, settings.BOT_SESSION_EVICT_INTERVAL)
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Turli foydalanuvchilarning update'lari parallel (max_concurrent_updates gacha),
+    bitta foydalanuvchiniki esa kelish tartibida - user_data (savat) poyga holatisiz.
+
+    Avval foydalanuvchi locki, keyin umumiy slot olinadi: bitta foydalanuvchining
+    navbatda turgan update'lari slotlarni band qilib, boshqalarni kutdirmaydi.
+    BaseUpdateProcessor.process_update (final) o'z semaforini do_process_update dan
+    OLDIN oladi, shuning uchun bazaviy semafor cheklanmaydi - cheklov _slots da.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        super().__init__(sys.maxsize)
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._user_locks = weakref.WeakValueDictionary()
+
+    async def do_process_update(self, update, coroutine):
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            async with self._slots:
+                await coroutine
+            return
+        lock = self._user_locks.get(user.id)
+        if lock is None:
+            lock = self._user_locks[user.id] = asyncio.Lock()
+        async with lock, self._slots:
+            await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
 
 # ----------------------------------------------------
 # Botni ishga tushirish
 # ----------------------------------------------------
 def main():
-    application = ApplicationBuilder().token(settings.TELEGRAM_BOT_TOKEN).post_init(post_init).build()
+    application = (
+        ApplicationBuilder()
+        .token(settings.TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .concurrent_updates(PerUserUpdateProcessor(settings.BOT_CONCURRENT_UPDATES))
+        .persistence(DatabasePersistence(
+            update_interval=settings.BOT_PERSISTENCE_INTERVAL,
+            session_ttl=settings.BOT_SESSION_TTL,
+            max_sessions=settings.BOT_SESSION_MAX_USERS,
+            max_bytes=settings.BOT_SESSION_MAX_BYTES,
+        ))
+        .build()
+    )
 
     # Asosiy komandalar
     application.add_handler(CommandHandler("start", start))
@@ -1742,6 +1807,7 @@ def main():
 
     # Service type selection
     application.add_handler(CallbackQueryHandler(handle_service_type, pattern="^service_type:"))
+    application.add_handler(CallbackQueryHandler(handle_pickup_branch, pattern="^pickup_branch:"))
 
     # Oshpaz va Kuryer callbacklari (Django ORM orqali)
     application.add_handler(CallbackQueryHandler(handle_chef_courier_status_update, pattern="^chef_confirm:"))